@@ -0,0 +1,18 @@
+import pytest
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers',
+        'query_budget(limit): бюджет SQL-запросов для вьюх без своего',
+    )
+
+
+@pytest.fixture(autouse=True)
+def query_budget(request, settings):
+    """Проваливает тест, если вьюха превысила бюджет SQL-запросов."""
+    settings.QUERY_BUDGET_ENABLED = True
+    settings.QUERY_BUDGET_RAISE = True
+    marker = request.node.get_closest_marker('query_budget')
+    if marker is not None:
+        settings.QUERY_BUDGET_DEFAULT = marker.args[0]
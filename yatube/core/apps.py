@@ -3,3 +3,21 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.conf import settings
+
+        from . import checks  # noqa: F401
+        from .db.backends.sqlite3.pool import pool_stats
+        from .metrics import register_stats
+        from .sqlstats import install as install_sqlstats
+        from .thumbnail_kvstore import local_index
+
+        register_stats('db_pool', pool_stats, label='alias')
+        register_stats('thumbnail_index', lambda: {
+            **local_index.stats.as_dict(),
+            'entries': len(local_index),
+            'size': local_index.size,
+        })
+        if settings.SQL_STATS_ENABLED:
+            install_sqlstats()
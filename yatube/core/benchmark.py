@@ -0,0 +1,83 @@
+"""Замеры задержки и числа SQL-запросов для нагрузочных команд.
+
+Результаты складываются в словари, готовые для ``json.dump``, чтобы
+прогоны до и после изменения можно было сравнить.
+"""
+import statistics
+import time
+
+from core.querycount import QueryRecorder
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    index = round(percent / 100 * (len(ordered) - 1))
+    return ordered[index]
+
+
+def summarize(values):
+    """Сводка по замерам в миллисекундах."""
+    summary = {
+        'count': len(values),
+        'mean': round(statistics.mean(values), 3),
+        'max': round(max(values), 3),
+    }
+    for percent in PERCENTILES:
+        summary[f'p{percent}'] = round(percentile(values, percent), 3)
+    return summary
+
+
+def measure_request(client, url):
+    """Время ответа в миллисекундах, число запросов к базе и код ответа."""
+    with QueryRecorder() as recorder:
+        started = time.perf_counter()
+        response = client.get(url)
+        elapsed = (time.perf_counter() - started) * 1000
+    return elapsed, recorder.count, response.status_code
+
+
+def run_scenario(client, url, repeat, warmup=0, before=None):
+    """Прогоняет ``url`` ``repeat`` раз и сводит замеры.
+
+    ``before`` вызывается перед каждым замером, например для сброса
+    кэша при холодном прогоне.
+    """
+    for _ in range(warmup):
+        client.get(url)
+    timings, queries, statuses = [], [], set()
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        elapsed, count, status = measure_request(client, url)
+        timings.append(elapsed)
+        queries.append(count)
+        statuses.add(status)
+    result = {'url': url, 'latency_ms': summarize(timings)}
+    result['queries'] = {
+        'mean': round(statistics.mean(queries), 2),
+        'max': max(queries),
+    }
+    result['statuses'] = sorted(statuses)
+    return result
+
+
+def compare(current, baseline):
+    """Строки (сценарий, метрика, было, стало, изменение в процентах)."""
+    rows = []
+    for name, result in current.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in ('p50', 'p95', 'p99'):
+            before = previous['latency_ms'][metric]
+            after = result['latency_ms'][metric]
+            change = (after - before) / before * 100 if before else 0.0
+            rows.append((name, metric, before, after, round(change, 1)))
+        rows.append((
+            name, 'queries', previous['queries']['mean'],
+            result['queries']['mean'], None,
+        ))
+    return rows
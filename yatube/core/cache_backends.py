@@ -0,0 +1,219 @@
+"""Общий кэш на SQLite для нескольких процессов одного хоста.
+
+В отличие от ``LocMemCache`` данные видны всем воркерам gunicorn,
+а сбросы кэша доходят до каждого из них. Внешний сервис не нужен:
+кэш хранится в отдельном файле базы в режиме WAL.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache_entry ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL'
+    ')'
+)
+EXPIRES_INDEX = (
+    'CREATE INDEX IF NOT EXISTS cache_entry_expires ON cache_entry (expires)'
+)
+NOT_EXPIRED = '(expires IS NULL OR expires > ?)'
+# Просроченные и лишние записи чистим раз в CULL_EVERY записей.
+CULL_EVERY = 100
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def _db(self):
+        # После fork соединение родителя использовать нельзя.
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=5, isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(SCHEMA)
+            connection.execute(EXPIRES_INDEX)
+            self._local.connection = connection
+            self._local.pid = pid
+        return self._local.connection
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        row = self._db.execute(
+            f'SELECT value FROM cache_entry WHERE key = ? AND {NOT_EXPIRED}',
+            (key, time.time()),
+        ).fetchone()
+        if row is None:
+            return default
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        key_map = {self._key(key, version): key for key in keys}
+        if not key_map:
+            return {}
+        placeholders = ', '.join('?' * len(key_map))
+        rows = self._db.execute(
+            f'SELECT key, value FROM cache_entry '
+            f'WHERE key IN ({placeholders}) AND {NOT_EXPIRED}',
+            (*key_map, time.time()),
+        ).fetchall()
+        return {key_map[key]: pickle.loads(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self._db.execute(
+            'INSERT OR REPLACE INTO cache_entry (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            (key, self._dumps(value), self.get_backend_timeout(timeout)),
+        )
+        self._maybe_cull()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self._key(key, version), self._dumps(value), expires)
+            for key, value in data.items()
+        ]
+        db = self._db
+        with _transaction(db):
+            db.executemany(
+                'INSERT OR REPLACE INTO cache_entry (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                rows,
+            )
+        self._maybe_cull()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        db = self._db
+        with _transaction(db):
+            db.execute(
+                f'DELETE FROM cache_entry WHERE key = ? AND NOT {NOT_EXPIRED}',
+                (key, time.time()),
+            )
+            cursor = db.execute(
+                'INSERT OR IGNORE INTO cache_entry (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (key, self._dumps(value), self.get_backend_timeout(timeout)),
+            )
+        return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        cursor = self._db.execute(
+            f'UPDATE cache_entry SET expires = ? '
+            f'WHERE key = ? AND {NOT_EXPIRED}',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        db = self._db
+        with _transaction(db):
+            row = db.execute(
+                f'SELECT value FROM cache_entry '
+                f'WHERE key = ? AND {NOT_EXPIRED}',
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            db.execute(
+                'UPDATE cache_entry SET value = ? WHERE key = ?',
+                (self._dumps(value), key),
+            )
+        return value
+
+    def delete(self, key, version=None):
+        self._db.execute(
+            'DELETE FROM cache_entry WHERE key = ?',
+            (self._key(key, version),),
+        )
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            placeholders = ', '.join('?' * len(keys))
+            self._db.execute(
+                f'DELETE FROM cache_entry WHERE key IN ({placeholders})',
+                keys,
+            )
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._db.execute(
+            f'SELECT 1 FROM cache_entry WHERE key = ? AND {NOT_EXPIRED}',
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache_entry')
+
+    def close(self, **kwargs):
+        # Соединение живёт всё время жизни потока, как у файлового кэша.
+        pass
+
+    def _maybe_cull(self):
+        self._writes += 1
+        if self._writes % CULL_EVERY:
+            return
+        db = self._db
+        db.execute(
+            'DELETE FROM cache_entry WHERE expires IS NOT NULL '
+            'AND expires <= ?',
+            (time.time(),),
+        )
+        count = db.execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+        if count > self._max_entries:
+            if not self._cull_frequency:
+                self.clear()
+                return
+            excess = (count - self._max_entries
+                      + self._max_entries // self._cull_frequency)
+            db.execute(
+                'DELETE FROM cache_entry WHERE key IN ('
+                ' SELECT key FROM cache_entry'
+                ' ORDER BY expires IS NULL, expires LIMIT ?'
+                ')',
+                (excess,),
+            )
+
+
+class _transaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
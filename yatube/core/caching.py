@@ -0,0 +1,89 @@
+"""Версионированные ключи и защита от лавины промахов кэша.
+
+Пространство имён (например, ``feeds``) получает номер поколения в кэше.
+Ключи строятся с этим номером, поэтому сброс всего пространства —
+это один ``incr``, и он сразу виден всем процессам с общим кэшем.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+GENERATION_KEY = 'generation:{}'
+LOCK_SUFFIX = ':lock'
+
+_missing = object()
+
+
+def get_generation(namespace):
+    key = GENERATION_KEY.format(namespace)
+    generation = cache.get(key)
+    if generation is None:
+        # Стартуем со времени, а не с единицы: после вытеснения ключа
+        # поколение не совпадёт с уже лежащими в кэше значениями.
+        cache.add(key, int(time.time() * 1000), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(namespace):
+    """Делает недействительными все ключи пространства имён.
+
+    Возвращает новый номер поколения.
+    """
+    key = GENERATION_KEY.format(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        generation = int(time.time() * 1000)
+        cache.set(key, generation, None)
+        return generation
+
+
+def bump_generation_on_commit(namespace, using=None):
+    """Сдвигает поколение сейчас и ещё раз после коммита транзакции.
+
+    Читатель, успевший между первым сдвигом и коммитом положить в кэш
+    страницу по старым данным, положит её под промежуточным поколением,
+    и второй сдвиг её отбросит. Вне транзакции сдвиг один.
+    """
+    bump_generation(namespace)
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(lambda: bump_generation(namespace), using)
+
+
+def versioned_key(namespace, *parts):
+    """Ключ с текущим поколением; длинные части заменяются хешем."""
+    raw = ':'.join(str(part) for part in parts)
+    if len(raw) > 64:
+        raw = hashlib.md5(raw.encode()).hexdigest()
+    return f'{namespace}:{get_generation(namespace)}:{raw}'
+
+
+def get_or_build(key, build, timeout, lock_timeout=10, wait=2.0,
+                 poll=0.05):
+    """Значение из кэша; при промахе его строит только один процесс.
+
+    Первый промахнувшийся берёт блокировку через ``cache.add`` и строит
+    значение, остальные ждут его появления не дольше ``wait`` секунд,
+    а потом строят сами, чтобы запрос не завис на упавшем соседе.
+    """
+    value = cache.get(key, _missing)
+    if value is not _missing:
+        return value
+    lock = key + LOCK_SUFFIX
+    if cache.add(lock, 1, lock_timeout):
+        try:
+            value = build()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock)
+        return value
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(poll)
+        value = cache.get(key, _missing)
+        if value is not _missing:
+            return value
+    return build()
@@ -0,0 +1,13 @@
+from django.core.checks import Tags, Warning, register
+
+from .template_cache import load_templates
+
+
+@register(Tags.templates)
+def check_templates(app_configs, **kwargs):
+    """Предупреждает о битых шаблонах до первого запроса к ним."""
+    _, problems = load_templates()
+    return [
+        Warning(f'Шаблон {name} {problem}', id='core.W001')
+        for name, problem in problems
+    ]
@@ -0,0 +1,84 @@
+"""Бэкенд SQLite с настройкой соединения для рабочей нагрузки.
+
+При открытии соединения выполняет ``PRAGMA`` из ключа ``PRAGMAS``
+настроек базы поверх ``DEFAULT_PRAGMAS``; значение ``None`` отключает
+прагму. WAL позволяет читать во время записи, а ``busy_timeout``
+заставляет писателя ждать блокировку, а не сразу падать с
+«database is locked».
+
+``TRANSACTION_MODE`` задаёт вид ``BEGIN`` для ``atomic``: с
+``IMMEDIATE`` транзакция берёт блокировку записи сразу. Иначе две
+транзакции, начавшие с чтения, могут упереться друг в друга при
+переходе к записи, и SQLite вернёт ошибку, не дожидаясь таймаута.
+
+Ключ ``POOL`` включает пул соединений процесса (см. ``pool``): Django
+по-прежнему «закрывает» соединение в конце запроса, но оно
+возвращается в пул вместо закрытия файла базы.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+from .pool import get_pool
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+def connection_pragmas(settings_dict):
+    pragmas = {**DEFAULT_PRAGMAS, **settings_dict.get('PRAGMAS', {})}
+    return {
+        name: value for name, value in pragmas.items() if value is not None
+    }
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # Пул, из которого взято текущее соединение: настройки базы могут
+    # смениться, пока соединение открыто, например при создании
+    # тестовой базы.
+    connection_pool = None
+
+    def get_pool(self):
+        options = self.settings_dict.get('POOL')
+        if options is None or self.is_in_memory_db():
+            return None
+        return get_pool(self.alias, options)
+
+    def get_new_connection(self, conn_params):
+        pool = self.get_pool()
+        if pool is None:
+            return self.open_connection(conn_params)
+        connection = pool.acquire(lambda: self.open_connection(conn_params))
+        self.connection_pool = pool
+        return connection
+
+    def open_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        self.init_connection(connection)
+        return connection
+
+    def init_connection(self, connection):
+        """Точка настройки только что открытого соединения."""
+        for name, value in connection_pragmas(self.settings_dict).items():
+            connection.execute(f'PRAGMA {name} = {value}')
+
+    def _close(self):
+        pool, self.connection_pool = self.connection_pool, None
+        if pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.release(self.connection)
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict.get('TRANSACTION_MODE')
+        if mode is None:
+            return super()._start_transaction_under_autocommit()
+        if mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(f'Неизвестный TRANSACTION_MODE: {mode}')
+        self.cursor().execute(f'BEGIN {mode}')
@@ -0,0 +1,152 @@
+"""Пул соединений SQLite внутри процесса.
+
+Соединение, закрытое Django в конце запроса, возвращается в пул и
+достаётся следующему запросу любого потока. Перед выдачей соединение
+проверяется ``SELECT 1``, а число одновременно выданных соединений
+ограничено ``MAX_SIZE``: лишние запросы ждут освобождения не дольше
+``TIMEOUT`` секунд.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from django.db import OperationalError
+
+DEFAULT_POOL = {'MAX_SIZE': 8, 'TIMEOUT': 10}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolStats:
+    """Счётчики пула; время ожидания в миллисекундах."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def record(self, wait_ms=0.0, **counters):
+        with self._lock:
+            self.wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self):
+        return {
+            'checkouts': self.checkouts,
+            'hits': self.hits,
+            'misses': self.misses,
+            'failed_checks': self.failed_checks,
+            'timeouts': self.timeouts,
+            'wait_ms': round(self.wait_ms, 3),
+            'max_wait_ms': round(self.max_wait_ms, 3),
+        }
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.hits = 0
+            self.misses = 0
+            self.failed_checks = 0
+            self.timeouts = 0
+            self.wait_ms = 0.0
+            self.max_wait_ms = 0.0
+
+
+class ConnectionPool:
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.stats = PoolStats()
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._pid = os.getpid()
+
+    def acquire(self, connect):
+        """Выдаёт проверенное соединение или открывает новое ``connect()``."""
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            self.stats.record(timeouts=1)
+            raise OperationalError(
+                f'Нет свободных соединений в пуле за {self.timeout} с'
+            )
+        wait_ms = (time.perf_counter() - started) * 1000
+        try:
+            while True:
+                try:
+                    connection = self._idle.pop()
+                except IndexError:
+                    connection = connect()
+                    self.stats.record(wait_ms, checkouts=1, misses=1)
+                    return connection
+                if self.healthy(connection):
+                    self.stats.record(wait_ms, checkouts=1, hits=1)
+                    return connection
+                self.stats.record(failed_checks=1)
+                self.discard(connection)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection):
+        """Возвращает соединение; незавершённая транзакция откатывается."""
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except Exception:
+            self.discard(connection)
+        else:
+            self._idle.append(connection)
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def healthy(connection):
+        try:
+            connection.execute('SELECT 1').fetchone()
+        except Exception:
+            return False
+        return not connection.in_transaction
+
+    @staticmethod
+    def discard(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close_idle(self):
+        while self._idle:
+            self.discard(self._idle.pop())
+
+
+def get_pool(alias, options):
+    """Пул базы ``alias`` в текущем процессе; после fork — новый."""
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None or pool._pid != os.getpid():
+            options = {**DEFAULT_POOL, **options}
+            pool = ConnectionPool(options['MAX_SIZE'], options['TIMEOUT'])
+            _pools[alias] = pool
+        return pool
+
+
+def pool_stats():
+    """Счётчики всех пулов процесса по псевдонимам баз."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {
+        alias: {**pool.stats.as_dict(), 'idle': len(pool._idle),
+                'max_size': pool.max_size}
+        for alias, pool in pools.items()
+    }
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_idle()
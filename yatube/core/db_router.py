@@ -0,0 +1,73 @@
+"""Чтение с реплик базы и запись в основную.
+
+На реплики уходят только чтения моделей из ``REPLICA_READ_APPS``
+во вьюхах, помеченных декоратором ``replica_reads``. Всё остальное,
+включая сессии, читается из основной базы. После записи запрос и
+сессия пишущего на ``REPLICA_PIN_SECONDS`` секунд читают основную
+базу, чтобы видеть свои изменения до того, как их получит реплика.
+"""
+import random
+import threading
+
+from django.conf import settings
+
+PRIMARY = 'default'
+
+_state = threading.local()
+
+
+def replica_reads(view):
+    """Разрешает вьюхе читать с реплик. Ставится самым внешним."""
+    view.replica_reads = True
+    return view
+
+
+def start_request(replicas_allowed=False, pinned=False):
+    _state.replicas_allowed = replicas_allowed
+    _state.pinned = pinned
+    _state.wrote = False
+
+
+def allow_replicas():
+    _state.replicas_allowed = True
+
+
+def pinned():
+    """Запрос читает основную базу, хотя мог бы читать реплики.
+
+    Общие кэши страниц такому запросу не подходят: их могли собрать
+    по отставшей реплике.
+    """
+    return (bool(settings.DATABASE_REPLICAS)
+            and getattr(_state, 'pinned', False))
+
+
+def finish_request():
+    """Сбрасывает состояние потока; возвращает, была ли запись."""
+    wrote = getattr(_state, 'wrote', False)
+    start_request()
+    return wrote
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (not replicas
+                or not getattr(_state, 'replicas_allowed', False)
+                or getattr(_state, 'pinned', False)
+                or model._meta.app_label not in settings.REPLICA_READ_APPS):
+            return PRIMARY
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Дальше в этом запросе читаем свои записи из основной базы.
+        _state.pinned = True
+        _state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, связи между ними допустимы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
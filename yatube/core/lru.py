@@ -0,0 +1,92 @@
+"""LRU-кэш строк внутри процесса с ограничением по размеру.
+
+Размер записи считается как длина ключа плюс длина значения, так что
+ограничение приблизительное, но не зависит от числа записей: длинные
+значения вытесняют больше соседей.
+"""
+import threading
+from collections import OrderedDict
+
+
+class LRUStats:
+    """Счётчики обращений к LRU-кэшу."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def record(self, **counters):
+        with self._lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / total, 4) if total else None,
+        }
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+class LRUCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.stats = LRUStats()
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                value = default
+            else:
+                self._data.move_to_end(key)
+        if value is default:
+            self.stats.record(misses=1)
+        else:
+            self.stats.record(hits=1)
+        return value
+
+    def set(self, key, value):
+        cost = len(key) + len(value)
+        if cost > self.max_size:
+            self.delete(key)
+            return
+        evicted = 0
+        with self._lock:
+            self._pop(key)
+            self._data[key] = value
+            self.size += cost
+            while self.size > self.max_size:
+                self._pop(next(iter(self._data)))
+                evicted += 1
+        if evicted:
+            self.stats.record(evictions=evicted)
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def _pop(self, key):
+        value = self._data.pop(key, None)
+        if value is not None:
+            self.size -= len(key) + len(value)
@@ -0,0 +1,80 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sqlstats
+
+SORT_KEYS = {
+    'total': lambda row: row[3],
+    'count': lambda row: row[2],
+    'max': lambda row: row[4],
+    'mean': lambda row: row[3] / row[2],
+}
+
+
+class Command(BaseCommand):
+    help = ('Печатает самые дорогие формы SQL-запросов по сводкам '
+            'процессов сайта.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument(
+            '--sort', choices=sorted(SORT_KEYS), default='total',
+            help='Порядок: суммарное, среднее, наибольшее время или число.',
+        )
+        parser.add_argument('--view', help='Только запросы этой вьюхи.')
+        parser.add_argument(
+            '--by-view', action='store_true',
+            help='Сложить запросы каждой вьюхи в одну строку.',
+        )
+        parser.add_argument(
+            '--directory', default=None,
+            help='Каталог сводок вместо SQL_STATS_DIR.',
+        )
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Удалить накопленные сводки и выйти.',
+        )
+
+    def handle(self, *args, **options):
+        directory = options['directory'] or settings.SQL_STATS_DIR
+        if options['reset']:
+            sqlstats.reset_directory(directory)
+            self.stdout.write(self.style.SUCCESS('Сводки удалены'))
+            return
+        rows = sqlstats.load(directory)
+        if options['view']:
+            rows = [row for row in rows if row[0] == options['view']]
+        if not rows:
+            raise CommandError(f'Нет сводок запросов в {directory}')
+        if options['by_view']:
+            rows = self.group_by_view(rows)
+        rows.sort(key=SORT_KEYS[options['sort']], reverse=True)
+        grand_total = sum(row[3] for row in rows)
+        self.stdout.write(
+            f'{"всего, мс":>11} {"доля":>6} {"раз":>7} {"сред., мс":>10} '
+            f'{"макс., мс":>10}  вьюха / запрос'
+        )
+        for view, shape, count, total, longest in rows[:options['top']]:
+            share = total / grand_total if grand_total else 0
+            self.stdout.write(
+                f'{total * 1000:11.1f} {share:6.1%} {count:7d} '
+                f'{total / count * 1000:10.2f} {longest * 1000:10.2f}  '
+                + self.style.MIGRATE_HEADING(view)
+            )
+            if shape:
+                self.stdout.write(f'{"":>49}{shape}')
+
+    @staticmethod
+    def group_by_view(rows):
+        grouped = defaultdict(lambda: [0, 0.0, 0.0])
+        for view, _, count, total, longest in rows:
+            entry = grouped[view]
+            entry[0] += count
+            entry[1] += total
+            entry[2] = max(entry[2], longest)
+        return [
+            (view, '', count, total, longest)
+            for view, (count, total, longest) in grouped.items()
+        ]
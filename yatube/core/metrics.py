@@ -0,0 +1,248 @@
+"""Метрики запросов по вьюхам в формате Prometheus.
+
+На каждый запрос ``MetricsMiddleware`` заводит в потоке счётчики фаз:
+время и число SQL-запросов, время отрисовки шаблонов и работы с
+миниатюрами. По окончании запроса они попадают в гистограммы вьюхи
+внутри процесса; ``/metrics`` отдаёт их вместе со счётчиками кэшей
+и пулов. У каждого процесса свои гистограммы.
+
+Фазы пересекаются: время шаблона включает запросы и миниатюры,
+выполненные во время отрисовки.
+"""
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+# Границы корзин гистограмм: секунды и число запросов.
+TIME_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+HISTOGRAMS = (
+    ('duration_seconds', TIME_BUCKETS, 'Время обработки запроса.'),
+    ('db_seconds', TIME_BUCKETS, 'Время SQL-запросов за запрос.'),
+    ('queries', QUERY_BUCKETS, 'Число SQL-запросов за запрос.'),
+    ('template_seconds', TIME_BUCKETS, 'Время отрисовки шаблонов.'),
+    ('thumbnail_seconds', TIME_BUCKETS,
+     'Время поиска и подготовки миниатюр.'),
+)
+PREFIX = 'yatube_request_'
+
+_state = threading.local()
+_installed = False
+_install_lock = threading.Lock()
+_collectors = []
+
+
+class RequestTimings:
+    __slots__ = ('db', 'queries', 'template', 'thumbnail', 'active')
+
+    def __init__(self):
+        self.db = 0.0
+        self.queries = 0
+        self.template = 0.0
+        self.thumbnail = 0.0
+        # Фазы, внутри которых сейчас идёт выполнение.
+        self.active = ()
+
+
+def start_request():
+    _state.timings = RequestTimings()
+    return _state.timings
+
+
+def finish_request():
+    _state.timings = None
+
+
+def execute_timer(execute, sql, params, many, context):
+    timings = getattr(_state, 'timings', None)
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db += time.perf_counter() - started
+        timings.queries += 1
+
+
+def timed(phase):
+    """Декоратор: время вызова идёт в фазу ``phase`` текущего запроса.
+
+    Вложенные вызовы той же фазы не считаются второй раз.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            timings = getattr(_state, 'timings', None)
+            if timings is None or phase in timings.active:
+                return func(*args, **kwargs)
+            active = timings.active
+            timings.active = active + (phase,)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                setattr(timings, phase, getattr(timings, phase) + elapsed)
+                timings.active = active
+        return wrapper
+    return decorator
+
+
+def add_execute_timer(sender, connection, **kwargs):
+    # В начало списка: QueryRecorder снимает свою обёртку через pop().
+    if execute_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, execute_timer)
+
+
+def install():
+    """Подключает таймеры к соединениям с базой и к шаблонам."""
+    global _installed
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+    from django.template.base import Template
+
+    with _install_lock:
+        if _installed:
+            return
+        connection_created.connect(add_execute_timer)
+        for connection in connections.all():
+            if connection.connection is not None:
+                add_execute_timer(None, connection)
+        Template.render = timed('template')(Template.render)
+        _installed = True
+
+
+class Histogram:
+    """Гистограмма Prometheus; вызывающий держит блокировку."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class ViewMetrics:
+    def __init__(self):
+        # В порядке HISTOGRAMS.
+        self.histograms = tuple(
+            Histogram(buckets) for _, buckets, _ in HISTOGRAMS
+        )
+        self.responses = {}
+
+
+class RequestMetrics:
+    """Гистограммы запросов по именам вьюх."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.views = {}
+
+    def record(self, view, status, duration, timings):
+        values = (duration, timings.db, timings.queries, timings.template,
+                  timings.thumbnail)
+        with self._lock:
+            metrics = self.views.get(view)
+            if metrics is None:
+                metrics = self.views[view] = ViewMetrics()
+            for histogram, value in zip(metrics.histograms, values):
+                histogram.counts[bisect_left(histogram.buckets, value)] += 1
+                histogram.sum += value
+            metrics.responses[status] = metrics.responses.get(status, 0) + 1
+
+    def histogram(self, view, name):
+        """Гистограмма ``name`` из HISTOGRAMS для вьюхи ``view``."""
+        names = [histogram_name for histogram_name, _, _ in HISTOGRAMS]
+        return self.views[view].histograms[names.index(name)]
+
+    def reset(self):
+        with self._lock:
+            self.views = {}
+
+    def exposition(self):
+        """Строки гистограмм и счётчика ответов в формате Prometheus."""
+        with self._lock:
+            views = {
+                view: (
+                    [(list(histogram.cumulative()), histogram.sum)
+                     for histogram in metrics.histograms],
+                    dict(metrics.responses),
+                )
+                for view, metrics in self.views.items()
+            }
+        lines = []
+        for index, (name, _, help_text) in enumerate(HISTOGRAMS):
+            metric = PREFIX + name
+            lines += [f'# HELP {metric} {help_text}',
+                      f'# TYPE {metric} histogram']
+            for view, (histograms, _) in sorted(views.items()):
+                buckets, total = histograms[index]
+                label = f'view="{escape(view)}"'
+                lines += [
+                    f'{metric}_bucket{{{label},le="{bound}"}} {count}'
+                    for bound, count in buckets
+                ]
+                lines.append(f'{metric}_sum{{{label}}} {total:.6f}')
+                lines.append(f'{metric}_count{{{label}}} {buckets[-1][1]}')
+        metric = PREFIX.rstrip('_') + 's_total'
+        lines += [f'# HELP {metric} Ответы по вьюхам и кодам.',
+                  f'# TYPE {metric} counter']
+        for view, (_, responses) in sorted(views.items()):
+            for status, count in sorted(responses.items()):
+                lines.append(
+                    f'{metric}{{view="{escape(view)}",status="{status}"}} '
+                    f'{count}'
+                )
+        return lines
+
+
+registry = RequestMetrics()
+
+
+def escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def register_stats(name, collect, label=None):
+    """Добавляет в /metrics счётчики ``collect()``.
+
+    ``collect`` возвращает ``{имя: число}`` или, если задан ``label``,
+    ``{значение метки: {имя: число}}``. Значения None пропускаются.
+    """
+    _collectors.append((name, collect, label))
+
+
+def stats_lines(name, collect, label):
+    stats = collect()
+    groups = stats.items() if label else [(None, stats)]
+    samples = {}
+    for label_value, values in groups:
+        labels = f'{{{label}="{escape(label_value)}"}}' if label else ''
+        for key, value in values.items():
+            if value is not None:
+                samples.setdefault(key, []).append(f'{labels} {value}')
+    lines = []
+    for key, values in samples.items():
+        metric = f'yatube_{name}_{key}'
+        lines.append(f'# TYPE {metric} gauge')
+        lines += [metric + value for value in values]
+    return lines
+
+
+def exposition():
+    """Все метрики процесса текстом для Prometheus."""
+    lines = registry.exposition()
+    for name, collect, label in _collectors:
+        lines += stats_lines(name, collect, label)
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+
+from core import metrics
+
+# Метка для запросов, не дошедших до вьюхи (например, 404 в URLconf).
+UNRESOLVED_VIEW = 'unresolved'
+
+
+class MetricsMiddleware:
+    """Записывает время и запросы каждого запроса в гистограммы вьюхи.
+
+    Ставится первым, чтобы время включало остальные middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if settings.METRICS_ENABLED:
+            metrics.install()
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+        timings = metrics.start_request()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request()
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match is not None else UNRESOLVED_VIEW
+        metrics.registry.record(
+            view, response.status_code, duration, timings
+        )
+        return response
@@ -0,0 +1,59 @@
+import logging
+
+from django.conf import settings
+
+from core.querycount import QueryBudgetExceeded, QueryRecorder
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_HEADER = 'X-Query-Count'
+
+
+class QueryBudgetMiddleware:
+    """Считает SQL-запросы каждого запроса и сверяет их с бюджетом.
+
+    Бюджет берётся из декоратора ``query_budget`` на вьюхе или из
+    ``QUERY_BUDGET_DEFAULT``. Превышение и повторяющиеся формы
+    запросов пишутся в лог, а при ``QUERY_BUDGET_RAISE`` превышение
+    бюджета поднимает ``QueryBudgetExceeded`` — так его ловят тесты.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_BUDGET_ENABLED:
+            return self.get_response(request)
+        request.query_budget = settings.QUERY_BUDGET_DEFAULT
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        response[QUERY_COUNT_HEADER] = str(recorder.count)
+        self.check(request, recorder)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        budget = getattr(view_func, 'query_budget', None)
+        if budget is not None:
+            request.query_budget = budget
+
+    def check(self, request, recorder):
+        repeated = recorder.repeated(settings.QUERY_BUDGET_REPEAT_THRESHOLD)
+        for shape, times in repeated:
+            logger.warning(
+                'Возможный N+1 в %s: запрос выполнен %s раз: %s',
+                request.path, times, shape,
+            )
+        budget = getattr(request, 'query_budget', None)
+        if budget is None or recorder.count <= budget:
+            return
+        message = (
+            f'{request.path}: {recorder.count} SQL-запросов '
+            f'при бюджете {budget}'
+        )
+        if repeated:
+            message += '; повторяются: ' + '; '.join(
+                f'{times}× {shape}' for shape, times in repeated
+            )
+        if settings.QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+
+from core import db_router
+
+PIN_SESSION_KEY = '_db_pinned_until'
+
+
+class ReplicaRoutingMiddleware:
+    """Включает чтение с реплик и закрепляет пишущего за основной базой.
+
+    Ставится после ``AuthenticationMiddleware``: метка закрепления
+    хранится в сессии, которую сохраняет внешний ``SessionMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        session = getattr(request, 'session', None)
+        pinned_until = session.get(PIN_SESSION_KEY, 0) if session else 0
+        db_router.start_request(pinned=pinned_until > time.time())
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = db_router.finish_request()
+        if wrote and session is not None:
+            session[PIN_SESSION_KEY] = (
+                time.time() + settings.REPLICA_PIN_SECONDS
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'replica_reads', False):
+            db_router.allow_replicas()
@@ -0,0 +1,52 @@
+import logging
+import random
+
+from django.conf import settings
+
+from core.sampling import SamplingProfiler, rotate
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_FILE_HEADER = 'X-Profile-File'
+
+
+class SamplingProfilerMiddleware:
+    """Профилирует отдельные запросы и сохраняет стеки в файл.
+
+    Запрос профилируется, если сотрудник прислал заголовок
+    ``X-Profile: 1`` или он попал в долю ``SAMPLING_PROFILER_RATE``.
+    В каталоге остаются ``SAMPLING_PROFILER_KEEP`` последних файлов.
+    Ставится после ``AuthenticationMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        requested = self.requested(request)
+        rate = settings.SAMPLING_PROFILER_RATE
+        if not requested and not (rate and random.random() < rate):
+            return self.get_response(request)
+        with SamplingProfiler(settings.SAMPLING_PROFILER_INTERVAL) as profiler:
+            response = self.get_response(request)
+        if not profiler.samples:
+            return response
+        match = request.resolver_match
+        path = profiler.dump(
+            settings.SAMPLING_PROFILER_DIR,
+            match.view_name if match is not None else 'unresolved',
+        )
+        rotate(settings.SAMPLING_PROFILER_DIR, settings.SAMPLING_PROFILER_KEEP)
+        logger.info('%s: %s снимков стека в %s',
+                    request.path, profiler.samples, path)
+        if requested:
+            response[PROFILE_FILE_HEADER] = path
+        return response
+
+    @staticmethod
+    def requested(request):
+        if request.META.get(PROFILE_HEADER) != '1':
+            return False
+        user = getattr(request, 'user', None)
+        return bool(user and user.is_active and user.is_staff)
@@ -0,0 +1,26 @@
+from django.conf import settings
+
+from core import sqlstats
+
+
+class SQLStatsMiddleware:
+    """Помечает SQL-запросы в сводке ``sql_report`` вьюхой запроса.
+
+    Не зависит от ``MetricsMiddleware``: метки есть и с выключенными
+    метриками.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.SQL_STATS_ENABLED:
+            return self.get_response(request)
+        try:
+            return self.get_response(request)
+        finally:
+            sqlstats.set_view(None)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if settings.SQL_STATS_ENABLED:
+            sqlstats.set_view(request.resolver_match.view_name)
@@ -0,0 +1,43 @@
+import logging
+
+from django.conf import settings
+
+from core.templateprofile import TemplateProfiler, install
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING_HEADER = 'Server-Timing'
+
+
+class TemplateProfileMiddleware:
+    """Сообщает о самых медленных узлах шаблонов каждого запроса.
+
+    Сводка уходит в лог и в заголовок ``Server-Timing``, который
+    показывают инструменты разработчика браузера.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if settings.TEMPLATE_PROFILE_ENABLED:
+            install(settings.TEMPLATE_PROFILE_NODES)
+
+    def __call__(self, request):
+        if not settings.TEMPLATE_PROFILE_ENABLED:
+            return self.get_response(request)
+        with TemplateProfiler() as profiler:
+            response = self.get_response(request)
+        slowest = profiler.slowest(settings.TEMPLATE_PROFILE_TOP)
+        if slowest:
+            response[SERVER_TIMING_HEADER] = ', '.join(
+                f'tpl{number};dur={timing.total:.2f};desc="{timing.count}x '
+                + timing.label.replace('"', "'") + '"'
+                for number, timing in enumerate(slowest, 1)
+            )
+            logger.info(
+                '%s: медленные узлы шаблонов: %s', request.path, '; '.join(
+                    f'{timing.label} {timing.total:.2f} мс '
+                    f'за {timing.count}×'
+                    for timing in slowest
+                ),
+            )
+        return response
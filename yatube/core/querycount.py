@@ -0,0 +1,86 @@
+"""Учёт SQL-запросов одного запроса к сайту.
+
+``QueryRecorder`` подключается к курсорам всех баз через
+``connection.execute_wrapper`` и собирает выполненные запросы.
+Запросы сравниваются по «форме» — тексту SQL без значений, поэтому
+одинаковые запросы для разных строк (типичный N+1) видны сразу.
+"""
+import re
+import time
+from collections import Counter, namedtuple
+from contextlib import ExitStack
+
+from django.db import connections
+
+RecordedQuery = namedtuple('RecordedQuery', 'sql fingerprint duration')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def fingerprint(sql):
+    """Форма запроса: литералы заменены на ``?``, списки IN свёрнуты."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def query_budget(limit):
+    """Объявляет для вьюхи предельное число SQL-запросов.
+
+    Декоратор ставится самым внешним, чтобы атрибут остался
+    на функции, которую вызывает Django.
+    """
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+class QueryRecorder:
+    """Контекстный менеджер, записывающий запросы ко всем базам."""
+
+    def __init__(self):
+        self.queries = []
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(RecordedQuery(
+                sql, fingerprint(sql), time.perf_counter() - start
+            ))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def repeated(self, threshold):
+        """Формы чтений, выполненные не меньше ``threshold`` раз."""
+        shapes = Counter(
+            query.fingerprint for query in self.queries
+            if query.fingerprint.startswith('SELECT')
+        )
+        return [
+            (shape, times) for shape, times in shapes.most_common()
+            if times >= threshold
+        ]
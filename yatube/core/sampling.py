@@ -0,0 +1,126 @@
+"""Сэмплирующий профилировщик одного потока.
+
+Фоновый поток раз в ``interval`` секунд снимает стек профилируемого
+потока через ``sys._current_frames`` и считает одинаковые стеки.
+Код запроса ничем не оборачивается, поэтому накладные расходы
+зависят от частоты снимков, а не от числа вызовов. Результат
+пишется в свёрнутом формате flamegraph.pl и speedscope: по строке
+``кадр;кадр;кадр число`` на стек, от корня к листу.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+_labels = {}
+
+
+def frame_label(code):
+    """Короткое имя кадра: путь от корня проекта или пакета и функция."""
+    label = _labels.get(code)
+    if label is None:
+        path = code.co_filename
+        base = settings.BASE_DIR + os.sep
+        if path.startswith(base):
+            path = path[len(base):]
+        else:
+            _, found, tail = path.rpartition('site-packages' + os.sep)
+            path = tail if found else os.path.basename(path)
+        label = _labels[code] = f'{path}:{code.co_name}'
+    return label
+
+
+def collapse(frame):
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return ';'.join(labels)
+
+
+class Sampler(threading.Thread):
+    """Снимает стеки потока ``thread_id``, пока не вызван ``stop``."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.finished = threading.Event()
+
+    def run(self):
+        while not self.finished.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            self.stacks[collapse(frame)] += 1
+            del frame
+
+    def stop(self):
+        self.finished.set()
+        self.join()
+        return self.stacks
+
+
+class SamplingProfiler:
+    """Контекстный менеджер, профилирующий текущий поток."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self._sampler = None
+
+    def __enter__(self):
+        self._sampler = Sampler(threading.get_ident(), self.interval)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stacks = self._sampler.stop()
+
+    @property
+    def samples(self):
+        return sum(self.stacks.values())
+
+    def dump(self, directory, name):
+        """Пишет стеки в ``directory``; возвращает путь к файлу."""
+        os.makedirs(directory, exist_ok=True)
+        now = time.time()
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(now))
+        stamp += f'.{int(now * 1000) % 1000:03d}'
+        safe_name = ''.join(
+            char if char.isalnum() or char in '-_' else '_' for char in name
+        )
+        path = os.path.join(
+            directory, f'{stamp}-{safe_name}-{os.getpid()}-'
+            f'{threading.get_ident()}.collapsed'
+        )
+        with open(path, 'w') as output:
+            for stack, count in self.stacks.most_common():
+                output.write(f'{stack} {count}\n')
+        return path
+
+
+def rotate(directory, keep):
+    """Оставляет в ``directory`` только ``keep`` последних профилей.
+
+    Имена файлов начинаются с времени записи, поэтому самые старые
+    идут первыми по алфавиту. Файл могут одновременно удалить другие
+    процессы.
+    """
+    try:
+        names = sorted(
+            name for name in os.listdir(directory)
+            if name.endswith('.collapsed')
+        )
+    except FileNotFoundError:
+        return
+    for name in names[:max(len(names) - keep, 0)]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,140 @@
+"""Простые HTTP-серверы для сравнения WSGI и ASGI в замерах.
+
+``PooledWSGIServer`` отдаёт каждое соединение потоку из пула на всё
+время его жизни, как синхронный воркер с потоками.
+``AsyncHTTPServer`` читает запросы и пишет ответы в цикле событий
+и передаёт их ASGI-приложению. Оба сервера только для замеров.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from socketserver import ThreadingMixIn
+from urllib.parse import unquote
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+# Сколько ждать строку запроса и заголовки от клиента.
+HEADERS_TIMEOUT = 30
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class PooledWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+    def __init__(self, address, app, threads):
+        super().__init__(address, QuietWSGIRequestHandler)
+        self.set_app(app)
+        self.executor = ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(
+            self.process_request_thread, request, client_address
+        )
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False)
+
+
+class AsyncHTTPServer:
+    """HTTP/1.0 без keep-alive поверх ``asyncio.start_server``."""
+
+    def __init__(self, app, host='127.0.0.1', port=0):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.server = None
+
+    def start(self):
+        """Запускает цикл событий в фоновом потоке; возвращает порт."""
+        self.thread.start()
+        self.server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self.handle, self.host, self.port),
+            self.loop,
+        ).result()
+        return self.server.sockets[0].getsockname()[1]
+
+    def stop(self):
+        async def close():
+            self.server.close()
+            await self.server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    async def handle(self, reader, writer):
+        try:
+            scope, body = await asyncio.wait_for(
+                self.read_request(reader, writer), HEADERS_TIMEOUT
+            )
+        except (asyncio.TimeoutError, ValueError, ConnectionError):
+            writer.close()
+            return
+        messages = [{'type': 'http.request', 'body': body}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status = HTTPStatus(message['status'])
+                lines = [f'HTTP/1.0 {status.value} {status.phrase}'.encode()]
+                lines += [
+                    name + b': ' + value for name, value in message['headers']
+                ]
+                lines.append(b'Connection: close')
+                writer.write(b'\r\n'.join(lines) + b'\r\n\r\n')
+            else:
+                writer.write(message.get('body', b''))
+            await writer.drain()
+
+        try:
+            await self.app(scope, receive, send)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def read_request(reader, writer):
+        request_line = (await reader.readline()).decode('latin-1').split()
+        if len(request_line) != 3:
+            raise ValueError('Некорректная строка запроса')
+        method, target, version = request_line
+        headers = []
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers.append((
+                name.strip().lower().encode('latin-1'),
+                value.strip().encode('latin-1'),
+            ))
+        length = int(dict(headers).get(b'content-length', 0))
+        body = await reader.readexactly(length) if length else b''
+        path, _, query = target.partition('?')
+        scope = {
+            'type': 'http',
+            'http_version': version.split('/')[-1],
+            'method': method,
+            'scheme': 'http',
+            'path': unquote(path),
+            'raw_path': path.encode('latin-1'),
+            'root_path': '',
+            'query_string': query.encode('latin-1'),
+            'headers': headers,
+            'server': writer.get_extra_info('sockname')[:2],
+            'client': writer.get_extra_info('peername')[:2],
+        }
+        return scope, body
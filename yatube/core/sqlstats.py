@@ -0,0 +1,217 @@
+"""Сводка SQL-запросов процесса по формам и вьюхам, журнал медленных.
+
+Обёртка курсора подключается к каждому соединению при его открытии и
+для каждой пары «вьюха, форма запроса» копит число выполнений,
+суммарное и наибольшее время. Форма считается ``fingerprint`` из
+``core.querycount``; она запоминается по тексту SQL, поэтому разбор
+регулярными выражениями идёт только для новых текстов. Запросы
+дольше ``SLOW_QUERY_THRESHOLD_MS`` пишутся в лог вместе с вьюхой.
+
+Раз в ``SQL_STATS_FLUSH_SECONDS`` по окончании запроса сводка процесса
+сохраняется в ``SQL_STATS_DIR/<pid>.json``; команда ``sql_report``
+объединяет файлы всех процессов. Вьюху запроса отмечает
+``SQLStatsMiddleware``.
+
+``sql_report --reset`` удаляет файлы и оставляет в каталоге метку
+сброса: процесс, увидев новую метку при сохранении, обнуляет свою
+сводку, а не возвращает в каталог накопленное до сброса.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from .querycount import fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Метка запросов вне запроса к сайту или до разбора URL.
+NO_VIEW = '-'
+SLOW_SQL_MAX_LENGTH = 2000
+# Сколько текстов SQL помнить; при переполнении память сбрасывается.
+FINGERPRINT_CACHE_SIZE = 4096
+RESET_MARKER = 'reset'
+
+_fingerprints = {}
+_stats = {}
+_lock = threading.Lock()
+_state = threading.local()
+_installed = False
+_next_flush = 0.0
+# Метки сброса по каталогам, которые процесс уже учёл.
+_seen_reset = {}
+
+
+def shape_of(sql):
+    shape = _fingerprints.get(sql)
+    if shape is None:
+        if len(_fingerprints) >= FINGERPRINT_CACHE_SIZE:
+            _fingerprints.clear()
+        shape = _fingerprints[sql] = fingerprint(sql)
+    return shape
+
+
+def set_view(view):
+    _state.view = view
+
+
+def current_view():
+    """Вьюха запроса, который выполняется в этом потоке, или None."""
+    return getattr(_state, 'view', None)
+
+
+def record(sql, duration):
+    view = current_view() or NO_VIEW
+    key = (view, shape_of(sql))
+    with _lock:
+        entry = _stats.get(key)
+        if entry is None:
+            _stats[key] = [1, duration, duration]
+        else:
+            entry[0] += 1
+            entry[1] += duration
+            if duration > entry[2]:
+                entry[2] = duration
+    if duration * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+        logger.warning(
+            'Медленный запрос %.1f мс во вьюхе %s: %s',
+            duration * 1000, view, sql[:SLOW_SQL_MAX_LENGTH],
+        )
+
+
+def execute_logger(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record(sql, time.perf_counter() - started)
+
+
+def add_execute_logger(sender, connection, **kwargs):
+    # В начало списка: QueryRecorder снимает свою обёртку через pop().
+    if execute_logger not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, execute_logger)
+
+
+def snapshot():
+    """Строки сводки ``(вьюха, форма, число, сумма с, максимум с)``."""
+    with _lock:
+        return [
+            (view, shape, count, total, longest)
+            for (view, shape), (count, total, longest) in _stats.items()
+        ]
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def stats_path(directory, pid=None):
+    return os.path.join(directory, f'{pid or os.getpid()}.json')
+
+
+def read_reset_marker(directory):
+    try:
+        with open(os.path.join(directory, RESET_MARKER)) as marker:
+            return marker.read()
+    except OSError:
+        return None
+
+
+def reset_directory(directory):
+    """Удаляет сводки процессов и ставит метку сброса."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, RESET_MARKER)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w') as marker:
+        marker.write(repr(time.time()))
+    os.replace(temporary, path)
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def flush():
+    """Сохраняет сводку процесса в ``SQL_STATS_DIR``."""
+    global _next_flush
+    _next_flush = time.monotonic() + settings.SQL_STATS_FLUSH_SECONDS
+    directory = settings.SQL_STATS_DIR
+    marker = read_reset_marker(directory)
+    if _seen_reset.setdefault(directory, marker) != marker:
+        # Каталог сбросили: накопленное до сброса не сохраняем.
+        _seen_reset[directory] = marker
+        reset()
+        return
+    rows = snapshot()
+    if not rows:
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = stats_path(directory)
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as output:
+        json.dump({'pid': os.getpid(), 'saved': time.time(),
+                   'queries': rows}, output)
+    os.replace(temporary, path)
+
+
+def flush_if_due(**kwargs):
+    if time.monotonic() >= _next_flush:
+        try:
+            flush()
+        except OSError:
+            logger.exception('Не удалось сохранить сводку SQL-запросов')
+
+
+def load(directory):
+    """Объединяет сводки всех процессов из ``directory``."""
+    merged = {}
+    if not os.path.isdir(directory):
+        return []
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as source:
+                rows = json.load(source)['queries']
+        except (OSError, ValueError, KeyError):
+            continue
+        for view, shape, count, total, longest in rows:
+            entry = merged.setdefault((view, shape), [0, 0.0, 0.0])
+            entry[0] += count
+            entry[1] += total
+            entry[2] = max(entry[2], longest)
+    return [
+        (view, shape, count, total, longest)
+        for (view, shape), (count, total, longest) in merged.items()
+    ]
+
+
+def install():
+    """Подключает учёт к соединениям с базой; повторный вызов безопасен."""
+    global _installed, _next_flush
+    from django.core.signals import request_finished
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    if _installed:
+        return
+    _installed = True
+    connection_created.connect(add_execute_logger)
+    for connection in connections.all():
+        if connection.connection is not None:
+            add_execute_logger(None, connection)
+    # Сбросы до запуска процесса его сводки не касаются.
+    _seen_reset[settings.SQL_STATS_DIR] = read_reset_marker(
+        settings.SQL_STATS_DIR
+    )
+    # Первое сохранение — не раньше, чем через интервал: короткие
+    # процессы вроде команд управления файлов не оставляют.
+    _next_flush = time.monotonic() + settings.SQL_STATS_FLUSH_SECONDS
+    request_finished.connect(flush_if_due)
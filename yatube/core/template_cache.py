@@ -0,0 +1,80 @@
+"""Предзагрузка шаблонов проекта в кэширующий загрузчик.
+
+В рабочем режиме (``TEMPLATE_CACHE``) шаблоны из ``DIRS`` компилируются
+при старте процесса, и первый запрос не платит за чтение и разбор
+файлов. Заодно находятся шаблоны, которые не компилируются, и
+``{% include %}``/``{% extends %}`` на несуществующие шаблоны.
+"""
+import logging
+import os
+
+from django.conf import settings
+from django.template import (TemplateDoesNotExist, TemplateSyntaxError,
+                             engines)
+from django.template.loader_tags import ExtendsNode, IncludeNode
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_EXTENSIONS = ('.html', '.txt')
+
+
+def template_names(engine):
+    """Имена всех шаблонов из каталогов ``DIRS`` движка."""
+    names = []
+    for directory in engine.engine.dirs:
+        for root, _, files in os.walk(directory):
+            for file_name in files:
+                if file_name.endswith(TEMPLATE_EXTENSIONS):
+                    path = os.path.relpath(
+                        os.path.join(root, file_name), directory
+                    )
+                    names.append(path.replace(os.sep, '/'))
+    return sorted(names)
+
+
+def referenced_names(template):
+    """Имена шаблонов, подключаемых по строковому литералу."""
+    nodelist = template.template.nodelist
+    expressions = [
+        node.template for node in nodelist.get_nodes_by_type(IncludeNode)
+    ] + [
+        node.parent_name for node in nodelist.get_nodes_by_type(ExtendsNode)
+    ]
+    return [
+        expression.var for expression in expressions
+        if isinstance(expression.var, str) and not expression.filters
+    ]
+
+
+def load_templates(engine=None):
+    """Компилирует шаблоны проекта; возвращает число и список проблем."""
+    engine = engine or engines['django']
+    loaded, problems = 0, []
+    for name in template_names(engine):
+        try:
+            template = engine.get_template(name)
+        except TemplateSyntaxError as error:
+            problems.append((name, f'не компилируется: {error}'))
+            continue
+        loaded += 1
+        for reference in referenced_names(template):
+            try:
+                engine.get_template(reference)
+            except TemplateDoesNotExist:
+                problems.append(
+                    (name, f'подключает отсутствующий шаблон {reference}')
+                )
+            except TemplateSyntaxError:
+                # Об ошибке в самом шаблоне сообщит его собственная проверка.
+                pass
+    return loaded, problems
+
+
+def preload_templates():
+    """Прогревает кэш шаблонов при старте процесса в рабочем режиме."""
+    if not settings.TEMPLATE_CACHE:
+        return 0
+    loaded, problems = load_templates()
+    for name, problem in problems:
+        logger.warning('Шаблон %s %s', name, problem)
+    return loaded
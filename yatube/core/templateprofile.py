@@ -0,0 +1,95 @@
+"""Замер времени отрисовки узлов шаблонов внутри одного запроса.
+
+Методы ``render`` классов из ``TEMPLATE_PROFILE_NODES`` один раз
+оборачиваются таймером. Время узла включает вложенные в него узлы,
+поэтому ``{% include %}`` карточки содержит и её ``{% thumbnail %}``.
+"""
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+from django.utils.module_loading import import_string
+
+NodeTiming = namedtuple('NodeTiming', 'label count total max')
+
+_state = threading.local()
+_installed = set()
+_install_lock = threading.Lock()
+
+
+def node_label(node):
+    """Короткое описание узла: тег, аргумент и место в шаблоне."""
+    name = type(node).__name__
+    if name == 'IncludeNode':
+        detail = f'include {node.template.token}'
+    elif name == 'SimpleNode':
+        detail = node.func.__name__
+    elif name == 'ThumbnailNode':
+        detail = f'thumbnail {node.geometry.token}'
+    else:
+        detail = name
+    origin = getattr(node, 'origin', None)
+    token = getattr(node, 'token', None)
+    if origin is not None and token is not None:
+        return f'{detail} ({origin.template_name}:{token.lineno})'
+    return detail
+
+
+def _timed(render):
+    def wrapper(self, context):
+        timings = getattr(_state, 'timings', None)
+        if timings is None:
+            return render(self, context)
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            timings.append(
+                (self, (time.perf_counter() - started) * 1000)
+            )
+    wrapper.__wrapped__ = render
+    return wrapper
+
+
+def install(paths):
+    """Оборачивает ``render`` классов узлов; повторный вызов безопасен.
+
+    Классы, которые не удалось импортировать, например из
+    неустановленного приложения, пропускаются.
+    """
+    with _install_lock:
+        for path in paths:
+            if path in _installed:
+                continue
+            try:
+                node_class = import_string(path)
+            except ImportError:
+                continue
+            node_class.render = _timed(node_class.render)
+            _installed.add(path)
+
+
+class TemplateProfiler:
+    """Контекстный менеджер, собирающий время узлов в текущем потоке."""
+
+    def __init__(self):
+        self.timings = []
+
+    def __enter__(self):
+        _state.timings = self.timings
+        return self
+
+    def __exit__(self, *exc_info):
+        _state.timings = None
+
+    def slowest(self, limit=5):
+        """Узлы по убыванию суммарного времени; одинаковые сложены."""
+        grouped = defaultdict(list)
+        for node, duration in self.timings:
+            grouped[node_label(node)].append(duration)
+        result = [
+            NodeTiming(label, len(durations), sum(durations), max(durations))
+            for label, durations in grouped.items()
+        ]
+        result.sort(key=lambda timing: timing.total, reverse=True)
+        return result[:limit]
@@ -0,0 +1,78 @@
+import asyncio
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from ..asgi import WsgiToAsgi
+
+
+def echo_app(environ, start_response):
+    start_response('201 Created', [('Content-Type', 'text/plain')])
+    return [
+        environ['PATH_INFO'].encode('latin-1'), b'|',
+        environ['QUERY_STRING'].encode(), b'|',
+        environ['HTTP_X_TAG'].encode(), b'|',
+        environ['wsgi.input'].read(),
+    ]
+
+
+def call(app, scope, chunks=(b'',)):
+    scope = {
+        'type': 'http', 'method': 'GET', 'path': '/', 'query_string': b'',
+        'headers': [], **scope,
+    }
+    messages = [
+        {'type': 'http.request', 'body': chunk,
+         'more_body': number < len(chunks) - 1}
+        for number, chunk in enumerate(chunks)
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent
+
+
+class WsgiToAsgiTests(SimpleTestCase):
+    def test_request_translated_to_environ(self):
+        sent = call(WsgiToAsgi(echo_app, max_workers=1), {
+            'method': 'POST',
+            'path': '/посты/',
+            'query_string': b'q=1',
+            'headers': [(b'x-tag', b'a'), (b'x-tag', b'b')],
+        }, chunks=(b'te', b'xt'))
+        self.assertEqual(sent[0]['status'], 201)
+        self.assertIn((b'content-type', b'text/plain'), sent[0]['headers'])
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertEqual(body.decode(), '/посты/|q=1|a,b|text')
+        self.assertFalse(sent[-1].get('more_body', False))
+
+    def test_django_application(self):
+        sent = call(WsgiToAsgi(WSGIHandler(), max_workers=1), {
+            'path': reverse('about:author'),
+            'headers': [(b'host', b'testserver')],
+        })
+        self.assertEqual(sent[0]['status'], 200)
+
+    def test_lifespan(self):
+        messages = [
+            {'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'},
+        ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(WsgiToAsgi(echo_app)({'type': 'lifespan'}, receive, send))
+        self.assertEqual(
+            sent, ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+        )
@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import SimpleTestCase, TransactionTestCase
+
+from ..cache_backends import SQLiteCache
+from ..caching import (bump_generation, bump_generation_on_commit,
+                       get_or_build, get_generation, versioned_key)
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_basic_operations(self):
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new', 'value'))
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': 2})
+        self.cache.delete('a')
+        self.assertFalse(self.cache.has_key('a'))
+        self.assertIsNone(self.cache.get('missing'))
+
+    def test_expired_values_are_not_returned(self):
+        self.cache.set('key', 'value', timeout=0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'again'))
+
+    def test_instances_share_one_file(self):
+        other = SQLiteCache(self.path, {})
+        self.cache.set('shared', 'value')
+        self.assertEqual(other.get('shared'), 'value')
+        other.clear()
+        self.assertIsNone(self.cache.get('shared'))
+
+
+class CachingHelpersTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_generation_changes_keys(self):
+        key = versioned_key('feeds', 'index')
+        self.assertEqual(key, versioned_key('feeds', 'index'))
+        bump_generation('feeds')
+        self.assertNotEqual(key, versioned_key('feeds', 'index'))
+
+    def test_get_or_build_builds_once_under_concurrency(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(get_or_build('hot', build, 60))
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value'] * 5)
+        self.assertEqual(len(calls), 1)
+
+
+class BumpOnCommitTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_page_cached_before_commit_is_dropped(self):
+        before = get_generation('feeds')
+        with transaction.atomic():
+            bump_generation_on_commit('feeds')
+            # Читатель видит новое поколение, но ещё старые данные.
+            stale_key = versioned_key('feeds', 'index')
+            self.assertNotEqual(get_generation('feeds'), before)
+        self.assertNotEqual(versioned_key('feeds', 'index'), stale_key)
+
+    def test_rollback_keeps_single_bump(self):
+        before = get_generation('feeds')
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                bump_generation_on_commit('feeds')
+                raise ValueError
+        self.assertEqual(get_generation('feeds'), before + 1)
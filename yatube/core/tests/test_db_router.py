@@ -0,0 +1,91 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from .. import db_router
+
+User = get_user_model()
+
+REPLICA = 'replica'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Основная база — тестовая, реплика — отдельный файл SQLite.
+
+    Реплика обновляется только в ``sync_replica``, так что между
+    синхронизациями она отстаёт, как настоящая реплика.
+    """
+
+    def setUp(self):
+        self.replica_dir = tempfile.mkdtemp()
+        connections.databases[REPLICA] = {
+            **connections.databases['default'],
+            'NAME': os.path.join(self.replica_dir, 'replica.sqlite3'),
+            'TEST': {},
+        }
+        self.author = User.objects.create_user(username='author')
+        self.client = Client()
+        self.client.force_login(self.author)
+        cache.clear()
+
+    def tearDown(self):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+        shutil.rmtree(self.replica_dir, ignore_errors=True)
+        db_router.finish_request()
+
+    def sync_replica(self):
+        primary = connections['default']
+        primary.ensure_connection()
+        connections[REPLICA].close()
+        target = sqlite3.connect(connections.databases[REPLICA]['NAME'])
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+
+    def index_text(self, client):
+        return client.get(reverse('posts:index')).content.decode()
+
+    def test_feed_is_read_from_replica(self):
+        Post.objects.create(author=self.author, text='Уже на реплике')
+        self.sync_replica()
+        Post.objects.create(author=self.author, text='Ещё не доехал')
+        content = self.index_text(Client())
+        self.assertIn('Уже на реплике', content)
+        self.assertNotIn('Ещё не доехал', content)
+
+    def test_writer_reads_own_writes(self):
+        self.sync_replica()
+        self.client.post(reverse('posts:post_create'), {'text': 'Свой пост'})
+        self.assertTrue(Post.objects.filter(text='Свой пост').exists())
+        # Читатель первым кладёт в кэш страницу, собранную по реплике.
+        self.assertNotIn('Свой пост', self.index_text(Client()))
+        self.assertIn('Свой пост', self.index_text(self.client))
+
+    @override_settings(REPLICA_PIN_SECONDS=0)
+    def test_pin_expires(self):
+        self.sync_replica()
+        self.client.post(reverse('posts:post_create'), {'text': 'Свой пост'})
+        self.assertNotIn('Свой пост', self.index_text(self.client))
+
+    def test_routing_outside_marked_views(self):
+        router = db_router.ReplicaRouter()
+        self.assertEqual(router.db_for_read(Post), db_router.PRIMARY)
+        db_router.start_request(replicas_allowed=True)
+        self.assertEqual(router.db_for_read(Post), REPLICA)
+        self.assertEqual(router.db_for_read(Session), db_router.PRIMARY)
+        self.assertEqual(router.db_for_write(Post), db_router.PRIMARY)
+        self.assertEqual(router.db_for_read(Post), db_router.PRIMARY)
@@ -0,0 +1,32 @@
+from django.test import SimpleTestCase
+
+from ..lru import LRUCache
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_least_recently_used_is_evicted_by_size(self):
+        lru = LRUCache(max_size=12)
+        lru.set('a', 'xxx')
+        lru.set('b', 'xxx')
+        lru.set('c', 'xxx')
+        self.assertEqual(lru.get('a'), 'xxx')
+        lru.set('d', 'xxxxxxx')
+        self.assertIsNone(lru.get('b'))
+        self.assertIsNone(lru.get('c'))
+        self.assertEqual(lru.get('a'), 'xxx')
+        self.assertLessEqual(lru.size, 12)
+        self.assertEqual(lru.stats.as_dict()['evictions'], 2)
+
+    def test_replacing_value_keeps_size(self):
+        lru = LRUCache(max_size=100)
+        lru.set('key', 'value')
+        lru.set('key', 'longer value')
+        self.assertEqual(lru.size, len('key') + len('longer value'))
+        lru.delete('key')
+        self.assertEqual((len(lru), lru.size), (0, 0))
+
+    def test_value_larger_than_cache_is_not_stored(self):
+        lru = LRUCache(max_size=5)
+        lru.set('key', 'too long')
+        self.assertIsNone(lru.get('key'))
+        self.assertEqual(lru.size, 0)
@@ -0,0 +1,81 @@
+import functools
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from .. import metrics
+
+User = get_user_model()
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Post.objects.create(author=cls.author, text='Текст')
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+
+    def test_request_phases_recorded_per_view(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:profile', args=('author',)))
+        histogram = functools.partial(
+            metrics.registry.histogram, 'posts:index'
+        )
+        self.assertEqual(sum(histogram('duration_seconds').counts), 1)
+        self.assertGreater(histogram('queries').sum, 0)
+        self.assertGreater(histogram('db_seconds').sum, 0)
+        self.assertGreater(histogram('template_seconds').sum, 0)
+        self.assertLessEqual(
+            histogram('template_seconds').sum,
+            histogram('duration_seconds').sum,
+        )
+        self.assertIn('posts:profile', metrics.registry.views)
+
+    @override_settings(QUERY_BUDGET_ENABLED=True)
+    def test_query_recorder_keeps_timer(self):
+        self.client.get(reverse('posts:index'))
+        cache.clear()
+        self.client.get(reverse('posts:index'))
+        self.assertIn(metrics.execute_timer, connection.execute_wrappers)
+        self.assertEqual(
+            sum(metrics.registry.histogram(
+                'posts:index', 'queries'
+            ).counts[1:]),
+            2,
+        )
+
+    def test_endpoint_requires_staff_or_token(self):
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.force_login(self.staff)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        content = response.content.decode()
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"} 1', content
+        )
+        self.assertIn(
+            'yatube_requests_total{view="posts:index",status="200"} 1',
+            content,
+        )
+        self.assertIn('yatube_card_cache_misses ', content)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_endpoint_accepts_bearer_token(self):
+        self.assertEqual(self.client.get(
+            '/metrics', HTTP_AUTHORIZATION='Bearer wrong'
+        ).status_code, 403)
+        self.assertEqual(self.client.get(
+            '/metrics', HTTP_AUTHORIZATION='Bearer secret'
+        ).status_code, 200)
@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from ..middleware.query_budget import QUERY_COUNT_HEADER, QueryBudgetMiddleware
+from ..querycount import (QueryBudgetExceeded, QueryRecorder, fingerprint,
+                          query_budget)
+
+User = get_user_model()
+
+
+@query_budget(2)
+def chatty_view(request):
+    for user in User.objects.all():
+        User.objects.filter(pk=user.pk).exists()
+    return HttpResponse()
+
+
+class QueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for number in range(5):
+            User.objects.create_user(username=f'user{number}')
+
+    def run_view(self, view):
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = QueryBudgetMiddleware(get_response)
+        return middleware(RequestFactory().get('/'))
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) "
+                        "AND name = 'x'  AND n > 10"),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? AND n > ?',
+        )
+
+    def test_recorder_finds_repeated_shapes(self):
+        with QueryRecorder() as recorder:
+            for user in User.objects.all():
+                User.objects.filter(pk=user.pk).exists()
+        self.assertEqual(recorder.count, 6)
+        [(shape, times)] = recorder.repeated(3)
+        self.assertEqual(times, 5)
+        self.assertIn('WHERE "auth_user"."id" = ?', shape)
+
+    @override_settings(QUERY_BUDGET_RAISE=True)
+    def test_budget_exceeded_raises(self):
+        with self.assertLogs('core.middleware.query_budget', 'WARNING'):
+            with self.assertRaisesMessage(QueryBudgetExceeded,
+                                          'повторяются'):
+                self.run_view(chatty_view)
+
+    def test_budget_exceeded_is_logged(self):
+        with self.assertLogs('core.middleware.query_budget', 'WARNING'):
+            response = self.run_view(chatty_view)
+        self.assertEqual(response[QUERY_COUNT_HEADER], '6')
@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from ..middleware.sampling import (PROFILE_FILE_HEADER,
+                                   SamplingProfilerMiddleware)
+from ..sampling import SamplingProfiler
+
+User = get_user_model()
+
+
+def busy_view(request):
+    spin(0.05)
+    return HttpResponse()
+
+
+def spin(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class SamplingProfilerTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        settings_override = override_settings(
+            SAMPLING_PROFILER_DIR=self.directory,
+            SAMPLING_PROFILER_INTERVAL=0.001,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.middleware = SamplingProfilerMiddleware(busy_view)
+
+    def request(self, user, **headers):
+        request = RequestFactory().get('/', **headers)
+        request.user = user
+        request.resolver_match = None
+        return self.middleware(request)
+
+    def test_stacks_collapsed_from_root(self):
+        with SamplingProfiler(0.001) as profiler:
+            spin(0.05)
+        self.assertGreater(profiler.samples, 0)
+        stack = profiler.stacks.most_common(1)[0][0]
+        self.assertTrue(stack.endswith(
+            'core/tests/test_sampling.py:spin'
+        ), stack)
+        self.assertIn(
+            'core/tests/test_sampling.py:test_stacks_collapsed_from_root;',
+            stack,
+        )
+
+    def test_staff_header_writes_collapsed_file(self):
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        response = self.request(staff, HTTP_X_PROFILE='1')
+        path = response[PROFILE_FILE_HEADER]
+        self.assertEqual(os.path.dirname(path), self.directory)
+        with open(path) as collapsed:
+            lines = collapsed.read().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, count = line.rsplit(' ', 1)
+            self.assertGreater(int(count), 0)
+        self.assertTrue(any(':busy_view;' in line for line in lines))
+
+    def test_header_ignored_for_anonymous(self):
+        response = self.request(AnonymousUser(), HTTP_X_PROFILE='1')
+        self.assertFalse(response.has_header(PROFILE_FILE_HEADER))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    @override_settings(SAMPLING_PROFILER_RATE=1.0)
+    def test_sample_rate_profiles_without_header(self):
+        response = self.request(AnonymousUser())
+        self.assertFalse(response.has_header(PROFILE_FILE_HEADER))
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+    @override_settings(SAMPLING_PROFILER_RATE=1.0, SAMPLING_PROFILER_KEEP=2)
+    def test_only_latest_profiles_are_kept(self):
+        old = os.path.join(self.directory, '20000101-000000.000-old.collapsed')
+        with open(old, 'w'):
+            pass
+        for _ in range(3):
+            self.request(AnonymousUser())
+        names = os.listdir(self.directory)
+        self.assertEqual(len(names), 2)
+        self.assertNotIn(os.path.basename(old), names)
@@ -0,0 +1,118 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, connections, transaction
+from django.test import SimpleTestCase
+
+from ..db.backends.sqlite3.pool import ConnectionPool, close_pools, pool_stats
+
+ALIAS = 'tuned'
+
+
+class ScratchDatabaseTestCase(SimpleTestCase):
+    """Тесты с отдельным файлом базы под псевдонимом ``ALIAS``."""
+
+    def connect(self, **settings_dict):
+        connections.databases[ALIAS] = {
+            'ENGINE': 'core.db.backends.sqlite3',
+            'NAME': os.path.join(self.directory, 'tuned.sqlite3'),
+            **settings_dict,
+        }
+        self.addCleanup(self.disconnect)
+        return connections[ALIAS]
+
+    def disconnect(self):
+        connections[ALIAS].close()
+        del connections[ALIAS]
+        del connections.databases[ALIAS]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.addCleanup(close_pools)
+
+
+class TunedSQLiteBackendTests(ScratchDatabaseTestCase):
+    def pragma(self, connection, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_on_connect(self):
+        connection = self.connect(PRAGMAS={'busy_timeout': 1234})
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'wal')
+        # NORMAL.
+        self.assertEqual(self.pragma(connection, 'synchronous'), 1)
+        self.assertEqual(self.pragma(connection, 'busy_timeout'), 1234)
+        self.assertEqual(self.pragma(connection, 'cache_size'), -20000)
+
+    def test_none_disables_pragma(self):
+        connection = self.connect(PRAGMAS={'journal_mode': None})
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'delete')
+
+    def test_transaction_mode(self):
+        connection = self.connect(TRANSACTION_MODE='IMMEDIATE')
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            with transaction.atomic(using=ALIAS):
+                pass
+        self.assertEqual(statements[0], 'BEGIN IMMEDIATE')
+
+    def test_unknown_transaction_mode(self):
+        self.connect(TRANSACTION_MODE='LAZY')
+        with self.assertRaises(ImproperlyConfigured):
+            with transaction.atomic(using=ALIAS):
+                pass
+
+
+class ConnectionPoolTests(ScratchDatabaseTestCase):
+    def test_connection_reused_across_close(self):
+        connection = self.connect(POOL={'MAX_SIZE': 2})
+        connection.ensure_connection()
+        raw = connection.connection
+        connection.close()
+        connection.ensure_connection()
+        self.assertIs(connection.connection, raw)
+        stats = pool_stats()[ALIAS]
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_broken_connection_replaced(self):
+        connection = self.connect(POOL={})
+        connection.ensure_connection()
+        raw = connection.connection
+        connection.close()
+        raw.close()
+        connection.ensure_connection()
+        self.assertIsNot(connection.connection, raw)
+        self.assertEqual(pool_stats()[ALIAS]['failed_checks'], 1)
+
+    def test_open_transaction_rolled_back_on_release(self):
+        pool = ConnectionPool(max_size=1, timeout=1)
+        raw = pool.acquire(lambda: sqlite3.connect(
+            os.path.join(self.directory, 'pool.sqlite3'),
+            isolation_level=None, check_same_thread=False,
+        ))
+        raw.execute('CREATE TABLE item (id INTEGER)')
+        raw.execute('BEGIN')
+        raw.execute('INSERT INTO item VALUES (1)')
+        pool.release(raw)
+        self.assertIs(pool.acquire(None), raw)
+        self.assertEqual(raw.execute('SELECT COUNT(*) FROM item').fetchone(),
+                         (0,))
+
+    def test_size_capped(self):
+        pool = ConnectionPool(max_size=1, timeout=0.01)
+        pool.acquire(lambda: sqlite3.connect(':memory:'))
+        with self.assertRaises(OperationalError):
+            pool.acquire(lambda: sqlite3.connect(':memory:'))
+        self.assertEqual(pool.stats.timeouts, 1)
@@ -0,0 +1,88 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from .. import sqlstats
+
+User = get_user_model()
+
+
+class SQLStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Текст')
+
+    def setUp(self):
+        cache.clear()
+        sqlstats.reset()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def test_queries_grouped_by_view_and_shape(self):
+        for username in ('author', 'missing'):
+            self.client.get(reverse('posts:profile', args=(username,)))
+        rows = [
+            row for row in sqlstats.snapshot() if row[0] == 'posts:profile'
+        ]
+        user_lookups = [row for row in rows if '"auth_user"' in row[1]
+                        and 'WHERE "auth_user"."username" = ?' in row[1]]
+        self.assertEqual(len(user_lookups), 1)
+        self.assertGreaterEqual(user_lookups[0][2], 2)
+        for _, _, count, total, longest in rows:
+            self.assertLessEqual(longest, total)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_slow_queries_logged_with_view(self):
+        with self.assertLogs('core.sqlstats', 'WARNING') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertTrue(any(
+            'во вьюхе posts:index: SELECT' in line for line in logs.output
+        ))
+
+    def test_report_merges_process_snapshots(self):
+        self.client.get(reverse('posts:index'))
+        with override_settings(SQL_STATS_DIR=self.directory):
+            sqlstats.flush()
+            # Сводка второго процесса с теми же запросами.
+            shutil.copy(sqlstats.stats_path(self.directory),
+                        sqlstats.stats_path(self.directory, pid=1))
+            out = StringIO()
+            call_command('sql_report', '--by-view', stdout=out,
+                         no_color=True)
+        own = sum(row[2] for row in sqlstats.snapshot()
+                  if row[0] == 'posts:index')
+        merged = sum(row[2] for row in sqlstats.load(self.directory)
+                     if row[0] == 'posts:index')
+        self.assertEqual(merged, own * 2)
+        self.assertIn('posts:index', out.getvalue())
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_views_labelled_without_metrics(self):
+        self.client.get(reverse('posts:index'))
+        views = {row[0] for row in sqlstats.snapshot()}
+        self.assertIn('posts:index', views)
+        self.assertNotIn(sqlstats.NO_VIEW, views)
+
+    def test_reset_not_undone_by_live_process(self):
+        self.client.get(reverse('posts:index'))
+        with override_settings(SQL_STATS_DIR=self.directory):
+            sqlstats.flush()
+            call_command('sql_report', '--reset', stdout=StringIO())
+            self.assertEqual(sqlstats.load(self.directory), [])
+            # Процесс сайта жив и сохраняет сводку после сброса.
+            sqlstats.flush()
+            self.assertEqual(sqlstats.load(self.directory), [])
+            self.client.get(reverse('posts:profile', args=('author',)))
+            sqlstats.flush()
+        views = {row[0] for row in sqlstats.load(self.directory)}
+        self.assertIn('posts:profile', views)
+        self.assertNotIn('posts:index', views)
@@ -0,0 +1,82 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.template.backends.django import DjangoTemplates
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from ..middleware.template_profile import SERVER_TIMING_HEADER
+from ..template_cache import load_templates
+
+User = get_user_model()
+
+CACHED_LOADERS = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+    ]),
+]
+
+
+class TemplateCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def engine(self, templates):
+        for name, source in templates.items():
+            path = self.directory / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(source)
+        return DjangoTemplates({
+            'NAME': 'preload', 'DIRS': [str(self.directory)],
+            'APP_DIRS': False, 'OPTIONS': {'loaders': CACHED_LOADERS},
+        })
+
+    def test_project_templates_compile(self):
+        self.assertEqual(load_templates()[1], [])
+
+    def test_preload_fills_cached_loader(self):
+        engine = self.engine({
+            'base.html': '{% block content %}{% endblock %}',
+            'pages/page.html': (
+                '{% extends "base.html" %}'
+                '{% block content %}{% include "part.html" %}{% endblock %}'
+            ),
+            'part.html': 'часть',
+        })
+        loaded, problems = load_templates(engine)
+        self.assertEqual((loaded, problems), (3, []))
+        cache = engine.engine.template_loaders[0].get_template_cache
+        self.assertEqual(
+            {key.split('-')[0] for key in cache},
+            {'base.html', 'pages/page.html', 'part.html'},
+        )
+
+    def test_problems_reported(self):
+        engine = self.engine({
+            'broken.html': '{% block content %}',
+            'page.html': (
+                '{% include "missing.html" %}{% include name %}'
+            ),
+        })
+        loaded, problems = load_templates(engine)
+        self.assertEqual(loaded, 1)
+        self.assertEqual(
+            [name for name, _ in problems], ['broken.html', 'page.html']
+        )
+        self.assertIn('missing.html', problems[1][1])
+
+
+@override_settings(TEMPLATE_PROFILE_TOP=10)
+class TemplateProfileTests(TestCase):
+    def test_slowest_nodes_in_server_timing(self):
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Текст')
+        response = self.client.get(reverse('posts:index'))
+        timing = response[SERVER_TIMING_HEADER]
+        self.assertIn('post_card (posts/index.html', timing)
+        self.assertIn("include 'includes/paginator.html'", timing)
@@ -0,0 +1,122 @@
+"""Хранилище sorl-thumbnail с локальным индексом в памяти процесса.
+
+Поверх стандартного хранилища (кэш Django и таблица в базе) держит
+LRU записей о файлах картинок. Запись о файле не меняется, пока у
+файла то же имя, а новая загрузка получает новое имя, поэтому индекс
+не нужно сбрасывать между процессами. Списки миниатюр источника
+меняются и в индекс не попадают.
+
+``get_many`` отвечает за целую страницу: индекс, затем один
+``get_many`` к кэшу и один запрос к базе на оставшиеся ключи.
+"""
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import serialize
+from sorl.thumbnail.images import (deserialize_image_file,
+                                   serialize_image_file)
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import \
+    KVStore as CachedDBKVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .lru import LRUCache
+
+local_index = LRUCache(settings.THUMBNAIL_LOCAL_INDEX_SIZE)
+
+
+@receiver(setting_changed)
+def clear_local_index(setting, **kwargs):
+    # Другой MEDIA_ROOT — другие файлы под теми же именами.
+    if setting == 'MEDIA_ROOT':
+        local_index.clear()
+
+
+def is_image_key(key):
+    return key.startswith(add_prefix('', 'image'))
+
+
+class KVStore(CachedDBKVStore):
+    def get_many(self, image_files):
+        """Найденные в хранилище записи ``{key: ImageFile}``."""
+        keys = {add_prefix(image_file.key): image_file.key
+                for image_file in image_files}
+        values, missing = {}, []
+        for key in keys:
+            value = local_index.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                values[key] = value
+        if missing:
+            found = self.cache.get_many(missing)
+            missing = [key for key in missing if key not in found]
+            if missing:
+                stored = dict(KVStoreModel.objects.filter(
+                    key__in=missing
+                ).values_list('key', 'value'))
+                # Как и sorl, запоминаем в кэше и отсутствие записи.
+                self.cache.set_many(
+                    {key: stored.get(key, EMPTY_VALUE) for key in missing},
+                    sorl_settings.THUMBNAIL_CACHE_TIMEOUT,
+                )
+                found.update(stored)
+            for key, value in found.items():
+                if value != EMPTY_VALUE:
+                    local_index.set(key, value)
+                    values[key] = value
+        return {
+            keys[key]: deserialize_image_file(value)
+            for key, value in values.items()
+        }
+
+    def set_many(self, source, thumbnails):
+        """Записывает источник и его миниатюры за одну транзакцию."""
+        entries = {}
+        for image_file in [source, *thumbnails]:
+            image_file.set_size()
+            entries[add_prefix(image_file.key)] = serialize_image_file(
+                image_file
+            )
+        thumbnail_keys = set(
+            self._get(source.key, identity='thumbnails') or []
+        )
+        thumbnail_keys.update(thumbnail.key for thumbnail in thumbnails)
+        entries[add_prefix(source.key, 'thumbnails')] = serialize(
+            sorted(thumbnail_keys)
+        )
+        with transaction.atomic():
+            KVStoreModel.objects.filter(key__in=list(entries)).delete()
+            KVStoreModel.objects.bulk_create([
+                KVStoreModel(key=key, value=value)
+                for key, value in entries.items()
+            ])
+        self.cache.set_many(entries, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        for key, value in entries.items():
+            if is_image_key(key):
+                local_index.set(key, value)
+
+    def clear(self, delete_thumbnails=False):
+        super().clear(delete_thumbnails)
+        local_index.clear()
+
+    def _get_raw(self, key):
+        value = local_index.get(key)
+        if value is None:
+            value = super()._get_raw(key)
+            if value is not None and is_image_key(key):
+                local_index.set(key, value)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        if is_image_key(key):
+            local_index.set(key, value)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        for key in keys:
+            local_index.delete(key)
@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from core.metrics import register_stats
+
+        from . import cards, graph, signals  # noqa: F401
+
+        register_stats('card_cache', cards.stats.as_dict)
+        register_stats('follow_graph', graph.stats)
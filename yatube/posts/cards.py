@@ -0,0 +1,104 @@
+"""Кэш отрисованных карточек постов.
+
+Карточка не зависит от читателя и страницы, поэтому один фрагмент
+переиспользуется в главной ленте, группах, профиле и подписках.
+Ключ содержит id и версию поста (``Post.updated``): после сохранения
+поста старый фрагмент больше не читается и истекает сам. Имя автора и
+группа в карточке меняются без поста, поэтому ключ включает ещё и
+поколение ``cards``, которое сдвигается при сохранении пользователя
+или группы.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core.caching import get_generation
+
+from .thumbnails import ready_post_image, ready_post_images
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+CARD_TIMEOUT = getattr(settings, 'POST_CARD_CACHE_TIMEOUT', 60 * 60 * 24)
+# Пространство имён карточек: сдвигается при правке авторов и групп.
+CARDS_NAMESPACE = 'cards'
+
+
+class CardCacheStats:
+    """Счётчики попаданий в кэш карточек внутри процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hits=0, misses=0):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else None,
+        }
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+stats = CardCacheStats()
+
+
+def card_key(post, generation=None):
+    if generation is None:
+        generation = get_generation(CARDS_NAMESPACE)
+    version = int(post.updated.timestamp() * 1000000)
+    return f'post_card:{generation}:{post.pk}:{version}'
+
+
+def get_cached_cards(posts, generation=None):
+    """Достаёт готовые карточки страницы одним запросом к кэшу."""
+    keys = [card_key(post, generation) for post in posts]
+    return cache.get_many(keys) if keys else {}
+
+
+def prefetch_cards(posts):
+    """Готовые карточки страницы, картинки для остальных и поколение.
+
+    Карточки достаются из кэша одним ``get_many``, а миниатюры
+    карточек, которые придётся рисовать, — одним запросом к sorl.
+    """
+    posts = list(posts)
+    generation = get_generation(CARDS_NAMESPACE)
+    cached = get_cached_cards(posts, generation)
+    images = ready_post_images(
+        post.image for post in posts
+        if card_key(post, generation) not in cached
+    )
+    return cached, images, generation
+
+
+def render_card(post, cached=None, images=None, generation=None):
+    key = card_key(post, generation)
+    html = cached.get(key) if cached is not None else cache.get(key)
+    if html is None:
+        stats.record(misses=1)
+        if images is not None and post.image.name in images:
+            image = images[post.image.name]
+        else:
+            image = ready_post_image(post.image)
+        html = render_to_string(
+            CARD_TEMPLATE, {'post': post, 'image': image}
+        )
+        # Карточку с исходной картинкой вместо миниатюр не кэшируем.
+        if image is None or image.srcset:
+            cache.set(key, html, CARD_TIMEOUT)
+    else:
+        stats.record(hits=1)
+    return mark_safe(html)
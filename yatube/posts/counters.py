@@ -0,0 +1,151 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарным ``UPDATE ... SET x = x + 1`` из сигналов,
+поэтому страницы профиля и поста не делают COUNT на каждый запрос.
+Расхождения исправляет команда ``reconcile_counters``.
+"""
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+
+def _count_subquery(queryset, field):
+    counted = queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field
+    ).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def expected_user_counts():
+    """Выражения для пересчёта счётчиков ``UserStats`` из исходных таблиц."""
+    return {
+        'posts_count': _count_subquery(Post.objects.all(), 'author'),
+        'followers_count': _count_subquery(Follow.objects.all(), 'author'),
+        'following_count': _count_subquery(Follow.objects.all(), 'user'),
+    }
+
+
+def get_stats(user_id):
+    """Счётчики пользователя; отсутствующая строка считается заново."""
+    try:
+        return UserStats.objects.get(user_id=user_id)
+    except UserStats.DoesNotExist:
+        pass
+    counts = User.objects.filter(pk=user_id).values(
+        **expected_user_counts()
+    ).first() or {}
+    try:
+        with transaction.atomic():
+            return UserStats.objects.create(user_id=user_id, **counts)
+    except IntegrityError:
+        pass
+    # Строку успел создать соседний запрос или пользователь удалён.
+    return (UserStats.objects.filter(user_id=user_id).first()
+            or UserStats(user_id=user_id, **counts))
+
+
+def bump_user(user_id, **deltas):
+    """Сдвигает счётчики пользователя на заданные величины."""
+    # Не уводим счётчик ниже нуля: такое расхождение чинит reconcile.
+    floors = {
+        f'{field}__gte': -delta
+        for field, delta in deltas.items() if delta < 0
+    }
+    updated = UserStats.objects.filter(user_id=user_id, **floors).update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+    if not updated and any(delta > 0 for delta in deltas.values()):
+        # Строки ещё нет: считаем её целиком, новая запись уже учтена.
+        get_stats(user_id)
+
+
+def bump_users(user_ids, **deltas):
+    """Сдвигает одинаковые счётчики нескольких пользователей разом."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    floors = {
+        f'{field}__gte': -delta
+        for field, delta in deltas.items() if delta < 0
+    }
+    updated = UserStats.objects.filter(
+        user_id__in=user_ids, **floors
+    ).update(**{field: F(field) + delta for field, delta in deltas.items()})
+    if updated < len(user_ids) and any(
+        delta > 0 for delta in deltas.values()
+    ):
+        present = set(UserStats.objects.filter(
+            user_id__in=user_ids
+        ).values_list('user_id', flat=True))
+        for user_id in user_ids:
+            if user_id not in present:
+                get_stats(user_id)
+
+
+def bump_comments(post_id, delta):
+    """Сдвигает счётчик комментариев поста и его версию комментариев.
+
+    Версия растёт при любой записи комментария, в том числе правке:
+    по ней ETag страницы поста отличает её прежние состояния.
+    """
+    posts = Post.objects.filter(pk=post_id)
+    version = {'comments_version': F('comments_version') + 1}
+    # Как и в bump_user, не уводим счётчик ниже нуля.
+    if delta and posts.filter(comments_count__gte=-delta).update(
+        comments_count=F('comments_count') + delta, **version
+    ):
+        return
+    posts.update(**version)
+
+
+def reconcile_users():
+    """Создаёт недостающие строки и исправляет счётчики с расхождением."""
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True
+    )
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in missing.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    expected = expected_user_counts()
+    drifted = UserStats.objects.annotate(
+        real_posts=expected['posts_count'],
+        real_followers=expected['followers_count'],
+        real_following=expected['following_count'],
+    ).exclude(
+        posts_count=F('real_posts'),
+        followers_count=F('real_followers'),
+        following_count=F('real_following'),
+    ).values_list('pk', flat=True)
+    return _update_in_batches(
+        UserStats, list(drifted), expected_user_counts()
+    )
+
+
+def reconcile_posts():
+    """Исправляет ``Post.comments_count`` с расхождением."""
+    drifted = Post.objects.annotate(
+        real_comments=_count_subquery(Comment.objects.all(), 'post'),
+    ).exclude(
+        comments_count=F('real_comments')
+    ).values_list('pk', flat=True)
+    return _update_in_batches(Post, list(drifted), {
+        'comments_count': _count_subquery(Comment.objects.all(), 'post'),
+    })
+
+
+def _update_in_batches(model, pks, values):
+    for start in range(0, len(pks), BATCH_SIZE):
+        with transaction.atomic():
+            model.objects.filter(
+                pk__in=pks[start:start + BATCH_SIZE]
+            ).update(**values)
+    return len(pks)
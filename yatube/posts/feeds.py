@@ -0,0 +1,191 @@
+"""Лента подписок с раскладкой постов по почтовым ящикам читателей.
+
+Пост обычного автора при публикации копируется в ``FeedItem`` каждого
+подписчика, поэтому чтение ленты не делает JOIN через ``Follow``.
+Посты авторов с очень большим числом подписчиков не раскладываются,
+а подмешиваются в ленту при чтении.
+
+В ``FeedItem`` хранится и дата публикации поста, поэтому страница
+ленты — отрезок индекса ``(user, -pub_date, -post)`` ящика читателя:
+лента сортируется по его колонкам, ``FEED_ORDERING``.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, Q
+
+from . import graph
+from .counters import get_stats
+from .models import FeedItem, Follow, Post, UserStats
+
+FANOUT_MAX_FOLLOWERS = getattr(settings, 'FEED_FANOUT_MAX_FOLLOWERS', 1000)
+BACKFILL_LIMIT = getattr(settings, 'FEED_BACKFILL_LIMIT', 1000)
+BATCH_SIZE = 1000
+
+# Пространство имён кэша для готовых страниц всех лент.
+FEEDS_NAMESPACE = 'feeds'
+
+# Ключ сортировки ленты подписок: аннотации из follow_feed.
+FEED_ORDERING = ('-feed_pub_date', '-feed_post_id')
+
+PULL_AUTHORS_KEY = 'feeds:pull_authors'
+PULL_AUTHORS_TIMEOUT = 5 * 60
+
+
+def is_pull_author(author_id):
+    """Автор слишком популярен, чтобы раскладывать его посты."""
+    return get_stats(author_id).followers_count > FANOUT_MAX_FOLLOWERS
+
+
+def get_pull_authors():
+    """Множество id авторов, чьи посты подмешиваются при чтении."""
+    authors = cache.get(PULL_AUTHORS_KEY)
+    if authors is None:
+        authors = set(UserStats.objects.filter(
+            followers_count__gt=FANOUT_MAX_FOLLOWERS
+        ).values_list('user_id', flat=True))
+        cache.set(PULL_AUTHORS_KEY, authors, PULL_AUTHORS_TIMEOUT)
+    return authors
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_pull_author(post.author_id):
+        # Автор перешёл порог: его посты теперь читаются при запросе.
+        cache.delete(PULL_AUTHORS_KEY)
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+         for user_id in followers),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def add_author(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    if is_pull_author(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date'
+    ).values_list('id', 'pub_date')[:BACKFILL_LIMIT]
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def remove_author(user_id, author_id):
+    """Убирает посты автора из ленты после отписки."""
+    FeedItem.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def add_authors(user_id, author_ids):
+    """Добавляет в ленту последние посты нескольких авторов разом.
+
+    Как и ``rebuild_all_inboxes``, отбирает посты оконной функцией
+    в базе одним INSERT ... SELECT.
+    """
+    pull_authors = get_pull_authors()
+    author_ids = [
+        author_id for author_id in author_ids
+        if author_id not in pull_authors
+    ]
+    if not author_ids:
+        return 0
+    placeholders = ', '.join(['%s'] * len(author_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {FeedItem._meta.db_table} '
+            f'(user_id, post_id, pub_date) '
+            f'SELECT %s, ranked.id, ranked.pub_date FROM ('
+            f'SELECT id, pub_date, ROW_NUMBER() OVER ('
+            f'PARTITION BY author_id ORDER BY pub_date DESC) AS position '
+            f'FROM {Post._meta.db_table} '
+            f'WHERE author_id IN ({placeholders})) ranked '
+            f'WHERE ranked.position <= %s ON CONFLICT DO NOTHING',
+            [user_id, *author_ids, BACKFILL_LIMIT],
+        )
+        return cursor.rowcount
+
+
+def remove_authors(user_id, author_ids):
+    """Убирает из ленты посты нескольких авторов после отписки."""
+    FeedItem.objects.filter(
+        user_id=user_id, post__author_id__in=list(author_ids)
+    ).delete()
+
+
+def rebuild_inbox(user_id):
+    """Пересобирает ленту читателя по текущим подпискам."""
+    FeedItem.objects.filter(user_id=user_id).delete()
+    author_ids = Follow.objects.filter(
+        user_id=user_id
+    ).values_list('author_id', flat=True)
+    for author_id in author_ids:
+        add_author(user_id, author_id)
+
+
+def rebuild_all_inboxes():
+    """Пересобирает все ленты одним INSERT ... SELECT.
+
+    Последние BACKFILL_LIMIT постов каждого автора отбираются оконной
+    функцией прямо в базе, без загрузки id в Python.
+    """
+    feed_items = FeedItem._meta.db_table
+    follows = Follow._meta.db_table
+    posts = Post._meta.db_table
+    stats = UserStats._meta.db_table
+    FeedItem.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {feed_items} (user_id, post_id, pub_date) '
+            f'SELECT follow.user_id, ranked.id, ranked.pub_date '
+            f'FROM {follows} follow '
+            f'JOIN (SELECT id, author_id, pub_date, ROW_NUMBER() OVER ('
+            f'PARTITION BY author_id ORDER BY pub_date DESC) AS position '
+            f'FROM {posts}) ranked ON ranked.author_id = follow.author_id '
+            f'WHERE ranked.position <= %s AND follow.author_id NOT IN ('
+            f'SELECT user_id FROM {stats} WHERE followers_count > %s)',
+            [BACKFILL_LIMIT, FANOUT_MAX_FOLLOWERS],
+        )
+        return cursor.rowcount
+
+
+def follow_feed(user):
+    """Посты ленты подписок: почтовый ящик плюс популярные авторы.
+
+    Сортировать по ``FEED_ORDERING``. Без популярных авторов посты
+    берутся через записи ящика и упорядочены его индексом; с ними
+    ящик объединяется с постами авторов, и выборку сортирует база.
+    """
+    pull_authors = get_pull_authors()
+    followed = []
+    if pull_authors:
+        # Подписки берутся из графа в памяти, без JOIN через Follow.
+        followed = [
+            author_id
+            for author_id in graph.get_graph().following_of(user.pk)
+            if author_id in pull_authors
+        ]
+    if not followed:
+        return Post.objects.filter(feed_items__user=user).annotate(
+            feed_pub_date=F('feed_items__pub_date'),
+            feed_post_id=F('feed_items__post_id'),
+        )
+    return Post.objects.filter(
+        Q(id__in=FeedItem.objects.filter(user=user).values('post_id'))
+        | Q(author_id__in=followed)
+    ).annotate(feed_pub_date=F('pub_date'), feed_post_id=F('id'))
+
+
+def join_feed(user):
+    """Прежняя лента через JOIN по подпискам, для сравнения."""
+    return Post.objects.filter(author__following__user=user)
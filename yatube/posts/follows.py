@@ -0,0 +1,153 @@
+"""Подписки пачками и состояние подписок читателя для страниц.
+
+``bulk_create`` и удаление пачкой не посылают ``post_save`` и
+``post_delete``, поэтому счётчики, ленты и поколение кэша лент
+обновляются здесь явно — одним запросом на всю пачку, а не на
+каждого автора, как в сигналах.
+
+Множество авторов, на которых подписан читатель, кэшируется целиком:
+кнопки подписки на странице ленты проверяются без запросов к базе.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, connections, router, transaction
+
+from core.caching import bump_generation_on_commit
+
+from . import counters, feeds, graph
+from .models import Follow
+
+User = get_user_model()
+
+FOLLOWING_KEY = 'follows:following:{}'
+FOLLOWING_TIMEOUT = getattr(settings, 'FOLLOWING_CACHE_TIMEOUT', 60 * 60)
+
+
+def followed_authors(user):
+    """Множество id авторов, на которых подписан ``user``."""
+    if not user.is_authenticated:
+        return frozenset()
+    key = FOLLOWING_KEY.format(user.pk)
+    authors = cache.get(key)
+    if authors is None:
+        authors = frozenset(Follow.objects.filter(
+            user=user
+        ).values_list('author_id', flat=True))
+        cache.set(key, authors, FOLLOWING_TIMEOUT)
+    return authors
+
+
+def follow_states(user, author_ids):
+    """``{id автора: подписан ли user}`` для авторов страницы."""
+    followed = followed_authors(user)
+    return {author_id: author_id in followed for author_id in author_ids}
+
+
+def is_following(user, author_id):
+    return author_id in followed_authors(user)
+
+
+def forget(user_id):
+    """Сбрасывает кэш подписок читателя после их изменения.
+
+    Внутри транзакции сбрасывает ещё раз после коммита: до него другой
+    запрос мог прочитать и закэшировать прежние подписки.
+    """
+    key = FOLLOWING_KEY.format(user_id)
+    cache.delete(key)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.delete(key))
+
+
+def insert_follows(user, author_ids):
+    """Вставляет подписки; возвращает авторов реально вставленных строк.
+
+    Обычно вся пачка уходит одним запросом. Если между проверкой и
+    вставкой подписку на кого-то из авторов успел создать параллельный
+    запрос, строки вставляются по одной: чужие строки и их счётчики
+    уже учтены сигналами.
+    """
+    try:
+        with transaction.atomic():
+            Follow.objects.bulk_create([
+                Follow(user=user, author_id=author_id)
+                for author_id in author_ids
+            ])
+        return author_ids
+    except IntegrityError:
+        inserted = []
+        for author_id in author_ids:
+            try:
+                with transaction.atomic():
+                    Follow.objects.bulk_create(
+                        [Follow(user=user, author_id=author_id)]
+                    )
+            except IntegrityError:
+                continue
+            inserted.append(author_id)
+        return inserted
+
+
+def follow_authors(user, author_ids):
+    """Подписывает на авторов одной транзакцией; возвращает новых."""
+    author_ids = set(author_ids) - {user.pk}
+    with transaction.atomic():
+        existing = set(Follow.objects.filter(
+            user=user, author_id__in=author_ids
+        ).values_list('author_id', flat=True))
+        new_ids = User.objects.filter(
+            pk__in=author_ids - existing
+        ).values_list('pk', flat=True)
+        new_ids = insert_follows(user, sorted(new_ids))
+        if not new_ids:
+            return []
+        counters.bump_users(new_ids, followers_count=1)
+        counters.bump_user(user.pk, following_count=len(new_ids))
+        feeds.add_authors(user.pk, new_ids)
+    forget(user.pk)
+    graph.record(user.pk, added=new_ids)
+    bump_generation_on_commit(feeds.FEEDS_NAMESPACE)
+    return new_ids
+
+
+def _delete_follows(user_id, author_ids):
+    """Удаляет подписки одним DELETE в обход сигналов.
+
+    ``QuerySet.delete()`` прислал бы ``post_delete`` на каждую подписку,
+    и сигналы второй раз, по запросу на автора, поправили бы счётчики
+    и ленты, которые ``unfollow_authors`` правит пачкой. Каскадов у
+    Follow нет, так что сборщик удалённых объектов здесь не нужен.
+    """
+    connection = connections[router.db_for_write(Follow)]
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(author_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM {} WHERE {} = %s AND {} IN ({})'.format(
+                quote(Follow._meta.db_table),
+                quote(Follow._meta.get_field('user').column),
+                quote(Follow._meta.get_field('author').column),
+                placeholders,
+            ),
+            [user_id, *author_ids],
+        )
+
+
+def unfollow_authors(user, author_ids):
+    """Отписывает от авторов одной транзакцией; возвращает снятых."""
+    with transaction.atomic():
+        follows = Follow.objects.filter(
+            user=user, author_id__in=list(author_ids)
+        )
+        removed_ids = sorted(follows.values_list('author_id', flat=True))
+        if not removed_ids:
+            return []
+        _delete_follows(user.pk, removed_ids)
+        counters.bump_users(removed_ids, followers_count=-1)
+        counters.bump_user(user.pk, following_count=-len(removed_ids))
+        feeds.remove_authors(user.pk, removed_ids)
+    forget(user.pk)
+    graph.record(user.pk, removed=removed_ids)
+    bump_generation_on_commit(feeds.FEEDS_NAMESPACE)
+    return removed_ids
@@ -1,8 +1,14 @@
+import logging
+
 from django import forms
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import UploadedFile
 
+from . import images
 from .models import Comment, Post
 
+logger = logging.getLogger(__name__)
+
 User = get_user_model()
 
 
@@ -19,12 +25,35 @@ class PostForm(forms.ModelForm):
             'group': 'Группа, к которой принадлежит пост',
         }
 
+    image_sizes = None
+
     def clean_text(self):
         data = self.cleaned_data['text']
         if data == "":
             raise forms.ValidationError('Нельзя создать пост с пустым полем')
         return data
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        try:
+            processed = images.process_upload(image)
+        except (OSError, ValueError):
+            raise forms.ValidationError('Не удалось обработать картинку')
+        self.image_sizes = (processed.original_bytes, processed.bytes)
+        logger.info(
+            'Картинка %s: %s -> %s байт',
+            image.name, processed.original_bytes, processed.bytes,
+        )
+        return processed.file
+
+    def save(self, commit=True):
+        if self.image_sizes is not None:
+            (self.instance.image_original_bytes,
+             self.instance.image_bytes) = self.image_sizes
+        return super().save(commit)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
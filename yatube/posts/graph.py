@@ -0,0 +1,289 @@
+"""Граф подписок в памяти процесса и подсказки «кого почитать».
+
+Для каждого пользователя хранятся отсортированные массивы ``array`` с
+id авторов, на которых он подписан, и с id его подписчиков: по четыре
+байта на связь вместо строк ORM. Граф читается из базы одним запросом
+при первом обращении, а потом меняется на месте сигналами подписок.
+
+Процессы делят граф через общий кэш. После коммита каждого изменения
+поколение ``follow_graph`` увеличивается, а в кэш под новым поколением
+ложится само изменение — подписки и отписки одного пользователя.
+Процесс, чей граф отстал, накладывает изменения пропущенных поколений
+по порядку. Полный снимок с его поколением нужен только процессу без
+графа: снимок догоняется теми же изменениями, а если какого-то нет,
+граф читается из базы и снимок обновляется. До коммита поколение не
+меняется: иначе читатели увидели бы подписку, которой в базе ещё нет
+или уже не будет.
+"""
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+from core.caching import bump_generation, get_generation, get_or_build
+
+from .models import Follow
+
+User = get_user_model()
+
+# id пользователей — AutoField, то есть 32-битные целые.
+TYPECODE = 'i'
+EMPTY = array(TYPECODE)
+
+GRAPH_NAMESPACE = 'follow_graph'
+SNAPSHOT_KEY = 'follow_graph:snapshot'
+DELTA_KEY = 'follow_graph:delta:{}'
+# Сколько живут снимок и изменения в кэше и граф процесса без сверки
+# со снимком.
+SNAPSHOT_TIMEOUT = getattr(settings, 'FOLLOW_GRAPH_TIMEOUT', 10 * 60)
+# Если граф отстал сильнее, дешевле взять снимок.
+DELTA_LIMIT = 1000
+SUGGESTIONS_LIMIT = 5
+# Сколько связей «друзей друзей» просматривать ради подсказок.
+SUGGESTIONS_SCAN_LIMIT = getattr(
+    settings, 'FOLLOW_SUGGESTIONS_SCAN_LIMIT', 10000
+)
+
+_lock = threading.Lock()
+# (поколение, срок годности, граф) — читается без блокировки.
+_local = None
+
+
+def with_id(ids, value):
+    # Копия, а не вставка на месте: массив могут читать другие потоки.
+    ids = array(TYPECODE, ids)
+    insort(ids, value)
+    return ids
+
+
+def without_id(ids, value):
+    ids = array(TYPECODE, ids)
+    ids.pop(bisect_left(ids, value))
+    return ids
+
+
+def contains(ids, value):
+    index = bisect_left(ids, value)
+    return index < len(ids) and ids[index] == value
+
+
+class FollowGraph:
+    """Списки смежности подписок в отсортированных массивах."""
+
+    def __init__(self, users=EMPTY, authors=EMPTY):
+        # Пары связей (users[i], authors[i]) упорядочены по (user, author),
+        # поэтому оба списка смежности получаются отсортированными.
+        following, followers = {}, {}
+        for user_id, author_id in zip(users, authors):
+            following.setdefault(user_id, []).append(author_id)
+            followers.setdefault(author_id, []).append(user_id)
+        self.following = {
+            user_id: array(TYPECODE, ids) for user_id, ids in following.items()
+        }
+        self.followers = {
+            author_id: array(TYPECODE, ids)
+            for author_id, ids in followers.items()
+        }
+
+    @classmethod
+    def load(cls):
+        users, authors = array(TYPECODE), array(TYPECODE)
+        pairs = Follow.objects.order_by(
+            'user_id', 'author_id'
+        ).values_list('user_id', 'author_id')
+        for user_id, author_id in pairs.iterator():
+            users.append(user_id)
+            authors.append(author_id)
+        return cls(users, authors)
+
+    @classmethod
+    def from_bytes(cls, data):
+        users, authors = array(TYPECODE), array(TYPECODE)
+        half = len(data) // 2
+        users.frombytes(data[:half])
+        authors.frombytes(data[half:])
+        return cls(users, authors)
+
+    def to_bytes(self):
+        """Снимок: все id подписчиков, затем все id авторов."""
+        users, authors = array(TYPECODE), array(TYPECODE)
+        for user_id in sorted(self.following):
+            ids = self.following[user_id]
+            users.extend([user_id] * len(ids))
+            authors.extend(ids)
+        return users.tobytes() + authors.tobytes()
+
+    @property
+    def edges(self):
+        return sum(len(ids) for ids in self.following.values())
+
+    def following_of(self, user_id):
+        return self.following.get(user_id, EMPTY)
+
+    def followers_of(self, author_id):
+        return self.followers.get(author_id, EMPTY)
+
+    def is_following(self, user_id, author_id):
+        return contains(self.following_of(user_id), author_id)
+
+    def add(self, user_id, author_id):
+        if self.is_following(user_id, author_id):
+            return False
+        self.following[user_id] = with_id(
+            self.following_of(user_id), author_id
+        )
+        self.followers[author_id] = with_id(
+            self.followers_of(author_id), user_id
+        )
+        return True
+
+    def remove(self, user_id, author_id):
+        if not self.is_following(user_id, author_id):
+            return False
+        self.following[user_id] = without_id(
+            self.following[user_id], author_id
+        )
+        self.followers[author_id] = without_id(
+            self.followers[author_id], user_id
+        )
+        return True
+
+    def suggestions(self, user_id, limit=SUGGESTIONS_LIMIT,
+                    scan_limit=SUGGESTIONS_SCAN_LIMIT):
+        """Авторы, на которых подписаны авторы ``user_id``.
+
+        Возвращает ``[(id автора, число общих подписок)]``: сначала те,
+        кого читает больше авторов пользователя, затем популярные.
+        """
+        followed = self.following_of(user_id)
+        scores = {}
+        scanned = 0
+        for author_id in followed:
+            for candidate in self.following_of(author_id):
+                scores[candidate] = scores.get(candidate, 0) + 1
+            scanned += len(self.following_of(author_id))
+            if scanned >= scan_limit:
+                break
+        scores.pop(user_id, None)
+        for author_id in followed:
+            scores.pop(author_id, None)
+        return heapq.nsmallest(limit, scores.items(), key=lambda item: (
+            -item[1], -len(self.followers_of(item[0])), item[0]
+        ))
+
+
+def get_graph():
+    """Граф подписок текущего поколения."""
+    global _local
+    generation = get_generation(GRAPH_NAMESPACE)
+    local = _local
+    if local is not None and time.monotonic() < local[1]:
+        if local[0] == generation:
+            return local[2]
+        start = local[0]
+        deltas = _fetch_deltas(start, generation)
+        if deltas is not None:
+            with _lock:
+                local = _local
+                # Пока шёл запрос к кэшу, граф могли догнать другие потоки.
+                if local is not None and start <= local[0] <= generation:
+                    _patch(local[2], deltas, local[0], generation)
+                    _local = (generation, local[1], local[2])
+                    return local[2]
+    snapshot_generation, data = get_or_build(
+        SNAPSHOT_KEY,
+        lambda: (generation, FollowGraph.load().to_bytes()),
+        SNAPSHOT_TIMEOUT,
+    )
+    graph = FollowGraph.from_bytes(data)
+    deltas = _fetch_deltas(snapshot_generation, generation)
+    if deltas is None:
+        graph = FollowGraph.load()
+        cache.set(SNAPSHOT_KEY, (generation, graph.to_bytes()),
+                  SNAPSHOT_TIMEOUT)
+    else:
+        _patch(graph, deltas, snapshot_generation, generation)
+    with _lock:
+        _local = (generation, time.monotonic() + SNAPSHOT_TIMEOUT, graph)
+    return graph
+
+
+def _fetch_deltas(start, generation):
+    """Изменения поколений после ``start`` до ``generation`` включительно.
+
+    Возвращает ``{поколение: изменение}`` или None, если каких-то
+    изменений в кэше нет и граф догнать нельзя.
+    """
+    if not 0 <= generation - start <= DELTA_LIMIT:
+        return None
+    keys = {
+        DELTA_KEY.format(number): number
+        for number in range(start + 1, generation + 1)
+    }
+    found = cache.get_many(keys)
+    if len(found) < len(keys):
+        return None
+    return {keys[key]: delta for key, delta in found.items()}
+
+
+def _patch(graph, deltas, start, generation):
+    """Накладывает на граф поколения ``start`` изменения до ``generation``."""
+    # Снимок мог прочитать из базы и эти изменения: add и remove
+    # повторное внесение пропускают.
+    for number in range(start + 1, generation + 1):
+        user_id, added, removed = deltas[number]
+        for author_id in added:
+            graph.add(user_id, author_id)
+        for author_id in removed:
+            graph.remove(user_id, author_id)
+
+
+def record(user_id, added=(), removed=()):
+    """Вносит в граф подписки и отписки ``user_id`` после коммита."""
+    added, removed = list(added), list(removed)
+    transaction.on_commit(lambda: _apply(user_id, added, removed))
+
+
+def _apply(user_id, added, removed):
+    global _local
+    generation = bump_generation(GRAPH_NAMESPACE)
+    delta = (user_id, added, removed)
+    cache.set(DELTA_KEY.format(generation), delta, SNAPSHOT_TIMEOUT)
+    with _lock:
+        local = _local
+        # Отставший граф процесса догонит get_graph.
+        if local is not None and local[0] == generation - 1:
+            _patch(local[2], {generation: delta}, local[0], generation)
+            _local = (generation, local[1], local[2])
+
+
+def reset():
+    """Забывает граф процесса; следующее обращение загрузит его заново."""
+    global _local
+    with _lock:
+        _local = None
+
+
+def stats():
+    local = _local
+    if local is None:
+        return {'users': None, 'edges': None}
+    return {'users': len(local[2].following), 'edges': local[2].edges}
+
+
+def suggested_authors(user, limit=SUGGESTIONS_LIMIT):
+    """Подсказки для ``user``: ``[(автор, число общих подписок)]``."""
+    if not user.is_authenticated:
+        return []
+    scored = get_graph().suggestions(user.pk, limit)
+    authors = User.objects.in_bulk([author_id for author_id, _ in scored])
+    return [
+        (authors[author_id], mutual)
+        for author_id, mutual in scored if author_id in authors
+    ]
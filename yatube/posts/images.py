@@ -0,0 +1,74 @@
+"""Обработка картинок постов при загрузке.
+
+Картинка декодируется один раз: поворачивается по EXIF, уменьшается
+до ``POST_IMAGE_MAX_SIZE``, теряет метаданные и перекодируется в WebP,
+а если Pillow собран без WebP — в JPEG (PNG для прозрачных). Дальше
+sorl режет миниатюры уже из небольшого файла.
+"""
+import os
+import tempfile
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps, features
+
+ProcessedImage = namedtuple('ProcessedImage', 'file original_bytes bytes')
+
+SAVE_OPTIONS = {
+    'WEBP': {'method': 4},
+    'JPEG': {'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+}
+EXTENSIONS = {'WEBP': '.webp', 'JPEG': '.jpg', 'PNG': '.png'}
+CONTENT_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg',
+                 'PNG': 'image/png'}
+
+
+def output_format(has_alpha):
+    if features.check('webp'):
+        return 'WEBP'
+    return 'PNG' if has_alpha else 'JPEG'
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def process_upload(upload):
+    """Перекодирует загруженную картинку; анимацию оставляет как есть.
+
+    Результат пишется во временный файл, который остаётся в памяти,
+    пока не превысит ``FILE_UPLOAD_MAX_MEMORY_SIZE``.
+    """
+    max_size = settings.POST_IMAGE_MAX_SIZE
+    upload.seek(0)
+    with Image.open(upload) as source:
+        if getattr(source, 'is_animated', False):
+            upload.seek(0)
+            return ProcessedImage(upload, upload.size, upload.size)
+        # JPEG сразу декодируется в уменьшенном масштабе.
+        source.draft('RGB', max_size)
+        image = ImageOps.exif_transpose(source)
+    image.thumbnail(max_size, Image.LANCZOS)
+    alpha = has_alpha(image)
+    image = image.convert('RGBA' if alpha else 'RGB')
+    image_format = output_format(alpha)
+    output = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    # Метаданные не передаются в save, поэтому в файл не попадают.
+    image.save(
+        output, image_format, quality=settings.POST_IMAGE_QUALITY,
+        **SAVE_OPTIONS[image_format]
+    )
+    size = output.tell()
+    output.seek(0)
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    processed = UploadedFile(
+        output, name + EXTENSIONS[image_format],
+        CONTENT_TYPES[image_format], size,
+    )
+    return ProcessedImage(processed, upload.size, size)
@@ -0,0 +1,42 @@
+from concurrent.futures import as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Заранее рисует миниатюры для всех картинок постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int,
+            default=settings.THUMBNAIL_PREGENERATE_WORKERS or 1,
+            help='Число процессов, рисующих миниатюры.',
+        )
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).distinct()
+        done = failed = 0
+        with thumbnails.create_pool(options['workers']) as pool:
+            futures = {
+                pool.submit(thumbnails.render_thumbnail, name): name
+                for name in names.iterator()
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    future.result()
+                    thumbnails.register_thumbnail(name)
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                else:
+                    done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово миниатюр: {done}, ошибок: {failed}'
+        ))
@@ -0,0 +1,173 @@
+import http.client
+import json
+import socket
+import threading
+import time
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from core import benchmark
+from core.asgi import WsgiToAsgi
+from core.servers import AsyncHTTPServer, PooledWSGIServer
+
+REQUEST_TIMEOUT = 60
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает WSGI- и ASGI-развёртывание под медленными '
+            'клиентами: замеряет задержку обычных запросов к ленте.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help='Потоков для вьюх в обоих развёртываниях.',
+        )
+        parser.add_argument(
+            '--slow-clients', type=int, default=32,
+            help='Клиентов, медленно присылающих заголовки.',
+        )
+        parser.add_argument(
+            '--slow-seconds', type=float, default=3.0,
+            help='За сколько секунд медленный клиент шлёт запрос.',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=100,
+            help='Обычных запросов, по которым считается задержка.',
+        )
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--url', default=None)
+        parser.add_argument(
+            '--only', choices=('wsgi', 'asgi'),
+            help='Замерить только одно развёртывание.',
+        )
+        parser.add_argument(
+            '--output', help='Записать результаты в JSON-файл.',
+        )
+
+    def handle(self, *args, **options):
+        url = options['url'] or reverse('posts:index')
+        modes = (options['only'],) if options['only'] else ('wsgi', 'asgi')
+        results = {}
+        for mode in modes:
+            port, stop = getattr(self, f'start_{mode}')(options['threads'])
+            try:
+                results[mode] = self.run(port, url, options)
+            finally:
+                stop()
+            latency = results[mode]['latency_ms']
+            self.stdout.write(
+                f'{mode}: p50 {latency["p50"]:8.2f} ms  '
+                f'p95 {latency["p95"]:8.2f} ms  '
+                f'max {latency["max"]:8.2f} ms  '
+                f'ошибок {results[mode]["errors"]}'
+            )
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def start_wsgi(threads):
+        server = PooledWSGIServer(('127.0.0.1', 0), WSGIHandler(), threads)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+
+        def stop():
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+        return server.server_address[1], stop
+
+    @staticmethod
+    def start_asgi(threads):
+        app = WsgiToAsgi(WSGIHandler(), max_workers=threads)
+        server = AsyncHTTPServer(app)
+        port = server.start()
+
+        def stop():
+            server.stop()
+            app.executor.shutdown(wait=True)
+
+        return port, stop
+
+    def run(self, port, url, options):
+        slow = [
+            threading.Thread(
+                target=self.slow_client,
+                args=(port, url, options['slow_seconds']),
+            )
+            for _ in range(options['slow_clients'])
+        ]
+        for thread in slow:
+            thread.start()
+        # Даём медленным клиентам занять соединения.
+        time.sleep(min(0.2, options['slow_seconds'] / 10))
+        timings, errors = [], []
+        lock = threading.Lock()
+        remaining = iter(range(options['requests']))
+
+        def fast_client():
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                started = time.perf_counter()
+                try:
+                    self.get(port, url)
+                except (OSError, http.client.HTTPException) as error:
+                    with lock:
+                        errors.append(type(error).__name__)
+                    continue
+                with lock:
+                    timings.append((time.perf_counter() - started) * 1000)
+
+        fast = [
+            threading.Thread(target=fast_client)
+            for _ in range(options['concurrency'])
+        ]
+        for thread in fast:
+            thread.start()
+        for thread in fast + slow:
+            thread.join()
+        return {
+            'latency_ms': benchmark.summarize(timings or [0.0]),
+            'requests': len(timings),
+            'errors': len(errors),
+        }
+
+    @staticmethod
+    def get(port, url):
+        connection = http.client.HTTPConnection(
+            '127.0.0.1', port, timeout=REQUEST_TIMEOUT
+        )
+        try:
+            connection.request('GET', url)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                raise http.client.HTTPException(response.status)
+        finally:
+            connection.close()
+
+    @staticmethod
+    def slow_client(port, url, seconds):
+        """Присылает запрос по строке заголовка за ``seconds`` секунд."""
+        lines = [
+            f'GET {url} HTTP/1.1\r\n', 'Host: 127.0.0.1\r\n',
+            'User-Agent: slow-client\r\n', 'Accept: text/html\r\n',
+            'Accept-Language: ru\r\n', 'Connection: close\r\n', '\r\n',
+        ]
+        pause = seconds / len(lines)
+        try:
+            with socket.create_connection(
+                ('127.0.0.1', port), timeout=REQUEST_TIMEOUT
+            ) as sock:
+                for line in lines:
+                    sock.sendall(line.encode('latin-1'))
+                    time.sleep(pause)
+                while sock.recv(65536):
+                    pass
+        except OSError:
+            pass
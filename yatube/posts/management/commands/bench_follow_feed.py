@@ -0,0 +1,68 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from core.benchmark import summarize
+from posts import feeds
+from posts.models import Follow
+from posts.paginator import DEFAULT_ORDERING, KeysetPaginator
+from posts.views import posts_per_page
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время чтения ленты подписок: JOIN через Follow '
+            'против разложенных FeedItem.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=20,
+            help='Сколько самых подписанных читателей взять в выборку.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=10,
+            help='Сколько раз читать ленту каждого читателя.',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = list(
+            Follow.objects.values('user')
+            .annotate(follows=Count('id'))
+            .order_by('-follows')
+            .values_list('user', flat=True)[:options['users']]
+        )
+        if not user_ids:
+            self.stdout.write('Нет подписок: сначала заполните базу.')
+            return
+        for name, build, ordering in (
+            ('join', feeds.join_feed, DEFAULT_ORDERING),
+            ('inbox', feeds.follow_feed, feeds.FEED_ORDERING),
+        ):
+            summary = summarize(self.measure(
+                build, ordering, user_ids, options['repeat']
+            ))
+            self.stdout.write(
+                f'{name:>6}: '
+                f'mean {summary["mean"]:.2f} ms, '
+                f'p50 {summary["p50"]:.2f} ms, '
+                f'p95 {summary["p95"]:.2f} ms, '
+                f'p99 {summary["p99"]:.2f} ms'
+            )
+
+    @staticmethod
+    def measure(build, ordering, user_ids, repeat):
+        timings = []
+        for user_id in user_ids:
+            user = User(pk=user_id)
+            for _ in range(repeat):
+                started = time.perf_counter()
+                queryset = build(user).select_related('author', 'group')
+                page = KeysetPaginator(
+                    queryset, posts_per_page, ordering
+                ).first_page()
+                list(page)
+                timings.append((time.perf_counter() - started) * 1000)
+        return timings
@@ -0,0 +1,160 @@
+import json
+import platform
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from core import benchmark
+from core.db.backends.sqlite3.pool import pool_stats
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку и число SQL-запросов страниц лент '
+            'через тестовый клиент Django.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Сбрасывать кэш перед каждым замером.',
+        )
+        parser.add_argument(
+            '--no-pool', action='store_true',
+            help='Открывать соединение с базой на каждый запрос.',
+        )
+        parser.add_argument(
+            '--only', nargs='+', metavar='SCENARIO',
+            help='Запустить только указанные сценарии.',
+        )
+        parser.add_argument(
+            '--output', help='Записать результаты в JSON-файл.',
+        )
+        parser.add_argument(
+            '--compare', metavar='JSON',
+            help='Сравнить с результатами прошлого прогона.',
+        )
+
+    def handle(self, *args, **options):
+        if options['no_pool']:
+            connection.close()
+            connection.settings_dict['POOL'] = None
+        scenarios = self.scenarios()
+        if not scenarios:
+            raise CommandError('База пуста: сначала запустите seed_bulk.')
+        if options['only']:
+            scenarios = [
+                scenario for scenario in scenarios
+                if scenario[0] in options['only']
+            ]
+        cold = options['cold']
+
+        def before():
+            # Тестовый клиент не закрывает соединение после запроса,
+            # как это делает сервер при CONN_MAX_AGE = 0.
+            close_old_connections()
+            if cold:
+                cache.clear()
+
+        results = {}
+        for name, url, user in scenarios:
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            results[name] = benchmark.run_scenario(
+                client, url, options['repeat'], options['warmup'], before
+            )
+            latency = results[name]['latency_ms']
+            self.stdout.write(
+                f'{name:>16}: p50 {latency["p50"]:8.2f} ms  '
+                f'p95 {latency["p95"]:8.2f} ms  '
+                f'p99 {latency["p99"]:8.2f} ms  '
+                f'queries {results[name]["queries"]["mean"]:g}'
+            )
+        report = {'meta': self.meta(options), 'scenarios': results}
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+        if options['compare']:
+            self.compare(results, options['compare'])
+
+    def scenarios(self):
+        """Сценарии на самых нагруженных объектах базы."""
+        post = Post.objects.order_by('-comments_count').first()
+        if post is None:
+            return []
+        author = User.objects.annotate(
+            total=Count('posts')
+        ).order_by('-total').first()
+        reader = User.objects.filter(
+            pk=Follow.objects.values('user').annotate(
+                total=Count('id')
+            ).order_by('-total').values('user')[:1]
+        ).first()
+        group = Group.objects.annotate(
+            total=Count('posts')
+        ).order_by('-total').first()
+        word = post.text.split()[0] if post.text.split() else ''
+        scenarios = [
+            ('index', reverse('posts:index'), None),
+            ('profile', reverse('posts:profile', args=(author.username,)),
+             None),
+            ('post_detail', reverse('posts:post_detail', args=(post.pk,)),
+             post.author),
+            ('search',
+             reverse('posts:post_search') + '?' + urlencode({'q': word}),
+             None),
+        ]
+        if group is not None:
+            scenarios.append((
+                'group_posts',
+                reverse('posts:group_posts', args=(group.slug,)), None,
+            ))
+        if reader is not None:
+            scenarios.append(
+                ('follow_index', reverse('posts:follow_index'), reader)
+            )
+        return scenarios
+
+    @staticmethod
+    def meta(options):
+        return {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'cache': settings.CACHES['default']['BACKEND'],
+            'repeat': options['repeat'],
+            'warmup': options['warmup'],
+            'cold': options['cold'],
+            'pool': pool_stats(),
+            'rows': {
+                'users': User.objects.count(),
+                'posts': Post.objects.count(),
+                'follows': Follow.objects.count(),
+                'comments': Comment.objects.count(),
+            },
+        }
+
+    def compare(self, results, path):
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)['scenarios']
+        for name, metric, before, after, change in benchmark.compare(
+            results, baseline
+        ):
+            line = f'{name:>16} {metric:>7}: {before:g} -> {after:g}'
+            if change is not None:
+                line += f' ({change:+.1f}%)'
+            self.stdout.write(line)
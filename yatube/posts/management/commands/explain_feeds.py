@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from posts.feeds import FEED_ORDERING, follow_feed
+from posts.models import Comment, Follow, Group, Post
+from posts.paginator import DEFAULT_ORDERING, KeysetPaginator
+from posts.views import posts_per_page
+
+User = get_user_model()
+
+# Признак плана SQLite, при котором выборка сортируется отдельно
+# от индекса; полный проход таблицы — SCAN без USING INDEX.
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+class Command(BaseCommand):
+    help = 'Печатает планы запросов лент, чтобы проверить работу индексов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--author', help='Имя автора для профиля.')
+        parser.add_argument('--group', help='Slug группы.')
+        parser.add_argument('--user', help='Читатель ленты подписок.')
+
+    def handle(self, *args, **options):
+        post = Post.objects.order_by('-comments_count').first()
+        if post is None:
+            raise CommandError('Нет постов: сначала заполните базу.')
+        author = self.pick(
+            User, 'username', options['author'],
+            User.objects.annotate(total=Count('posts')),
+        )
+        group = self.pick(
+            Group, 'slug', options['group'],
+            Group.objects.annotate(total=Count('posts')),
+        )
+        reader = self.pick(
+            User, 'username', options['user'],
+            User.objects.annotate(total=Count('follower')),
+        )
+        queries = [
+            ('index', Post.objects.all(), DEFAULT_ORDERING),
+            ('profile', Post.objects.filter(author=author), DEFAULT_ORDERING),
+            ('group_posts', Post.objects.filter(group=group),
+             DEFAULT_ORDERING),
+            ('follow_index', follow_feed(reader), FEED_ORDERING),
+        ]
+        warnings = 0
+        for name, queryset, ordering in queries:
+            paginator = KeysetPaginator(
+                queryset.select_related('author', 'group'), posts_per_page,
+                ordering,
+            )
+            page = paginator.object_list[:posts_per_page + 1]
+            warnings += self.explain(name, page)
+        comments = Comment.objects.filter(post=post).select_related(
+            'author'
+        ).order_by('created', 'id')
+        warnings += self.explain('post_detail comments', comments)
+        warnings += self.explain('followers', Follow.objects.filter(
+            author=author
+        ).values('user'))
+        if warnings:
+            self.stdout.write(self.style.WARNING(
+                f'Строк плана без индекса: {warnings}'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                'Все запросы идут по индексам'
+            ))
+
+    @staticmethod
+    def pick(model, field, value, ranked):
+        if value:
+            obj = model.objects.filter(**{field: value}).first()
+            if obj is None:
+                raise CommandError(f'{model.__name__} {value} не найден')
+            return obj
+        return ranked.order_by('-total').first()
+
+    def explain(self, name, queryset):
+        self.stdout.write(self.style.MIGRATE_HEADING(name))
+        warnings = 0
+        for line in queryset.explain().splitlines():
+            full_scan = 'SCAN ' in line and ' USING ' not in line
+            if full_scan or TEMP_SORT in line:
+                warnings += 1
+                line = self.style.WARNING(line)
+            self.stdout.write('  ' + line)
+        return warnings
@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import feeds
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок (FeedItem) по таблице Follow.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', dest='username',
+            help='Пересобрать ленту только одного пользователя.',
+        )
+
+    def handle(self, *args, **options):
+        username = options['username']
+        if not username:
+            with transaction.atomic():
+                items = feeds.rebuild_all_inboxes()
+            self.stdout.write(self.style.SUCCESS(
+                f'Пересобраны все ленты, записей: {items}'
+            ))
+            return
+        user = User.objects.filter(username=username).first()
+        if user is None:
+            raise CommandError(f'Пользователь {username} не найден')
+        with transaction.atomic():
+            feeds.rebuild_inbox(user.pk)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрана лента пользователя {username}'
+        ))
@@ -0,0 +1,247 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+
+from core.caching import bump_generation
+from posts import counters, feeds, graph
+from posts.models import Comment, Follow, Group, Post
+from posts.search import get_backend as search_backend
+
+User = get_user_model()
+
+# Показатель Парето для активности и популярности: около 20% авторов
+# пишут 80% постов и собирают большую часть подписчиков.
+PARETO_ALPHA = 1.16
+GROUP_SHARE = 0.7
+SENTENCE_POOL = 2000
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключает auto_now/auto_now_add, чтобы записать свои даты."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу большим объёмом правдоподобных данных '
+            'для нагрузочных замеров.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок на пользователя.',
+        )
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько последних дней распределить посты.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Сколько строк вставлять в одной транзакции.',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--password', default='benchmark',
+            help='Общий пароль созданных пользователей.',
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        Faker.seed(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.days = options['days']
+
+        user_ids = self.create_users(options['users'], options['password'])
+        weights = [
+            self.random.paretovariate(PARETO_ALPHA) for _ in user_ids
+        ]
+        group_ids = self.create_groups(options['groups'])
+        post_ids = self.create_posts(
+            options['posts'], user_ids, weights, group_ids
+        )
+        self.create_follows(options['follows'], user_ids, weights)
+        self.create_comments(options['comments'], user_ids, post_ids)
+        self.rebuild_derived()
+
+    def log(self, message):
+        self.stdout.write(message)
+        self.stdout.flush()
+
+    def past_date(self):
+        # Свежих постов больше, чем старых.
+        return self.now - timedelta(
+            days=self.days * self.random.random() ** 2
+        )
+
+    def insert(self, model, objects):
+        # Размер пачки INSERT выбирает сам Django: у SQLite есть предел
+        # числа параметров, а batch_size больше него Django 2.2 не урежет.
+        with transaction.atomic():
+            model.objects.bulk_create(objects)
+
+    def create_users(self, count, password):
+        first_id = (User.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0) + 1
+        password = make_password(password)
+        users = (
+            User(
+                username=f'{self.fake.user_name()}_{first_id + number}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+            )
+            for number in range(count)
+        )
+        self.insert_chunks(User, users, count)
+        self.log(f'Пользователей: {count}')
+        return list(User.objects.filter(pk__gte=first_id).order_by(
+            'pk'
+        ).values_list('pk', flat=True))
+
+    def create_groups(self, count):
+        first_id = (Group.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0) + 1
+        self.insert(Group, [
+            Group(
+                title=self.fake.catch_phrase()[:200],
+                slug=f'group-{first_id + number}',
+                description=self.fake.paragraph(),
+            )
+            for number in range(count)
+        ])
+        self.log(f'Групп: {count}')
+        return list(Group.objects.filter(pk__gte=first_id).values_list(
+            'pk', flat=True
+        ))
+
+    def create_posts(self, count, user_ids, weights, group_ids):
+        sentences = [self.fake.sentence() for _ in range(SENTENCE_POOL)]
+        # Популярность групп по закону Ципфа.
+        group_weights = [1 / rank for rank in range(1, len(group_ids) + 1)]
+        first_id = (Post.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0) + 1
+
+        def build():
+            authors = self.random.choices(user_ids, weights, k=count)
+            for author_id in authors:
+                group_id = None
+                if group_ids and self.random.random() < GROUP_SHARE:
+                    group_id = self.random.choices(
+                        group_ids, group_weights
+                    )[0]
+                pub_date = self.past_date()
+                yield Post(
+                    author_id=author_id,
+                    group_id=group_id,
+                    text=' '.join(self.random.sample(
+                        sentences, self.random.randint(1, 6)
+                    )),
+                    pub_date=pub_date,
+                    updated=pub_date,
+                )
+
+        with explicit_dates(Post._meta.get_field('pub_date'),
+                            Post._meta.get_field('updated')):
+            self.insert_chunks(Post, build(), count)
+        self.log(f'Постов: {count}')
+        return list(Post.objects.filter(pk__gte=first_id).values_list(
+            'pk', flat=True
+        ))
+
+    def create_follows(self, mean, user_ids, weights):
+        if len(user_ids) < 2 or mean <= 0:
+            return
+
+        def build():
+            for user_id in user_ids:
+                # Число подписок распределено экспоненциально.
+                wanted = min(
+                    int(self.random.expovariate(1 / mean)),
+                    len(user_ids) - 1,
+                )
+                authors = set(self.random.choices(
+                    user_ids, weights, k=wanted
+                ))
+                authors.discard(user_id)
+                for author_id in authors:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        total = self.insert_chunks(Follow, build())
+        self.log(f'Подписок: {total}')
+
+    def create_comments(self, count, user_ids, post_ids):
+        if not post_ids or not count:
+            return
+        post_weights = [
+            self.random.paretovariate(PARETO_ALPHA) for _ in post_ids
+        ]
+
+        def build():
+            posts = self.random.choices(post_ids, post_weights, k=count)
+            for post_id in posts:
+                yield Comment(
+                    post_id=post_id,
+                    author_id=self.random.choice(user_ids),
+                    text=self.fake.sentence(),
+                    created=self.past_date(),
+                )
+
+        with explicit_dates(Comment._meta.get_field('created')):
+            self.insert_chunks(Comment, build(), count)
+        self.log(f'Комментариев: {count}')
+
+    def insert_chunks(self, model, objects, total=None):
+        chunk, inserted = [], 0
+        for obj in objects:
+            chunk.append(obj)
+            if len(chunk) == self.batch_size:
+                self.insert(model, chunk)
+                inserted += len(chunk)
+                chunk = []
+                if total:
+                    self.log(f'  {model.__name__}: {inserted}/{total}')
+        if chunk:
+            self.insert(model, chunk)
+            inserted += len(chunk)
+        return inserted
+
+    def rebuild_derived(self):
+        """bulk_create не шлёт сигналы: пересчитываем производные данные."""
+        self.log('Пересчёт счётчиков...')
+        counters.reconcile_users()
+        counters.reconcile_posts()
+        cache.delete(feeds.PULL_AUTHORS_KEY)
+        self.log('Сборка лент подписок...')
+        call_command('rebuild_feeds', stdout=StringIO())
+        self.log('Сборка поискового индекса...')
+        search_backend().rebuild()
+        bump_generation(feeds.FEEDS_NAMESPACE)
+        bump_generation(graph.GRAPH_NAMESPACE)
+        self.log(self.style.SUCCESS('Готово'))
@@ -0,0 +1,183 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+
+from core import benchmark
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+TEMPLATE_ALIAS = 'stress_template'
+STOCK_ENGINE = 'django.db.backends.sqlite3'
+
+
+class Command(BaseCommand):
+    help = ('Нагружает SQLite параллельными писателями комментариев и '
+            'сравнивает стандартный бэкенд с настроенным.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument(
+            '--writes', type=int, default=200,
+            help='Сколько комментариев добавляет каждый писатель.',
+        )
+        parser.add_argument('--readers', type=int, default=2)
+        parser.add_argument(
+            '--mode', choices=('stock', 'tuned', 'both'), default='both',
+        )
+        parser.add_argument(
+            '--output', help='Записать результаты в JSON-файл.',
+        )
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp(prefix='yatube-stress-')
+        try:
+            template = os.path.join(directory, 'template.sqlite3')
+            post_id, author_id = self.prepare(template)
+            modes = (
+                ('stock', 'tuned') if options['mode'] == 'both'
+                else (options['mode'],)
+            )
+            results = {}
+            for mode in modes:
+                path = os.path.join(directory, f'{mode}.sqlite3')
+                shutil.copyfile(template, path)
+                results[mode] = self.run_mode(
+                    mode, path, post_id, author_id, options
+                )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, ensure_ascii=False, indent=2)
+
+    def prepare(self, path):
+        """Чистая база со схемой проекта, одним автором и постом."""
+        alias = self.register(TEMPLATE_ALIAS, path, {'ENGINE': STOCK_ENGINE})
+        try:
+            call_command('migrate', database=alias, verbosity=0)
+            # bulk_create не шлёт сигналы, которые пишут в основную базу.
+            User.objects.using(alias).bulk_create([User(username='stress')])
+            author = User.objects.using(alias).get(username='stress')
+            Post.objects.using(alias).bulk_create(
+                [Post(author=author, text='Нагрузочный пост')]
+            )
+            post = Post.objects.using(alias).get()
+        finally:
+            self.unregister(alias)
+        return post.pk, author.pk
+
+    def register(self, alias, path, overrides):
+        connections.databases[alias] = {
+            **settings.DATABASES['default'], 'NAME': path, 'POOL': None,
+            **overrides,
+        }
+        return alias
+
+    def unregister(self, alias):
+        connections[alias].close()
+        del connections[alias]
+        del connections.databases[alias]
+
+    def run_mode(self, mode, path, post_id, author_id, options):
+        overrides = {}
+        if mode == 'stock':
+            overrides = {'ENGINE': STOCK_ENGINE, 'PRAGMAS': {},
+                         'TRANSACTION_MODE': None}
+        self.alias = self.register(f'stress_{mode}', path, overrides)
+        self.post_id, self.author_id = post_id, author_id
+        self.lock = threading.Lock()
+        self.writing = threading.Event()
+        self.writing.set()
+        self.timings, self.errors, self.reads = [], 0, 0
+
+        writers = [
+            threading.Thread(target=self.writer, args=(options['writes'],))
+            for _ in range(options['writers'])
+        ]
+        readers = [
+            threading.Thread(target=self.reader)
+            for _ in range(options['readers'])
+        ]
+        started = time.perf_counter()
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        self.writing.clear()
+        for thread in readers:
+            thread.join()
+        self.unregister(self.alias)
+
+        result = {
+            'writes': len(self.timings),
+            'lock_errors': self.errors,
+            'reads': self.reads,
+            'seconds': round(elapsed, 3),
+            'writes_per_second': round(len(self.timings) / elapsed, 1),
+        }
+        if self.timings:
+            result['latency_ms'] = benchmark.summarize(self.timings)
+        self.stdout.write(
+            f'{mode:>6}: {result["writes"]} записей, '
+            f'{result["lock_errors"]} ошибок блокировки, '
+            f'{result["writes_per_second"]} записей/с, '
+            f'{result["reads"]} чтений'
+        )
+        return result
+
+    def write(self):
+        posts = Post.objects.using(self.alias).filter(pk=self.post_id)
+        # Как add_comment: сначала чтение поста, затем запись.
+        with transaction.atomic(using=self.alias):
+            posts.values_list('comments_count', flat=True).get()
+            Comment.objects.using(self.alias).bulk_create([Comment(
+                post_id=self.post_id, author_id=self.author_id,
+                text='Нагрузка',
+            )])
+            posts.update(comments_count=F('comments_count') + 1)
+
+    def writer(self, writes):
+        timings, errors = [], 0
+        try:
+            for _ in range(writes):
+                started = time.perf_counter()
+                try:
+                    self.write()
+                except OperationalError:
+                    errors += 1
+                    continue
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            connections[self.alias].close()
+        with self.lock:
+            self.timings.extend(timings)
+            self.errors += errors
+
+    def reader(self):
+        comments = Comment.objects.using(self.alias).filter(
+            post_id=self.post_id
+        ).order_by('-created')
+        reads = 0
+        try:
+            while self.writing.is_set():
+                try:
+                    list(comments[:20])
+                except OperationalError:
+                    continue
+                reads += 1
+        finally:
+            connections[self.alias].close()
+        with self.lock:
+            self.reads += reads
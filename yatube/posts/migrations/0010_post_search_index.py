@@ -0,0 +1,34 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:05
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # Индекс FTS5 есть только на SQLite, другие базы ищут без него.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts '
+        'USING fts5(text, tokenize="unicode61")'
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_post_fts (rowid, text) '
+        "SELECT id, replace(replace(text, char(1), ''), char(2), '') "
+        'FROM posts_post'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_updated'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_feeditem_pub_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия комментариев'),
+        ),
+    ]
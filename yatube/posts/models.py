@@ -34,12 +34,44 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    image_original_bytes = models.PositiveIntegerField(
+        'Размер загруженной картинки',
+        null=True,
+        editable=False
+    )
+    image_bytes = models.PositiveIntegerField(
+        'Размер картинки после обработки',
+        null=True,
+        editable=False
+    )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
+    comments_version = models.PositiveIntegerField(
+        'Версия комментариев',
+        default=0,
+        editable=False
+    )
 
     def __str__(self):
         return self.text[:15]
 
     class Meta:
         ordering = ['-pub_date']
+        # Ленты автора и группы фильтруют по ключу и идут по ключу
+        # сортировки (-pub_date, -id) без отдельной сортировки.
+        indexes = [
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -59,6 +91,13 @@ class Comment(models.Model):
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        ordering = ['created', 'id']
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
     def __str__(self):
         return self.text[:15]
 
@@ -83,3 +122,62 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='unique_user_author')
         ]
+        # Подписчики автора: уникальный индекс (user, author) тут не помогает.
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые обновляются вместе с данными."""
+
+    user = models.OneToOneField(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Число подписок',
+        default=0
+    )
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class FeedItem(models.Model):
+    """Запись ленты подписок, разложенная при публикации поста."""
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Читатель',
+        on_delete=models.CASCADE,
+        related_name='feed_items'
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+        related_name='feed_items'
+    )
+    # Копия Post.pub_date: страница ленты — отрезок индекса ящика,
+    # без сортировки всех постов читателя.
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_feed_user_post')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='feeditem_user_pub_date_idx'),
+        ]
@@ -0,0 +1,206 @@
+"""Полнотекстовый поиск по постам.
+
+Поиск идёт через сменный бэкенд (настройка ``POST_SEARCH_BACKEND``).
+На SQLite по умолчанию работает индекс FTS5 с ранжированием bm25,
+на других базах — простой поиск по вхождению подстроки. Индекс
+обновляется сигналами при сохранении и удалении поста.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+
+FTS_TABLE = 'posts_post_fts'
+# Поиск ограничен первыми MAX_TERMS словами запроса.
+MAX_TERMS = 16
+SNIPPET_TOKENS = 24
+
+# Границы подсветки: управляющие символы не встречаются в тексте
+# поста, поэтому их можно заменить тегами уже после экранирования.
+MARK_START = '\x01'
+MARK_END = '\x02'
+
+_backend = None
+
+
+def query_terms(query):
+    return re.findall(r'\w+', query or '')[:MAX_TERMS]
+
+
+def render_highlight(marked):
+    """Экранирует фрагмент и превращает маркеры в ``<mark>``."""
+    return escape(marked).replace(MARK_START, '<mark>').replace(
+        MARK_END, '</mark>'
+    )
+
+
+def strip_markers(text):
+    return text.replace(MARK_START, '').replace(MARK_END, '')
+
+
+class SearchBackend:
+    """Интерфейс бэкенда поиска."""
+
+    def index(self, post):
+        """Добавляет или обновляет пост в индексе."""
+
+    def remove(self, post_id):
+        """Убирает пост из индекса."""
+
+    def rebuild(self):
+        """Перестраивает индекс по всем постам."""
+
+    def filter(self, queryset, query):
+        """Оставляет в queryset только посты, подходящие под запрос."""
+        raise NotImplementedError
+
+    def search(self, queryset, query):
+        """Подходящие посты с аннотацией ``search_rank``.
+
+        Чем меньше ``search_rank``, тем выше пост в выдаче.
+        """
+        raise NotImplementedError
+
+    def highlight(self, query, posts):
+        """Словарь ``{id поста: HTML-фрагмент с подсветкой}``."""
+        raise NotImplementedError
+
+
+class SimpleSearchBackend(SearchBackend):
+    """Поиск по вхождению подстроки для баз без полнотекстового индекса."""
+
+    def filter(self, queryset, query):
+        terms = query_terms(query)
+        if not terms:
+            return queryset.none()
+        for term in terms:
+            queryset = queryset.filter(text__icontains=term)
+        return queryset
+
+    def search(self, queryset, query):
+        return self.filter(queryset, query).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+    def highlight(self, query, posts):
+        terms = query_terms(query)
+        if not terms:
+            return {post.pk: escape(post.text) for post in posts}
+        pattern = re.compile(
+            '|'.join(re.escape(term) for term in terms), re.IGNORECASE
+        )
+        return {
+            post.pk: render_highlight(pattern.sub(
+                lambda match: MARK_START + match.group() + MARK_END,
+                strip_markers(post.text),
+            ))
+            for post in posts
+        }
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """Инвертированный индекс FTS5 с ранжированием bm25.
+
+    Таблица индекса хранит копию текста с ``rowid`` равным id поста
+    и создаётся миграцией. Выдача фильтруется подзапросом ``MATCH``,
+    а подсветка считается отдельным запросом только для постов
+    текущей страницы.
+    """
+
+    def match_query(self, query):
+        # Каждое слово в кавычках и с префиксным поиском: так
+        # операторы FTS5 из ввода пользователя не интерпретируются.
+        return ' '.join('"%s"*' % term for term in query_terms(query))
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk]
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+                [post.pk, strip_markers(post.text)],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) '
+                f"SELECT id, replace(replace(text, char(1), ''), "
+                f"char(2), '') FROM posts_post"
+            )
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"
+            )
+
+    def filter(self, queryset, query):
+        match = self.match_query(query)
+        if not match:
+            return queryset.none()
+        # Не ``id__in=RawSQL(...)``: Django оборачивает подзапрос во
+        # вторые скобки, и SQLite берёт из него только первую строку.
+        table = queryset.model._meta.db_table
+        return queryset.extra(
+            where=[
+                f'"{table}"."id" IN (SELECT rowid FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s)'
+            ],
+            params=[match],
+        )
+
+    def search(self, queryset, query):
+        match = self.match_query(query)
+        if not match:
+            return queryset.none().annotate(
+                search_rank=Value(0.0, output_field=FloatField())
+            )
+        table = queryset.model._meta.db_table
+        return self.filter(queryset, query).annotate(search_rank=RawSQL(
+            f'SELECT bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = "{table}"."id"',
+            (match,), output_field=FloatField(),
+        ))
+
+    def highlight(self, query, posts):
+        match = self.match_query(query)
+        ids = [post.pk for post in posts]
+        if not match or not ids:
+            return {post.pk: escape(post.text) for post in posts}
+        placeholders = ', '.join(['%s'] * len(ids))
+        # Сниппеты берём из той же базы, откуда прочитана страница.
+        alias = posts[0]._state.db or 'default'
+        with connections[alias].cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, snippet({FTS_TABLE}, 0, char(1), char(2), '
+                f"'…', %s) FROM {FTS_TABLE} "
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid IN ({placeholders})',
+                [SNIPPET_TOKENS, match, *ids],
+            )
+            return {
+                post_id: render_highlight(snippet)
+                for post_id, snippet in cursor.fetchall()
+            }
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'POST_SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == 'sqlite':
+            _backend = SQLiteFTSBackend()
+        else:
+            _backend = SimpleSearchBackend()
+    return _backend
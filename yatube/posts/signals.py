@@ -0,0 +1,101 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.caching import bump_generation_on_commit
+
+from . import cards, counters, feeds, follows, graph, search, thumbnails
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Посты, которые сейчас удаляются в этом потоке: их комментарии уходят
+# каскадом, и сдвигать счётчик удаляемого поста незачем.
+_deleting = threading.local()
+
+
+def deleting_posts():
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = set()
+    return _deleting.posts
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.author_id, posts_count=1)
+        feeds.fan_out_post(instance)
+    if instance.image:
+        thumbnails.schedule(instance.image.name)
+    search.get_backend().index(instance)
+    bump_generation_on_commit(feeds.FEEDS_NAMESPACE)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, using, **kwargs):
+    # Связь комментария с постом может быть пустой, поэтому Django
+    # удаляет пост и его комментарии в любом порядке: метка живёт до
+    # конца транзакции удаления.
+    pk = instance.pk
+    deleting_posts().add(pk)
+    transaction.on_commit(lambda: deleting_posts().discard(pk), using)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, posts_count=-1)
+    search.get_backend().remove(instance.pk)
+    bump_generation_on_commit(feeds.FEEDS_NAMESPACE)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    # Название группы выводится в её ленте и в ETag не попадает.
+    bump_generation_on_commit(feeds.FEEDS_NAMESPACE)
+    bump_generation_on_commit(cards.CARDS_NAMESPACE)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    # У нового пользователя карточек ещё нет, а вход меняет только
+    # last_login, которого в карточках нет.
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    bump_generation_on_commit(feeds.FEEDS_NAMESPACE)
+    bump_generation_on_commit(cards.CARDS_NAMESPACE)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if instance.post_id:
+        counters.bump_comments(instance.post_id, 1 if created else 0)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id and instance.post_id not in deleting_posts():
+        counters.bump_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.author_id, followers_count=1)
+        counters.bump_user(instance.user_id, following_count=1)
+        feeds.add_author(instance.user_id, instance.author_id)
+        follows.forget(instance.user_id)
+        graph.record(instance.user_id, added=[instance.author_id])
+        bump_generation_on_commit(feeds.FEEDS_NAMESPACE)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, followers_count=-1)
+    counters.bump_user(instance.user_id, following_count=-1)
+    feeds.remove_author(instance.user_id, instance.author_id)
+    follows.forget(instance.user_id)
+    graph.record(instance.user_id, removed=[instance.author_id])
+    bump_generation_on_commit(feeds.FEEDS_NAMESPACE)
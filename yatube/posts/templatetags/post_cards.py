@@ -0,0 +1,52 @@
+from django import template
+
+from posts import cards, follows, thumbnails
+
+register = template.Library()
+
+PREFETCHED = 'posts.cards.prefetched'
+FOLLOW_STATES = 'posts.follows.states'
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    """Отрисовывает карточку поста из кэша фрагментов.
+
+    При первом вызове на странице забирает карточки всего
+    ``page_obj`` из кэша, а миниатюры недостающих — из sorl.
+    """
+    prefetched = context.render_context.get(PREFETCHED)
+    if prefetched is None:
+        prefetched = cards.prefetch_cards(context.get('page_obj') or [])
+        context.render_context[PREFETCHED] = prefetched
+    cached, images, generation = prefetched
+    return cards.render_card(post, cached, images, generation)
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(image):
+    """Миниатюры картинки с srcset или исходник, пока их рисуют."""
+    return {'image': thumbnails.ready_post_image(image)}
+
+
+@register.inclusion_tag('posts/includes/follow_button.html',
+                        takes_context=True)
+def follow_button(context, author):
+    """Кнопка подписки на автора поста в ленте.
+
+    При первом вызове на странице узнаёт состояние подписок на всех
+    авторов ``page_obj`` из кэша подписок читателя.
+    """
+    user = context.get('user')
+    if user is None or not user.is_authenticated or user.pk == author.pk:
+        return {'author': None}
+    states = context.render_context.get(FOLLOW_STATES)
+    if states is None:
+        states = follows.follow_states(user, {
+            post.author_id for post in context.get('page_obj') or []
+        })
+        context.render_context[FOLLOW_STATES] = states
+    following = states.get(author.pk)
+    if following is None:
+        following = follows.is_following(user, author.pk)
+    return {'author': author, 'following': following}
@@ -0,0 +1,49 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..counters import get_stats
+from ..models import Comment, FeedItem, Follow, Post
+
+User = get_user_model()
+
+
+class SeedBulkTests(TestCase):
+    def test_seed_and_benchmark(self):
+        call_command(
+            'seed_bulk', users=30, posts=300, groups=3, follows=5,
+            comments=100, batch_size=50, stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(FeedItem.objects.exists())
+        author = Post.objects.first().author
+        self.assertEqual(
+            get_stats(author.pk).posts_count, author.posts.count()
+        )
+        # Даты постов разнесены по времени, а не совпадают с моментом вставки.
+        self.assertGreater(
+            Post.objects.values('pub_date').distinct().count(), 1
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.json')
+            call_command(
+                'bench_views', repeat=3, warmup=0, output=path,
+                stdout=StringIO(),
+            )
+            with open(path) as report_file:
+                report = json.load(report_file)
+        self.assertEqual(report['meta']['rows']['posts'], 300)
+        index = report['scenarios']['index']
+        self.assertEqual(index['statuses'], [200])
+        self.assertEqual(index['latency_ms']['count'], 3)
+        self.assertIn('p99', index['latency_ms'])
+        self.assertIn('follow_index', report['scenarios'])
@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import cards
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Auth')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Исходный текст', author=cls.user, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        cards.stats.reset()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_card_is_shared_between_feeds(self):
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(cards.stats.as_dict()['misses'], 1)
+        self.client.get(reverse('posts:group_posts', args=(self.group.slug,)))
+        self.client.get(reverse('posts:profile', args=(self.user.username,)))
+        self.assertEqual(cards.stats.hits, 2)
+        self.assertEqual(cards.stats.misses, 1)
+
+    def test_edit_invalidates_card(self):
+        self.client.get(reverse('posts:index'))
+        self.client.post(
+            reverse('posts:post_edit', args=(self.post.pk,)),
+            data={'text': 'Новый текст', 'group': self.group.pk}
+        )
+        content = self.client.get(reverse('posts:index')).content.decode()
+        self.assertIn('Новый текст', content)
+        self.assertNotIn('Исходный текст', content)
+
+    def test_author_and_group_edits_invalidate_cards(self):
+        self.client.get(reverse('posts:index'))
+        author = User.objects.get(pk=self.user.pk)
+        author.first_name = 'Новое'
+        author.last_name = 'Имя'
+        author.save()
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed'
+        group.save()
+        content = self.client.get(reverse('posts:index')).content.decode()
+        self.assertIn('Новое Имя', content)
+        self.assertIn(reverse('posts:group_posts', args=('renamed',)),
+                      content)
+
+    def test_login_keeps_cards(self):
+        self.client.get(reverse('posts:index'))
+        self.client.force_login(self.user)
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(cards.stats.hits, 1)
@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post
+from ..views import comments_per_page
+
+User = get_user_model()
+
+
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.reader, text=f'Ответ {number}')
+            for number in range(comments_per_page + 5)
+        )
+        cls.expected = list(
+            cls.post.comments.values_list('text', flat=True)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_post_detail_shows_first_page(self):
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            self.expected[:comments_per_page],
+        )
+        self.assertIsNotNone(comments.next_cursor)
+        self.assertContains(response, 'data-more-comments')
+
+    def test_fragment_returns_next_page(self):
+        first = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        ).context['comments']
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.pk,)),
+            {'cursor': first.next_cursor},
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            self.expected[comments_per_page:],
+        )
+        self.assertNotContains(response, 'data-more-comments')
+
+    def test_json_format(self):
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.pk,)),
+            {'format': 'json'},
+        )
+        data = response.json()
+        self.assertEqual(len(data['comments']), comments_per_page)
+        self.assertEqual(data['comments'][0]['author'], 'reader')
+        self.assertEqual(data['comments'][0]['text'], self.expected[0])
+        self.assertTrue(data['next_cursor'])
+
+    def test_unknown_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.pk + 100,))
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,105 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils.http import http_date
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def assertNotModified(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.templates, [])
+
+    def test_feeds_answer_not_modified(self):
+        for url in (reverse('posts:index'),
+                    reverse('posts:group_posts', args=(self.group.slug,)),
+                    reverse('posts:profile', args=(self.author.username,))):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                self.assertNotModified(url, etag)
+
+    def test_new_post_changes_feed_etag(self):
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(text='Новый пост', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый пост')
+
+    def test_etag_depends_on_reader_and_cursor(self):
+        url = reverse('posts:index')
+        anonymous = self.client.get(url)['ETag']
+        self.assertNotEqual(self.client.get(url + '?page=2')['ETag'],
+                            anonymous)
+        self.client.force_login(self.author)
+        self.assertNotEqual(self.client.get(url)['ETag'], anonymous)
+
+    def test_post_detail_validators(self):
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        self.assertNotModified(url, response['ETag'])
+
+    def test_if_modified_since_alone_sees_new_comment(self):
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.client.force_login(self.author)
+        self.client.get(url)
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Новый комментарий')
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 3600)
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый комментарий')
+
+    def test_comment_changes_post_etag(self):
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.author, text='Да')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_replaced_or_edited_comment_changes_post_etag(self):
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        comment = Comment.objects.create(
+            post=self.post, author=self.author, text='Первый'
+        )
+        etag = self.client.get(url)['ETag']
+        # Число комментариев то же, а страница уже другая.
+        comment.delete()
+        comment = Comment.objects.create(
+            post=self.post, author=self.author, text='Второй'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        comment.text = 'Исправленный'
+        comment.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_post_is_not_found(self):
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk + 100,))
+        )
+        self.assertEqual(response.status_code, 404)
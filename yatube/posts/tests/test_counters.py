@@ -0,0 +1,124 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from ..counters import get_stats
+from ..models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_post_counter_follows_creates_and_deletes(self):
+        post = Post.objects.create(text='Первый', author=self.author)
+        Post.objects.create(text='Второй', author=self.author)
+        self.assertEqual(get_stats(self.author.pk).posts_count, 2)
+        post.delete()
+        self.assertEqual(get_stats(self.author.pk).posts_count, 1)
+
+    def test_comment_counter(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.client.post(
+            reverse('posts:add_comment', args=(post.pk,)),
+            data={'text': 'Комментарий'}
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        Comment.objects.all().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_comment_counter_stays_non_negative(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        Post.objects.filter(pk=post.pk).update(comments_count=0)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_post_delete_skips_comment_counter(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.reader, text=f'Комментарий {n}')
+            for n in range(50)
+        ])
+        # Выборка комментариев, удаление их, ленты и поста, счётчик
+        # автора и поисковый индекс — без UPDATE на каждый комментарий.
+        with self.assertNumQueries(6):
+            post.delete()
+        self.assertFalse(Comment.objects.exists())
+
+    def test_follow_counters(self):
+        self.client.get(reverse('posts:profile_follow',
+                                args=(self.author.username,)))
+        self.assertEqual(get_stats(self.author.pk).followers_count, 1)
+        self.assertEqual(get_stats(self.reader.pk).following_count, 1)
+        self.client.get(reverse('posts:profile_unfollow',
+                                args=(self.author.username,)))
+        self.assertEqual(get_stats(self.author.pk).followers_count, 0)
+        self.assertEqual(get_stats(self.reader.pk).following_count, 0)
+
+    def test_profile_does_not_count_posts(self):
+        Post.objects.create(text='Пост', author=self.author)
+        get_stats(self.author.pk)
+        response = self.client.get(
+            reverse('posts:profile', args=(self.author.username,))
+        )
+        self.assertEqual(response.context['total_posts'], 1)
+
+    def test_reconcile_counters_repairs_drift(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='Да')
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.update(
+            posts_count=7, followers_count=7, following_count=7
+        )
+        Post.objects.update(comments_count=7)
+        call_command('reconcile_counters', stdout=StringIO())
+        author_stats = get_stats(self.author.pk)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(get_stats(self.reader.pk).following_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+
+class WriteTransactionTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def begins(self, method, url, data=None):
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            getattr(self.client, method)(url, data)
+        return [sql for sql in statements if sql.startswith('BEGIN')]
+
+    def test_form_render_and_validation_do_not_lock(self):
+        url = reverse('posts:post_create')
+        self.assertEqual(self.begins('get', url), [])
+        self.assertEqual(self.begins('post', url, {'text': ''}), [])
+        self.assertTrue(self.begins('post', url, {'text': 'Пост'}))
+        self.assertEqual(get_stats(self.user.pk).posts_count, 1)
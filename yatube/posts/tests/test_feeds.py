@@ -0,0 +1,86 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import feeds
+from ..models import FeedItem, Follow, Post
+
+User = get_user_model()
+
+
+class FeedInboxTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(
+            text='Пост до подписки', author=cls.author
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed_ids(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return [post.id for post in response.context['page_obj']]
+
+    def test_follow_backfills_and_new_posts_fan_out(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(
+            set(FeedItem.objects.filter(user=self.reader)
+                .values_list('post_id', flat=True)),
+            {self.old_post.id, new_post.id}
+        )
+        self.assertEqual(self.feed_ids(), [new_post.id, self.old_post.id])
+
+    def test_unfollow_clears_inbox(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.get(reverse('posts:profile_unfollow',
+                                kwargs={'username': self.author.username}))
+        self.assertFalse(FeedItem.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed_ids(), [])
+
+    def test_popular_author_is_merged_at_read_time(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        with mock.patch.object(feeds, 'FANOUT_MAX_FOLLOWERS', 0):
+            post = Post.objects.create(text='Для всех', author=self.author)
+            self.assertFalse(
+                FeedItem.objects.filter(post=post).exists()
+            )
+            self.assertEqual(self.feed_ids()[0], post.id)
+
+    def test_rebuild_feeds_restores_inbox(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        FeedItem.objects.all().delete()
+        call_command('rebuild_feeds', stdout=StringIO())
+        self.assertEqual(self.feed_ids(), [self.old_post.id])
+
+    def test_feed_pages_follow_inbox_key(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [self.old_post] + [
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+            for number in range(12)
+        ]
+        self.assertEqual(
+            set(FeedItem.objects.filter(user=self.reader)
+                .values_list('post_id', 'pub_date')),
+            {(post.id, post.pub_date) for post in posts}
+        )
+        url = reverse('posts:follow_index')
+        page = self.client.get(url).context['page_obj']
+        seen = [post.id for post in page]
+        page = self.client.get(
+            url, {'cursor': page.next_cursor}
+        ).context['page_obj']
+        seen += [post.id for post in page]
+        self.assertFalse(page.has_next())
+        self.assertEqual(seen, [post.id for post in reversed(posts)])
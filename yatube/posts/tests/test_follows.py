@@ -0,0 +1,185 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from .. import counters, follows
+from ..models import FeedItem, Follow, Post
+
+User = get_user_model()
+
+
+class BulkFollowTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{index}')
+            for index in range(3)
+        ]
+        cls.posts = [
+            Post.objects.create(text=f'Пост {author}', author=author)
+            for author in cls.authors
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def author_ids(self):
+        return [author.pk for author in self.authors]
+
+    def test_follow_authors_updates_follows_counters_and_feed(self):
+        created = follows.follow_authors(
+            self.reader, self.author_ids() + [self.reader.pk]
+        )
+        self.assertEqual(created, self.author_ids())
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader).count(), 3
+        )
+        self.assertEqual(
+            counters.get_stats(self.reader.pk).following_count, 3
+        )
+        for author in self.authors:
+            self.assertEqual(counters.get_stats(author.pk).followers_count, 1)
+        self.assertEqual(
+            set(FeedItem.objects.filter(user=self.reader)
+                .values_list('post_id', flat=True)),
+            {post.pk for post in self.posts}
+        )
+
+    def test_follow_authors_skips_existing(self):
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        created = follows.follow_authors(self.reader, self.author_ids())
+        self.assertEqual(created, self.author_ids()[1:])
+        self.assertEqual(
+            counters.get_stats(self.reader.pk).following_count, 3
+        )
+
+    def test_follow_authors_counts_only_inserted_rows(self):
+        bulk_create = Follow.objects.bulk_create
+
+        def racing_bulk_create(objs, **kwargs):
+            # Параллельная подписка успела между проверкой и вставкой.
+            Follow.objects.get_or_create(user=self.reader,
+                                         author=self.authors[0])
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(Follow.objects, 'bulk_create',
+                               racing_bulk_create):
+            created = follows.follow_authors(self.reader, self.author_ids())
+        self.assertEqual(created, self.author_ids()[1:])
+        self.assertEqual(
+            counters.get_stats(self.reader.pk).following_count, 3
+        )
+        self.assertEqual(
+            counters.get_stats(self.authors[0].pk).followers_count, 1
+        )
+
+    def test_unfollow_authors_reverses_follow(self):
+        follows.follow_authors(self.reader, self.author_ids())
+        removed = follows.unfollow_authors(self.reader, self.author_ids())
+        self.assertEqual(removed, self.author_ids())
+        self.assertFalse(Follow.objects.filter(user=self.reader).exists())
+        self.assertFalse(FeedItem.objects.filter(user=self.reader).exists())
+        self.assertEqual(
+            counters.get_stats(self.reader.pk).following_count, 0
+        )
+        self.assertEqual(
+            counters.get_stats(self.authors[0].pk).followers_count, 0
+        )
+        self.assertEqual(follows.unfollow_authors(self.reader, [1]), [])
+
+    def test_follow_states_are_cached_per_user(self):
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        with self.assertNumQueries(1):
+            states = follows.follow_states(self.reader, self.author_ids())
+        self.assertEqual(states, {
+            self.authors[0].pk: True,
+            self.authors[1].pk: False,
+            self.authors[2].pk: False,
+        })
+        with self.assertNumQueries(0):
+            follows.follow_states(self.reader, self.author_ids())
+        Follow.objects.create(user=self.reader, author=self.authors[1])
+        self.assertTrue(follows.is_following(self.reader, self.authors[1].pk))
+
+    def test_index_shows_follow_buttons_in_one_lookup(self):
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse('posts:index'))
+        unfollow = reverse('posts:profile_unfollow',
+                           kwargs={'username': self.authors[0].username})
+        follow = reverse('posts:profile_follow',
+                         kwargs={'username': self.authors[1].username})
+        self.assertContains(response, unfollow, count=1)
+        self.assertContains(response, follow, count=1)
+
+
+class ForgetOnCommitTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_following_cache_dropped_after_commit(self):
+        reader = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='author')
+        with transaction.atomic():
+            follows.follow_authors(reader, [author.pk])
+            # Другой запрос до коммита закэшировал прежние подписки.
+            cache.set(follows.FOLLOWING_KEY.format(reader.pk), frozenset())
+        self.assertTrue(follows.is_following(reader, author.pk))
+
+
+class BulkFollowViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.first = User.objects.create_user(username='first')
+        cls.second = User.objects.create_user(username='second')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.url = reverse('posts:follow_bulk')
+
+    def test_follow_and_unfollow(self):
+        response = self.client.post(self.url, {
+            'action': 'follow', 'author': ['first', 'second', 'nobody'],
+        })
+        self.assertEqual(response.json(), {
+            'action': 'follow',
+            'changed': ['first', 'second'],
+            'unknown': ['nobody'],
+        })
+        self.assertEqual(Follow.objects.filter(user=self.reader).count(), 2)
+        response = self.client.post(self.url, {
+            'action': 'unfollow', 'author': ['first'],
+        })
+        self.assertEqual(response.json()['changed'], ['first'])
+        self.assertEqual(
+            list(Follow.objects.filter(user=self.reader)
+                 .values_list('author__username', flat=True)),
+            ['second']
+        )
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        response = self.client.post(self.url, {'action': 'follow'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(self.url, {
+            'action': 'block', 'author': ['first'],
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_login(self):
+        response = Client().post(self.url, {
+            'action': 'follow', 'author': ['first'],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Follow.objects.exists())
@@ -0,0 +1,174 @@
+from array import array
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, SimpleTestCase, TransactionTestCase
+from django.urls import reverse
+
+from core.caching import bump_generation, get_generation
+
+from .. import follows, graph
+from ..models import Follow
+
+User = get_user_model()
+
+
+def make_graph(pairs):
+    pairs = sorted(pairs)
+    return graph.FollowGraph(
+        array(graph.TYPECODE, [user_id for user_id, _ in pairs]),
+        array(graph.TYPECODE, [author_id for _, author_id in pairs]),
+    )
+
+
+class FollowGraphTests(SimpleTestCase):
+    def test_adjacency_stays_sorted(self):
+        follow_graph = make_graph([(1, 5), (1, 3), (2, 3)])
+        self.assertTrue(follow_graph.add(1, 4))
+        self.assertFalse(follow_graph.add(1, 4))
+        self.assertEqual(list(follow_graph.following_of(1)), [3, 4, 5])
+        self.assertEqual(list(follow_graph.followers_of(3)), [1, 2])
+        self.assertTrue(follow_graph.remove(2, 3))
+        self.assertFalse(follow_graph.remove(2, 3))
+        self.assertEqual(list(follow_graph.followers_of(3)), [1])
+        self.assertFalse(follow_graph.is_following(2, 3))
+        self.assertEqual(follow_graph.edges, 3)
+
+    def test_snapshot_round_trip(self):
+        follow_graph = make_graph([(1, 2), (1, 3), (4, 1)])
+        restored = graph.FollowGraph.from_bytes(follow_graph.to_bytes())
+        self.assertEqual(restored.following, follow_graph.following)
+        self.assertEqual(restored.followers, follow_graph.followers)
+
+    def test_suggestions_rank_friends_of_friends(self):
+        follow_graph = make_graph([
+            (1, 2), (1, 3),
+            (2, 4), (3, 4), (2, 5), (3, 1), (2, 3),
+            (6, 5), (7, 5),
+        ])
+        self.assertEqual(follow_graph.suggestions(1), [(4, 2), (5, 1)])
+        self.assertEqual(follow_graph.suggestions(1, limit=1), [(4, 2)])
+        self.assertEqual(follow_graph.suggestions(8), [])
+
+
+class SharedGraphTests(TransactionTestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        self.friend = User.objects.create_user(username='friend')
+        cache.clear()
+        graph.reset()
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_graph_loads_once(self):
+        # Снимка в кэше нет: граф читается из базы одним запросом.
+        cache.clear()
+        graph.reset()
+        with self.assertNumQueries(1):
+            follow_graph = graph.get_graph()
+        self.assertTrue(follow_graph.is_following(self.reader.pk,
+                                                  self.author.pk))
+        with self.assertNumQueries(0):
+            graph.get_graph()
+
+    def test_follow_updates_graph_and_shares_changes(self):
+        graph.get_graph()
+        Follow.objects.create(user=self.author, author=self.friend)
+        follows.unfollow_authors(self.reader, [self.author.pk])
+        graph.reset()
+        # Другой процесс догоняет снимок изменениями из кэша, а не идёт
+        # в базу.
+        with self.assertNumQueries(0):
+            follow_graph = graph.get_graph()
+        self.assertTrue(follow_graph.is_following(self.author.pk,
+                                                  self.friend.pk))
+        self.assertFalse(follow_graph.is_following(self.reader.pk,
+                                                   self.author.pk))
+
+    def test_change_published_without_snapshot(self):
+        graph.get_graph()
+        with mock.patch.object(graph.FollowGraph, 'to_bytes') as to_bytes:
+            Follow.objects.create(user=self.author, author=self.friend)
+        to_bytes.assert_not_called()
+        generation = get_generation(graph.GRAPH_NAMESPACE)
+        self.assertEqual(
+            cache.get(graph.DELTA_KEY.format(generation)),
+            (self.author.pk, [self.friend.pk], []),
+        )
+
+    def test_lagging_graph_catches_up_with_changes(self):
+        follow_graph = graph.get_graph()
+        # Изменение из другого процесса: наш граф отстал на поколение.
+        generation = bump_generation(graph.GRAPH_NAMESPACE)
+        cache.set(graph.DELTA_KEY.format(generation),
+                  (self.author.pk, [self.friend.pk], []))
+        with self.assertNumQueries(0), \
+                mock.patch.object(graph.FollowGraph, 'from_bytes') as load:
+            self.assertIs(graph.get_graph(), follow_graph)
+        load.assert_not_called()
+        self.assertTrue(follow_graph.is_following(self.reader.pk,
+                                                  self.author.pk))
+        self.assertTrue(follow_graph.is_following(self.author.pk,
+                                                  self.friend.pk))
+
+    def test_missing_change_reloads_graph(self):
+        graph.get_graph()
+        # Изменение другого процесса выпало из кэша.
+        bump_generation(graph.GRAPH_NAMESPACE)
+        with self.assertNumQueries(0):
+            graph.record(self.author.pk, added=[self.friend.pk])
+        with self.assertNumQueries(1):
+            follow_graph = graph.get_graph()
+        self.assertTrue(follow_graph.is_following(self.reader.pk,
+                                                  self.author.pk))
+        graph.reset()
+        # Перечитанный граф стал новым снимком.
+        with self.assertNumQueries(0):
+            graph.get_graph()
+
+    def test_snapshot_built_inside_open_transaction(self):
+        generation = get_generation(graph.GRAPH_NAMESPACE)
+        with transaction.atomic():
+            Follow.objects.create(user=self.author, author=self.friend)
+            self.assertEqual(get_generation(graph.GRAPH_NAMESPACE),
+                             generation)
+            # Читатель строит снимок, пока транзакция ещё открыта.
+            cache.delete(graph.SNAPSHOT_KEY)
+            graph.reset()
+            graph.get_graph()
+            graph.reset()
+        self.assertEqual(get_generation(graph.GRAPH_NAMESPACE),
+                         generation + 1)
+        graph.reset()
+        with self.assertNumQueries(0):
+            follow_graph = graph.get_graph()
+        self.assertTrue(follow_graph.is_following(self.author.pk,
+                                                  self.friend.pk))
+        self.assertTrue(follow_graph.is_following(self.reader.pk,
+                                                  self.author.pk))
+
+    def test_rolled_back_follow_not_published(self):
+        generation = get_generation(graph.GRAPH_NAMESPACE)
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Follow.objects.create(user=self.author, author=self.friend)
+                raise RuntimeError
+        self.assertEqual(get_generation(graph.GRAPH_NAMESPACE), generation)
+        self.assertFalse(graph.get_graph().is_following(self.author.pk,
+                                                        self.friend.pk))
+
+    def test_follow_index_suggests_authors(self):
+        Follow.objects.create(user=self.author, author=self.friend)
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [(author.pk, mutual)
+             for author, mutual in response.context['suggestions']],
+            [(self.friend.pk, 1)]
+        )
+        self.assertContains(response, reverse(
+            'posts:profile_follow', kwargs={'username': 'friend'}
+        ))
@@ -0,0 +1,105 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import (SimpleUploadedFile,
+                                            TemporaryUploadedFile)
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..images import process_upload
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+EXIF_ORIENTATION = 0x0112
+EXIF_MAKE = 0x010F
+# Камера держалась вертикально: картинку надо повернуть на 90°.
+ROTATE_90 = 6
+
+
+def make_photo(size=(3000, 2000)):
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION] = ROTATE_90
+    exif[EXIF_MAKE] = 'Camera'
+    buffer = BytesIO()
+    Image.effect_noise(size, 60).convert('RGB').save(
+        buffer, 'JPEG', quality=95, exif=exif.tobytes()
+    )
+    return buffer.getvalue()
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_PREGENERATE_WORKERS=0,
+    POST_IMAGE_MAX_SIZE=(800, 800),
+)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create_post(self, upload):
+        self.client.post(reverse('posts:post_create'), data={
+            'text': 'С картинкой', 'image': upload,
+        })
+        return Post.objects.get(text='С картинкой')
+
+    def test_photo_downscaled_rotated_and_stripped(self):
+        photo = make_photo()
+        post = self.create_post(
+            SimpleUploadedFile('photo.JPG', photo, 'image/jpeg')
+        )
+        with Image.open(post.image.path) as stored:
+            self.assertIn(stored.format, ('WEBP', 'JPEG'))
+            self.assertEqual(stored.size, (533, 800))
+            self.assertEqual(dict(stored.getexif()), {})
+        self.assertEqual(post.image_original_bytes, len(photo))
+        self.assertEqual(post.image_bytes, post.image.size)
+        self.assertLess(post.image_bytes, post.image_original_bytes)
+
+    def test_transparency_kept(self):
+        buffer = BytesIO()
+        Image.new('RGBA', (50, 50), (255, 0, 0, 100)).save(buffer, 'PNG')
+        post = self.create_post(
+            SimpleUploadedFile('logo.png', buffer.getvalue(), 'image/png')
+        )
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.mode, 'RGBA')
+
+    def test_animation_kept_as_is(self):
+        frames = [Image.new('P', (20, 20), color) for color in (1, 2)]
+        buffer = BytesIO()
+        frames[0].save(buffer, 'GIF', save_all=True,
+                       append_images=frames[1:])
+        post = self.create_post(
+            SimpleUploadedFile('cat.gif', buffer.getvalue(), 'image/gif')
+        )
+        self.assertTrue(post.image.name.endswith('.gif'))
+        self.assertEqual(post.image_bytes, post.image_original_bytes)
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_large_upload_processed_on_disk(self):
+        photo = make_photo((1200, 900))
+        upload = TemporaryUploadedFile(
+            'photo.jpg', 'image/jpeg', len(photo), None
+        )
+        upload.write(photo)
+        processed = process_upload(upload)
+        self.assertTrue(processed.file.file._rolled)
+        self.assertEqual(processed.original_bytes, len(photo))
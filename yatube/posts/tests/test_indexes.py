@@ -0,0 +1,31 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..management.commands import explain_feeds
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExplainFeedsTests(TestCase):
+    def test_feeds_use_composite_indexes(self):
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        post = Post.objects.create(text='Пост', author=author, group=group)
+        Comment.objects.create(post=post, author=reader, text='Да')
+        Follow.objects.create(user=reader, author=author)
+        out = StringIO()
+        call_command('explain_feeds', stdout=out)
+        plans = out.getvalue()
+        for index in ('post_author_pub_date_idx', 'post_group_pub_date_idx',
+                      'comment_post_created_idx', 'follow_author_user_idx'):
+            self.assertIn(index, plans)
+        self.assertIn('feeditem_user_pub_date_idx', plans)
+        self.assertNotIn(explain_feeds.TEMP_SORT, plans)
+        self.assertIn('Все запросы идут по индексам', plans)
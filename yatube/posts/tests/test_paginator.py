@@ -0,0 +1,121 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import InvalidPage, Page
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post
+from ..paginator import KeysetPaginator, encode_cursor
+
+User = get_user_model()
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Auth')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {number}', author=cls.user)
+            for number in range(25)
+        )
+        # Часть постов с одинаковой датой: порядок решает id.
+        first = Post.objects.order_by('id').first()
+        Post.objects.filter(id__lte=first.id + 4).update(
+            pub_date=first.pub_date
+        )
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-id')
+            .values_list('id', flat=True)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.paginator = KeysetPaginator(Post.objects.all(), 10)
+
+    def walk_forward(self):
+        page = self.paginator.first_page()
+        pages = [page]
+        while page.next_cursor:
+            page = self.paginator.get_cursor_page(page.next_cursor)
+            pages.append(page)
+        return pages
+
+    def test_cursor_pages_cover_feed_without_gaps(self):
+        pages = self.walk_forward()
+        ids = [post.id for page in pages for post in page]
+        self.assertEqual(ids, self.expected)
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertIsNone(pages[0].previous_cursor)
+
+    def test_previous_cursor_returns_same_page(self):
+        pages = self.walk_forward()
+        previous = self.paginator.get_cursor_page(pages[2].previous_cursor)
+        self.assertEqual(
+            [post.id for post in previous], [post.id for post in pages[1]]
+        )
+        first = self.paginator.get_cursor_page(pages[1].previous_cursor)
+        self.assertEqual(
+            [post.id for post in first], self.expected[:10]
+        )
+        self.assertIsNone(first.previous_cursor)
+
+    def test_last_cursor_returns_oldest_posts(self):
+        first = self.paginator.first_page()
+        last = self.paginator.get_cursor_page(first.last_cursor)
+        self.assertEqual([post.id for post in last], self.expected[-10:])
+        self.assertIsNone(last.next_cursor)
+
+    def test_cursor_page_does_not_count_or_offset(self):
+        page = self.paginator.first_page()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('posts:index'), {'cursor': page.next_cursor}
+            )
+        sql = ' '.join(query['sql'] for query in queries).upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_cursor_pages_answer_page_methods_without_count(self):
+        first, middle, last = self.walk_forward()
+        self.assertIs(type(middle), Page)
+        with self.assertNumQueries(0):
+            self.assertTrue(first.has_next())
+            self.assertFalse(first.has_previous())
+            self.assertEqual(first.next_page_number(), 2)
+            self.assertEqual((first.start_index(), first.end_index()),
+                             (1, 10))
+            self.assertTrue(middle.has_next())
+            self.assertTrue(middle.has_previous())
+            self.assertIsNone(middle.start_index())
+            self.assertFalse(last.has_next())
+        with self.assertRaises(InvalidPage):
+            middle.next_page_number()
+        restored = self.paginator.restore_page(
+            KeysetPaginator.page_state(last)
+        )
+        self.assertFalse(restored.has_next())
+        self.assertTrue(restored.has_previous())
+
+    def test_page_number_still_supported(self):
+        response = self.client.get(reverse('posts:index'), {'page': 3})
+        self.assertEqual(
+            [post.id for post in response.context['page_obj']],
+            self.expected[20:]
+        )
+        self.assertIsNotNone(response.context['page_obj'].previous_cursor)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        for token in ('мусор', encode_cursor('n', ['не-дата', 'x'])):
+            with self.subTest(token=token):
+                response = self.client.get(
+                    reverse('posts:index'), {'cursor': token}
+                )
+                self.assertEqual(
+                    [post.id for post in response.context['page_obj']],
+                    self.expected[:10]
+                )
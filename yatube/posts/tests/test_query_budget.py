@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.middleware.query_budget import QUERY_COUNT_HEADER
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_RAISE=True)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def add_posts(self, count):
+        for number in range(count):
+            post = Post.objects.create(
+                text=f'Пост {number}', author=self.author, group=self.group
+            )
+            Comment.objects.create(post=post, author=self.reader, text='Да')
+        return post
+
+    def query_count(self, url):
+        cache.clear()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return int(response[QUERY_COUNT_HEADER])
+
+    def test_feed_queries_do_not_grow_with_page(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:follow_index'),
+            reverse('posts:post_search') + '?q=Пост',
+        )
+        self.add_posts(1)
+        self.client.force_login(self.reader)
+        single = [self.query_count(url) for url in urls]
+        self.add_posts(9)
+        full = [self.query_count(url) for url in urls]
+        self.assertEqual(full, single)
+
+    def test_comments_do_not_cause_n_plus_one(self):
+        post = self.add_posts(1)
+        url = reverse('posts:post_detail', args=(post.pk,))
+        single = self.query_count(url)
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.reader, text='Ещё')
+            for _ in range(9)
+        )
+        self.assertEqual(self.query_count(url), single)
@@ -0,0 +1,111 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post
+from ..search import SimpleSearchBackend, get_backend
+
+User = get_user_model()
+
+
+class PostSearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Auth')
+        cls.exact = Post.objects.create(
+            text='Котики котики котики и собаки', author=cls.user
+        )
+        cls.once = Post.objects.create(
+            text='Один котик среди длинного текста про погоду и дождь',
+            author=cls.user,
+        )
+        cls.other = Post.objects.create(text='Про собак', author=cls.user)
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, query, **params):
+        return self.client.get(
+            reverse('posts:post_search'), {'q': query, **params}
+        )
+
+    def test_results_are_ranked(self):
+        response = self.search('котик')
+        posts = list(response.context['page_obj'])
+        self.assertEqual(posts, [self.exact, self.once])
+
+    def test_index_follows_edit_and_delete(self):
+        self.other.text = 'Теперь про котиков'
+        self.other.save()
+        self.assertIn(self.other, self.search('котиков').context['page_obj'])
+        self.other.delete()
+        self.assertEqual(len(self.search('котиков').context['page_obj']), 0)
+
+    def test_highlight_is_escaped(self):
+        Post.objects.create(
+            text='<script>alert(1)</script> ёжик', author=self.user
+        )
+        content = self.search('ёжик').content.decode()
+        self.assertIn('<mark>ёжик</mark>', content)
+        self.assertIn('&lt;script&gt;', content)
+        self.assertNotIn('<script>alert', content)
+
+    def test_operators_in_query_are_not_interpreted(self):
+        response = self.search('котик"*(')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(response.context['page_obj']), [self.exact, self.once]
+        )
+
+    def test_empty_query(self):
+        response = self.search('')
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_cursor_pagination_keeps_query(self):
+        Post.objects.bulk_create(
+            Post(text=f'Погода номер {number}', author=self.user)
+            for number in range(15)
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+        first = self.search('погода').context['page_obj']
+        self.assertEqual(len(first), 10)
+        self.assertContains(
+            self.search('погода'), '?q=%D0%BF%D0%BE%D0%B3%D0%BE%D0%B4%D0%B0'
+            f'&amp;cursor={first.next_cursor}'
+        )
+        second = self.search('погода', cursor=first.next_cursor)
+        seen = [post.pk for post in first] + [
+            post.pk for post in second.context['page_obj']
+        ]
+        self.assertEqual(len(seen), 15)
+        self.assertEqual(len(set(seen)), 15)
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котик'}
+        )
+        self.assertEqual(
+            set(response.context['cl'].result_list), {self.exact, self.once}
+        )
+
+
+class SimpleSearchBackendTests(TestCase):
+    def test_filter_and_highlight(self):
+        user = User.objects.create_user(username='Auth')
+        post = Post.objects.create(text='котики <b>и</b> собаки', author=user)
+        backend = SimpleSearchBackend()
+        found = list(backend.search(Post.objects.all(), 'котики'))
+        self.assertEqual(found, [post])
+        self.assertEqual(
+            backend.highlight('котики', found)[post.pk],
+            '<mark>котики</mark> &lt;b&gt;и&lt;/b&gt; собаки',
+        )
+
+    def test_default_backend_on_sqlite(self):
+        self.assertEqual(type(get_backend()).__name__, 'SQLiteFTSBackend')
@@ -0,0 +1,255 @@
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+
+from core.caching import get_generation
+from core.thumbnail_kvstore import local_index
+
+from .. import thumbnails
+from ..feeds import FEEDS_NAMESPACE
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def kvstore_queries(queries):
+    return [
+        query['sql'] for query in queries
+        if 'thumbnail_kvstore' in query['sql']
+    ]
+
+
+def make_image(name='photo.png', size=(1200, 800)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color=(200, 30, 30)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPregenerationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    @override_settings(THUMBNAIL_PREGENERATE_WORKERS=0)
+    def test_thumbnail_is_ready_after_create(self):
+        self.client.post(reverse('posts:post_create'), data={
+            'text': 'С картинкой', 'image': make_image(),
+        })
+        post = Post.objects.get(text='С картинкой')
+        thumbnail = thumbnails.backend.lookup(
+            post.image, thumbnails.POST_THUMBNAIL_GEOMETRY,
+            **thumbnails.POST_THUMBNAIL_OPTIONS
+        )
+        self.assertIsNotNone(thumbnail)
+        self.assertEqual(tuple(thumbnail.size), (960, 339))
+        content = self.client.get(reverse('posts:index')).content.decode()
+        self.assertIn(thumbnail.url, content)
+
+    def test_original_image_is_shown_until_thumbnail_is_ready(self):
+        # Пул процессов запускается только после коммита транзакции,
+        # которого в TestCase не бывает: миниатюра остаётся не готовой.
+        post = Post.objects.create(
+            text='Ждёт миниатюру', author=self.user, image=make_image()
+        )
+        content = self.client.get(reverse('posts:index')).content.decode()
+        self.assertIn(post.image.url, content)
+        self.assertNotIn('srcset', content)
+
+    @override_settings(THUMBNAIL_PREGENERATE_WORKERS=0)
+    def test_srcset_lists_all_widths(self):
+        self.client.post(reverse('posts:post_create'), data={
+            'text': 'С картинкой', 'image': make_image(),
+        })
+        post = Post.objects.get(text='С картинкой')
+        content = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,))
+        ).content.decode()
+        srcset = thumbnails.srcset(post.image)
+        self.assertIn(f'srcset="{srcset}"', content)
+        for width in thumbnails.POST_THUMBNAIL_WIDTHS:
+            self.assertIn(f' {width}w', srcset)
+        for url in srcset.split(', '):
+            name = url.split()[0][len(settings.MEDIA_URL):]
+            self.assertTrue(default.storage.exists(name), name)
+
+    def drop_variants(self, post):
+        # Картинка загружена до появления вариантов: зарегистрирована
+        # только основная миниатюра.
+        for geometry_string, options in thumbnails.post_variants()[:-1]:
+            _, variant, _ = thumbnails.backend.resolve(
+                post.image, geometry_string, **options
+            )
+            default.kvstore.delete(variant, delete_thumbnails=False)
+            variant.delete()
+        cache.clear()
+
+    @override_settings(THUMBNAIL_PREGENERATE_WORKERS=0)
+    def test_srcset_waits_for_variants_of_old_thumbnail(self):
+        post = Post.objects.create(
+            text='Старая картинка', author=self.user, image=make_image()
+        )
+        self.drop_variants(post)
+        url = reverse('posts:post_detail', args=(post.pk,))
+        with mock.patch.object(thumbnails, 'prepare') as prepare:
+            content = self.client.get(url).content.decode()
+        # Страница ничего не рисует: без воркеров варианты дорисует
+        # команда.
+        prepare.assert_not_called()
+        main = thumbnails.ready_thumbnail(post.image)
+        self.assertIn(main.url, content)
+        self.assertNotIn('srcset', content)
+        with mock.patch.object(thumbnails, 'create_pool',
+                               ThreadPoolExecutor):
+            call_command('backfill_thumbnails', stdout=StringIO())
+        for url_width in thumbnails.srcset(post.image).split(', '):
+            name = url_width.split()[0][len(settings.MEDIA_URL):]
+            self.assertTrue(default.storage.exists(name), name)
+        content = self.client.get(url).content.decode()
+        self.assertIn(f'srcset="{thumbnails.srcset(post.image)}"', content)
+
+    @override_settings(THUMBNAIL_PREGENERATE_WORKERS=0)
+    def test_missing_variants_go_to_pool_from_page(self):
+        post = Post.objects.create(
+            text='Старая картинка', author=self.user, image=make_image()
+        )
+        self.drop_variants(post)
+        url = reverse('posts:post_detail', args=(post.pk,))
+        with override_settings(THUMBNAIL_PREGENERATE_WORKERS=1), \
+                mock.patch.object(thumbnails, 'prepare') as prepare, \
+                mock.patch.object(thumbnails, 'submit') as submit, \
+                mock.patch.object(thumbnails.transaction, 'on_commit',
+                                  lambda func: func()):
+            self.client.get(url)
+        prepare.assert_not_called()
+        submit.assert_called_once_with(post.image.name)
+
+    @override_settings(THUMBNAIL_PREGENERATE_WORKERS=0)
+    def test_registration_invalidates_only_its_post(self):
+        post = Post.objects.create(
+            text='С картинкой', author=self.user, image=make_image()
+        )
+        other = Post.objects.create(text='Без картинки', author=self.user)
+        url = reverse('posts:post_detail', args=(post.pk,))
+        etag = self.client.get(url)['ETag']
+        other_updated = other.updated
+        generation = get_generation(FEEDS_NAMESPACE)
+        thumbnails.register_thumbnail(post.image.name)
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+        other.refresh_from_db()
+        self.assertEqual(other.updated, other_updated)
+        self.assertEqual(get_generation(FEEDS_NAMESPACE), generation)
+
+    def test_variants_rendered_from_one_decode(self):
+        post = Post.objects.create(
+            text='Варианты', author=self.user, image=make_image()
+        )
+        with mock.patch.object(
+            default.engine, 'get_image', wraps=default.engine.get_image
+        ) as get_image:
+            names = thumbnails.render_thumbnail(post.image.name)
+        self.assertEqual(get_image.call_count, 1)
+        self.assertEqual(len(names), len(thumbnails.post_variants()))
+        self.assertEqual(len(set(names)), len(names))
+
+    @override_settings(THUMBNAIL_PREGENERATE_WORKERS=0)
+    def test_registration_writes_variants_in_bulk(self):
+        with CaptureQueriesContext(connection) as queries:
+            Post.objects.create(
+                text='Запись', author=self.user, image=make_image()
+            )
+        selects = [
+            sql for sql in kvstore_queries(queries)
+            if sql.startswith('SELECT')
+        ]
+        self.assertLessEqual(len(selects), 1)
+
+    @override_settings(THUMBNAIL_PREGENERATE_WORKERS=0)
+    def test_page_thumbnails_resolved_in_one_query(self):
+        for number in range(3):
+            Post.objects.create(
+                text=f'Пост {number}', author=self.user, image=make_image()
+            )
+        cache.clear()
+        local_index.clear()
+        with CaptureQueriesContext(connection) as queries:
+            content = self.client.get(reverse('posts:index')).content
+        self.assertEqual(len(kvstore_queries(queries)), 1)
+        self.assertEqual(content.decode().count('srcset='), 3)
+        # Записи о миниатюрах остались в памяти процесса.
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:index'))
+        self.assertEqual(kvstore_queries(queries), [])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT,
+                   THUMBNAIL_PREGENERATE_WORKERS=1)
+class ThumbnailPoolCallbackTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(setattr, thumbnails, '_executor', None)
+        # Потоки вместо процессов: воркеру нужны настройки теста.
+        thumbnails._executor = ThreadPoolExecutor(1)
+        self.addCleanup(thumbnails._executor.shutdown)
+
+    def test_callback_thread_releases_connections(self):
+        name = default_storage.save('posts/pool.png', make_image())
+        started = threading.Event()
+        closed = threading.Event()
+        closing_threads = []
+        render = thumbnails.render_thumbnail
+
+        def slow_render(image_name):
+            # Будущее готово только после add_done_callback.
+            started.wait(5)
+            return render(image_name)
+
+        def close_all():
+            closing_threads.append(threading.get_ident())
+            closed.set()
+
+        with mock.patch.object(thumbnails, 'render_thumbnail', slow_render), \
+                mock.patch.object(thumbnails.connections, 'close_all',
+                                  side_effect=close_all):
+            thumbnails.submit(name)
+            started.set()
+            self.assertTrue(closed.wait(10))
+        self.assertNotEqual(closing_threads, [threading.get_ident()])
+        self.assertIsNotNone(
+            thumbnails.ready_thumbnail(Post(image=name).image)
+        )
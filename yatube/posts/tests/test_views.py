@@ -308,17 +308,13 @@ class PaginatorViewsTest(TestCase):
             self.assertEqual(
                 len(response.context['page_obj']), posts_on_the_second_page)
 
-    def test_index_page_cache(self):
+    def test_index_page_shows_new_post_at_once(self):
         response = self.authorized_client.get(reverse('posts:index'))
-        posts = response.content
         Post.objects.create(
-            text='Тест',
+            text='Тест без ожидания кэша',
             author=self.user,
         )
-        response_old = self.authorized_client.get(reverse('posts:index'))
-        old_posts = response_old.content
-        self.assertEqual(old_posts, posts)
-        cache.clear()
         response_new = self.authorized_client.get(reverse('posts:index'))
-        new_posts = response_new.content
-        self.assertNotEqual(old_posts, new_posts)
+        self.assertNotEqual(response_new.content, response.content)
+        self.assertIn('Тест без ожидания кэша',
+                      response_new.content.decode())
@@ -0,0 +1,389 @@
+"""Заранее готовит миниатюры картинок постов в пуле процессов.
+
+Декодирование и сжатие картинки занимают процессор, поэтому файлы
+миниатюр рисуются в отдельных процессах сразу после сохранения поста.
+Запись в key-value хранилище sorl-thumbnail делает основной процесс,
+так что воркерам не нужна база данных. Пока миниатюра не готова,
+шаблоны показывают исходную картинку.
+
+Страницы миниатюры никогда не рисуют: недостающие они только отдают
+пулу, а без воркеров показывают запасной вариант, пока миниатюры не
+дорисует ``backfill_thumbnails``.
+
+Для ``srcset`` рисуется несколько ширин, а если Pillow умеет WebP —
+ещё и в WebP. Все варианты получаются из одного декодирования
+исходной картинки.
+"""
+import logging
+import multiprocessing
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.parsers import parse_geometry
+
+from core.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Геометрия и параметры миниатюры во всех шаблонах постов.
+POST_THUMBNAIL_GEOMETRY = '960x339'
+POST_THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+# Ширины для srcset с пропорциями основной миниатюры.
+POST_THUMBNAIL_WIDTHS = (320, 640, 960)
+# Форматы помимо JPEG, которые браузер выберет через <picture>.
+POST_THUMBNAIL_FORMATS = ('WEBP',) if features.check('webp') else ()
+CONTENT_TYPES = {'WEBP': 'image/webp'}
+
+PostImage = namedtuple('PostImage', 'src srcset sources')
+
+PENDING_KEY = 'thumbnails:pending:{}'
+PENDING_TIMEOUT = 5 * 60
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class PregeneratingBackend(ThumbnailBackend):
+    """Бэкенд sorl, разделяющий поиск и отрисовку миниатюры."""
+
+    def resolve(self, file_, geometry_string, **options):
+        """Повторяет подготовку ``get_thumbnail`` без генерации."""
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return source, ImageFile(name, default.storage), options
+
+    def lookup(self, file_, geometry_string, **options):
+        """Готовая миниатюра из хранилища или None."""
+        _, thumbnail, _ = self.resolve(file_, geometry_string, **options)
+        return default.kvstore.get(thumbnail)
+
+    def render(self, file_, geometry_string, **options):
+        """Рисует файл миниатюры, не трогая key-value хранилище."""
+        return self.render_variants(file_, [(geometry_string, options)])[0]
+
+    def render_variants(self, file_, variants):
+        """Рисует недостающие варианты ``(геометрия, опции)`` картинки.
+
+        Исходник декодируется один раз; JPEG — сразу в уменьшенном
+        масштабе, достаточном для самого крупного варианта. Варианты
+        должны быть одних пропорций: каждый следующий уменьшается из
+        предыдущего, а одна геометрия в разных форматах рисуется один
+        раз и только сохраняется по-разному.
+        """
+        names, missing = [], []
+        for geometry_string, options in variants:
+            source, thumbnail, options = self.resolve(
+                file_, geometry_string, **options
+            )
+            names.append(thumbnail.name)
+            if not thumbnail.exists():
+                missing.append((geometry_string, options, thumbnail))
+        if not missing:
+            return names
+        missing.sort(key=lambda variant: geometry_area(variant[0]),
+                     reverse=True)
+        engine = default.engine
+        source_image = engine.get_image(source)
+        try:
+            image_info = engine.get_image_info(source_image)
+            if hasattr(source_image, 'draft'):
+                # Квадрат по большей стороне: после поворота по EXIF
+                # ширина и высота могут поменяться местами.
+                side = max(parse_size(missing[0][0]))
+                source_image.draft(source_image.mode, (side, side))
+            created, previous = {}, source_image
+            for geometry_string, options, thumbnail in missing:
+                options['image_info'] = image_info
+                image = created.get(geometry_string)
+                if image is None:
+                    geometry = parse_geometry(
+                        geometry_string,
+                        engine.get_image_ratio(previous, options),
+                    )
+                    image = engine.create(previous, geometry, options)
+                    created[geometry_string] = previous = image
+                engine.write(image, options, thumbnail)
+                thumbnail.set_size(engine.get_image_size(image))
+        finally:
+            engine.cleanup(source_image)
+        return names
+
+
+def parse_size(geometry_string):
+    return [int(size) for size in geometry_string.split('x') if size]
+
+
+def geometry_area(geometry_string):
+    area = 1
+    for size in parse_size(geometry_string):
+        area *= size
+    return area
+
+
+backend = PregeneratingBackend()
+
+
+def variant_geometry(width):
+    base_width, base_height = map(int, POST_THUMBNAIL_GEOMETRY.split('x'))
+    return f'{width}x{round(width * base_height / base_width)}'
+
+
+def post_variants():
+    """Варианты миниатюр поста; основной — последний."""
+    variants = []
+    for image_format in POST_THUMBNAIL_FORMATS:
+        options = {**POST_THUMBNAIL_OPTIONS, 'format': image_format}
+        variants += [
+            (variant_geometry(width), options)
+            for width in POST_THUMBNAIL_WIDTHS
+        ]
+    variants += [
+        (variant_geometry(width), POST_THUMBNAIL_OPTIONS)
+        for width in POST_THUMBNAIL_WIDTHS
+        if variant_geometry(width) != POST_THUMBNAIL_GEOMETRY
+    ]
+    variants.append((POST_THUMBNAIL_GEOMETRY, POST_THUMBNAIL_OPTIONS))
+    return variants
+
+
+def init_worker():
+    import django
+    django.setup()
+
+
+def create_pool(workers):
+    # spawn, а не fork: форк многопоточного воркера небезопасен.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_worker,
+    )
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = create_pool(settings.THUMBNAIL_PREGENERATE_WORKERS)
+        return _executor
+
+
+def render_thumbnail(name):
+    """Выполняется в воркере: только файлы миниатюр, за один проход."""
+    return backend.render_variants(name, post_variants())
+
+
+def register_thumbnail(name):
+    """Записывает готовые миниатюры в key-value хранилище sorl.
+
+    Все варианты записываются одной транзакцией, так что шаблоны
+    видят их разом.
+    """
+    try:
+        # Файлы уже есть: нужны только записи о них.
+        thumbnails = [
+            backend.resolve(name, geometry_string, **options)[1]
+            for geometry_string, options in post_variants()
+        ]
+        default.kvstore.set_many(ImageFile(name), thumbnails)
+    finally:
+        cache.delete(PENDING_KEY.format(name))
+    # Воркер импортирует этот модуль до django.setup(), поэтому
+    # модели подключаются только здесь.
+    from django.utils import timezone
+
+    from .models import Post
+
+    # Карточка и ETag поста с исходной картинкой устарели: сдвигаем
+    # версию только этих постов, без сигналов сохранения.
+    Post.objects.filter(image=name).update(updated=timezone.now())
+    return thumbnails[-1]
+
+
+@timed('thumbnail')
+def prepare(name):
+    """Рисует и регистрирует миниатюру в текущем процессе."""
+    render_thumbnail(name)
+    return register_thumbnail(name)
+
+
+def _on_rendered(name, future, caller):
+    try:
+        future.result()
+        register_thumbnail(name)
+    except Exception:
+        cache.delete(PENDING_KEY.format(name))
+        logger.exception('Не удалось подготовить миниатюру %s', name)
+    finally:
+        # Обычно обратный вызов выполняет служебный поток пула: его
+        # соединения больше никому не нужны и занимали бы место в пуле
+        # соединений. Если же будущее уже было готово, вызов идёт в
+        # потоке запроса, и соединение закроет сам Django.
+        if threading.get_ident() != caller:
+            connections.close_all()
+
+
+def submit(name):
+    future = get_executor().submit(render_thumbnail, name)
+    caller = threading.get_ident()
+    future.add_done_callback(lambda done: _on_rendered(name, done, caller))
+    return future
+
+
+def schedule(name):
+    """Готовит миниатюры сохранённой картинки, если их ещё не готовят.
+
+    Без воркеров рисует их сразу, в запросе, сохраняющем пост.
+    """
+    if settings.THUMBNAIL_PREGENERATE_WORKERS:
+        enqueue(name)
+        return
+    if not name or not cache.add(PENDING_KEY.format(name), 1,
+                                 PENDING_TIMEOUT):
+        return
+    try:
+        prepare(name)
+    except Exception:
+        cache.delete(PENDING_KEY.format(name))
+        logger.exception('Не удалось подготовить миниатюру %s', name)
+
+
+def enqueue(name):
+    """Отдаёт картинку пулу, если она ещё не готовится.
+
+    Так недостающие миниатюры заказывают страницы: без воркеров вызов
+    ничего не делает.
+    """
+    if (not name or not settings.THUMBNAIL_PREGENERATE_WORKERS
+            or not cache.add(PENDING_KEY.format(name), 1, PENDING_TIMEOUT)):
+        return
+    transaction.on_commit(lambda: submit(name))
+
+
+def _lookup(images, variants):
+    """Ищет варианты картинок в хранилище sorl одним запросом.
+
+    Возвращает ``{имя картинки: (основная миниатюра, все ли варианты
+    зарегистрированы)}``; основная — последний из ``variants``.
+    Картинки, у которых чего-то не хватает, отдаются пулу.
+    """
+    images = {image.name: image for image in images if image}
+    pending = cache.get_many([PENDING_KEY.format(name) for name in images])
+    thumbnails = {}
+    for name, image in images.items():
+        # Миниатюра ещё рисуется: не ходим за ней в базу sorl.
+        if PENDING_KEY.format(name) not in pending:
+            thumbnails[name] = [
+                backend.resolve(image, geometry_string, **options)[1]
+                for geometry_string, options in variants
+            ]
+    try:
+        found = default.kvstore.get_many(
+            [thumbnail for files in thumbnails.values() for thumbnail in files]
+        )
+    except Exception:
+        logger.exception('Ошибка поиска миниатюр %s', list(thumbnails))
+        found = {}
+    ready = dict.fromkeys(images, (None, False))
+    for name, files in thumbnails.items():
+        complete = all(thumbnail.key in found for thumbnail in files)
+        ready[name] = (found.get(files[-1].key), complete)
+        if not complete:
+            # Недостающие варианты дорисуются, готовые файлы не трогаются.
+            enqueue(name)
+    return ready
+
+
+@timed('thumbnail')
+def ready_thumbnails(images):
+    """Готовые основные миниатюры картинок одним обращением к sorl.
+
+    Возвращает ``{имя картинки: миниатюра}``; у картинок, миниатюры
+    которых ещё рисуются, значение None. Недостающие отдаются пулу.
+    """
+    variants = [(POST_THUMBNAIL_GEOMETRY, POST_THUMBNAIL_OPTIONS)]
+    return {
+        name: thumbnail
+        for name, (thumbnail, _) in _lookup(images, variants).items()
+    }
+
+
+def ready_thumbnail(image):
+    """Готовая основная миниатюра, None, пока её рисуют."""
+    if not image:
+        return None
+    return ready_thumbnails([image])[image.name]
+
+
+def ready_thumbnail_url(image):
+    """URL готовой миниатюры или исходной картинки, пока её рисуют."""
+    if not image:
+        return ''
+    thumbnail = ready_thumbnail(image)
+    return thumbnail.url if thumbnail else image.url
+
+
+def srcset(image, image_format=None):
+    """``srcset`` всех ширин; имена файлов вычисляются без базы."""
+    options = dict(POST_THUMBNAIL_OPTIONS)
+    if image_format is not None:
+        options['format'] = image_format
+    entries = []
+    for width in POST_THUMBNAIL_WIDTHS:
+        _, thumbnail, _ = backend.resolve(
+            image, variant_geometry(width), **options
+        )
+        entries.append(f'{thumbnail.url} {width}w')
+    return ', '.join(entries)
+
+
+@timed('thumbnail')
+def ready_post_images(images):
+    """Картинки постов для шаблона: ``{имя: PostImage}``.
+
+    srcset выводится, только когда в хранилище sorl есть все его
+    варианты: у картинок, загруженных до появления вариантов, есть
+    лишь основная миниатюра, и она показывается без srcset, пока
+    остальные дорисовываются. Пока нет и её — исходник.
+    """
+    images = {image.name: image for image in images if image}
+    ready = {}
+    for name, (thumbnail, complete) in _lookup(
+        images.values(), post_variants()
+    ).items():
+        image = images[name]
+        if thumbnail is None:
+            ready[name] = PostImage(image.url, '', [])
+        elif not complete:
+            ready[name] = PostImage(thumbnail.url, '', [])
+        else:
+            ready[name] = PostImage(thumbnail.url, srcset(image), [
+                (CONTENT_TYPES[image_format], srcset(image, image_format))
+                for image_format in POST_THUMBNAIL_FORMATS
+            ])
+    return ready
+
+
+def ready_post_image(image):
+    """Картинка одного поста для шаблона или None."""
+    if not image:
+        return None
+    return ready_post_images([image])[image.name]
@@ -1,34 +1,113 @@
+import hashlib
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import urlencode
+from django.views.decorators.http import condition, require_POST
+
+from core import db_router
+from core.caching import get_generation, get_or_build, versioned_key
+from core.db_router import replica_reads
+from core.querycount import query_budget
 
+from . import follows, graph, search
+from .counters import get_stats
+from .feeds import FEED_ORDERING, FEEDS_NAMESPACE, follow_feed
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post
+from .paginator import (CURSOR_PARAM, DEFAULT_ORDERING, PAGE_PARAM,
+                        KeysetPaginator)
 
 User = get_user_model()
 
 posts_per_page = 10
+comments_per_page = 20
+# Сколько авторов можно передать в follow_bulk за один запрос.
+follow_bulk_max = 100
+
+
+def get_page_obj(request, post_list, feed=None, ordering=DEFAULT_ORDERING):
+    """Страница ленты по курсору; ``?page=N`` поддерживается.
+
+    Страницы ленты ``feed`` кэшируются до следующего изменения постов
+    или подписок; собирает страницу только один процесс. Пишущий,
+    закреплённый за основной базой, кэш обходит: страницы в нём могли
+    собрать по реплике, которая ещё не видит его изменений.
+    """
+    paginator = KeysetPaginator(post_list, posts_per_page, ordering)
+    if feed is None or PAGE_PARAM in request.GET or db_router.pinned():
+        return paginator.page_from_request(request)
+    key = versioned_key(
+        FEEDS_NAMESPACE, feed, request.GET.get(CURSOR_PARAM, '')
+    )
+    state = get_or_build(
+        key,
+        lambda: paginator.page_state(paginator.page_from_request(request)),
+        settings.FEED_PAGE_CACHE_TIMEOUT,
+    )
+    return paginator.restore_page(state)
+
+
+def feed_etag(request, *args, **kwargs):
+    """ETag страницы ленты без её сборки.
+
+    Поколение кэша лент меняется при любом изменении постов, групп
+    и подписок; читатель и адрес различают шапку и страницу ленты.
+    """
+    return _etag(
+        get_generation(FEEDS_NAMESPACE), request.user.pk,
+        request.get_full_path(),
+    )
+
+
+def post_etag(request, post_id):
+    # Last-Modified у страницы поста нет: кроме поста она зависит от
+    # комментариев, поколения лент и читателя, а это видно только ETag.
+    version = Post.objects.filter(pk=post_id).values_list(
+        'updated', 'comments_version'
+    ).first()
+    if version is None:
+        return None
+    updated, comments_version = version
+    # Поколение лент учитывает и счётчик постов автора на странице.
+    return _etag(
+        updated.isoformat(), comments_version,
+        get_generation(FEEDS_NAMESPACE), request.user.pk,
+        request.get_full_path(),
+    )
+
 
+def _etag(*parts):
+    raw = ':'.join(str(part) for part in parts)
+    return hashlib.md5(raw.encode()).hexdigest()
 
+
+@query_budget(5)
+@replica_reads
+@condition(etag_func=feed_etag)
 def index(request):
     post_list = Post.objects.select_related('author', 'group').all()
-    paginator = Paginator(post_list, posts_per_page)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_page_obj(request, post_list, feed='index')
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@query_budget(5)
+@replica_reads
+@condition(etag_func=feed_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = Post.objects.filter(group=group)
-    paginator = Paginator(post_list, posts_per_page)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.select_related('author', 'group').filter(
+        group=group
+    )
+    page_obj = get_page_obj(request, post_list, feed=f'group:{group.pk}')
 
     context = {
         'group': group,
@@ -37,53 +116,123 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@query_budget(12)
+@replica_reads
+@condition(etag_func=feed_etag)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    total_posts = author.posts.all().count()
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, posts_per_page)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    following = (request.user.is_authenticated and author.following.filter(
-        user=request.user).exists())
+    stats = get_stats(author.pk)
+    post_list = author.posts.select_related('author', 'group')
+    page_obj = get_page_obj(request, post_list, feed=f'profile:{author.pk}')
+    following = follows.is_following(request.user, author.pk)
 
     context = {
         'author': author,
         'page_obj': page_obj,
-        'total_posts': total_posts,
+        'total_posts': stats.posts_count,
+        'stats': stats,
         'following': following,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@query_budget(6)
+@replica_reads
+@condition(etag_func=post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id
+    )
     form = CommentForm(request.POST)
-    comments = post.comments.all()
+    comments = get_comments_page(request, post)
 
     context = {
         'post': post,
         'form': form,
         'comments': comments,
+        'total_posts': get_stats(post.author_id).posts_count,
 
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def get_comments_page(request, post):
+    """Страница комментариев поста по курсору, с авторами."""
+    paginator = KeysetPaginator(
+        post.comments.select_related('author'), comments_per_page,
+        ordering=('created', 'id'),
+    )
+    return paginator.page_from_request(request)
+
+
+@query_budget(4)
+@replica_reads
+def post_comments(request, post_id):
+    """Следующие страницы комментариев: HTML-фрагмент или JSON."""
+    post = get_object_or_404(Post.objects.only('id'), pk=post_id)
+    comments = get_comments_page(request, post)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+                for comment in comments
+            ],
+            'next_cursor': comments.next_cursor,
+        })
+    return render(request, 'posts/includes/comments.html', {
+        'post': post,
+        'comments': comments,
+    })
+
+
 @login_required
 def post_create(request):
     if request.method == 'POST':
-        form = PostForm(request.POST)
+        form = PostForm(request.POST, files=request.FILES or None)
         if form.is_valid():
             commit = form.save(commit=False)
             commit.author = request.user
-            commit.save()
+            # Транзакция только на запись: с BEGIN IMMEDIATE она держит
+            # блокировку записи SQLite, а проверка формы пережимает
+            # картинку.
+            with transaction.atomic():
+                commit.save()
             return redirect('posts:profile', request.user.username)
         return render(request, 'posts/create_post.html', {'form': form})
     form = PostForm()
     return render(request, 'posts/create_post.html', {'form': form})
 
 
+@query_budget(5)
+@replica_reads
+def post_search(request):
+    """Полнотекстовый поиск по постам, лучшие совпадения первыми."""
+    query = request.GET.get('q', '').strip()
+    backend = search.get_backend()
+    post_list = backend.search(
+        Post.objects.select_related('author', 'group'), query
+    )
+    paginator = KeysetPaginator(
+        post_list, posts_per_page, ordering=('search_rank', '-id')
+    )
+    page_obj = paginator.page_from_request(request)
+    snippets = backend.highlight(query, page_obj.object_list)
+    for post in page_obj.object_list:
+        post.snippet = snippets.get(post.pk, '')
+
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'extra_query': urlencode({'q': query}) + '&' if query else '',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
@@ -111,19 +260,24 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(6)
+@replica_reads
 @login_required
 def follow_index(request):
-    posts_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts_list, posts_per_page)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts_list = follow_feed(request.user).select_related('author', 'group')
+    page_obj = get_page_obj(
+        request, posts_list, feed=f'follow:{request.user.pk}',
+        ordering=FEED_ORDERING,
+    )
 
     context = {
         'page_obj': page_obj,
+        'suggestions': graph.suggested_authors(request.user),
     }
     return render(request, 'posts/follow.html', context)
 
@@ -134,7 +288,8 @@ def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if user == author:
         return redirect('posts:profile', username=username)
-    Follow.objects.get_or_create(user=user, author=author)
+    with transaction.atomic():
+        Follow.objects.get_or_create(user=user, author=author)
 
     return redirect('posts:profile', username=username)
 
@@ -144,5 +299,38 @@ def profile_unfollow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
     is_follower = Follow.objects.filter(user=user, author=author)
-    is_follower.delete()
+    with transaction.atomic():
+        is_follower.delete()
     return redirect('posts:profile', username=author)
+
+
+@login_required
+@require_POST
+def follow_bulk(request):
+    """Подписка или отписка от нескольких авторов одной транзакцией.
+
+    Ожидает ``action=follow|unfollow`` и поля ``author`` с именами.
+    """
+    action = request.POST.get('action')
+    usernames = request.POST.getlist('author')
+    if action not in ('follow', 'unfollow') or not usernames:
+        return JsonResponse(
+            {'error': 'Нужны action=follow|unfollow и author'}, status=400
+        )
+    if len(usernames) > follow_bulk_max:
+        return JsonResponse(
+            {'error': f'Не больше {follow_bulk_max} авторов за раз'},
+            status=400,
+        )
+    authors = dict(User.objects.filter(
+        username__in=usernames
+    ).values_list('pk', 'username'))
+    if action == 'follow':
+        changed = follows.follow_authors(request.user, authors)
+    else:
+        changed = follows.unfollow_authors(request.user, authors)
+    return JsonResponse({
+        'action': action,
+        'changed': [authors[pk] for pk in changed],
+        'unknown': sorted(set(usernames) - set(authors.values())),
+    })
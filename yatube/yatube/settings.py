@@ -55,11 +55,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.metrics.MetricsMiddleware',
+    'core.middleware.sqlstats.SQLStatsMiddleware',
+    'core.middleware.query_budget.QueryBudgetMiddleware',
+    'core.middleware.template_profile.TemplateProfileMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.sampling.SamplingProfilerMiddleware',
+    'core.middleware.replicas.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -84,18 +90,75 @@ TEMPLATES = [
     },
 ]
 
+# Рабочий режим шаблонов: кэширующий загрузчик и компиляция всех
+# шаблонов из DIRS при старте процесса (core.template_cache).
+TEMPLATE_CACHE = os.getenv(
+    'YATUBE_TEMPLATE_CACHE', '0' if DEBUG else '1'
+) == '1'
+if TEMPLATE_CACHE:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
+# Замер отрисовки узлов шаблонов: сводка по самым медленным в лог
+# и заголовок Server-Timing.
+TEMPLATE_PROFILE_ENABLED = DEBUG
+TEMPLATE_PROFILE_TOP = 5
+TEMPLATE_PROFILE_NODES = [
+    'django.template.loader_tags.IncludeNode',
+    'django.template.library.SimpleNode',
+    'sorl.thumbnail.templatetags.thumbnail.ThumbnailNode',
+]
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# Потоки, в которых yatube.asgi выполняет вьюхи; соединения с
+# клиентами обслуживает цикл событий без отдельных потоков.
+ASGI_THREADS = int(os.getenv('YATUBE_ASGI_THREADS', '8'))
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Поверх core.db.backends.sqlite3.base.DEFAULT_PRAGMAS.
+        'PRAGMAS': {
+            'busy_timeout': int(os.getenv('YATUBE_SQLITE_BUSY_TIMEOUT', 5000)),
+        },
+        'TRANSACTION_MODE': 'IMMEDIATE',
+        # Соединения переживают запрос в пуле процесса, поэтому
+        # CONN_MAX_AGE остаётся 0: Django возвращает их в пул.
+        'POOL': {
+            'MAX_SIZE': int(os.getenv('YATUBE_DB_POOL_SIZE', 8)),
+            'TIMEOUT': 10,
+        },
     }
 }
 
+# Реплики только для чтения: пути к копиям базы через запятую.
+# В тестах реплики смотрят в тестовую основную базу.
+DATABASE_REPLICAS = []
+for number, replica_name in enumerate(
+    filter(None, os.getenv('YATUBE_DB_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'core.db.backends.sqlite3',
+        'NAME': replica_name.strip(),
+        'POOL': DATABASES['default']['POOL'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+REPLICA_READ_APPS = ['posts', 'auth']
+# Сколько секунд после записи сессия читает только основную базу.
+REPLICA_PIN_SECONDS = 5
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -136,8 +199,102 @@ STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кэш выбирается переменной окружения YATUBE_CACHE:
+# locmem — свой кэш у каждого процесса (по умолчанию),
+# file и sqlite — общий кэш процессов одного хоста без внешних сервисов,
+# redis — любой сервер с протоколом Redis через подключаемый бэкенд.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'sqlite': 'core.cache_backends.SQLiteCache',
+    'redis': os.getenv(
+        'YATUBE_CACHE_REDIS_BACKEND', 'django_redis.cache.RedisCache'
+    ),
+}
+CACHE_LOCATIONS = {
+    'locmem': '',
+    'file': os.path.join(BASE_DIR, 'cache'),
+    'sqlite': os.path.join(BASE_DIR, 'cache.sqlite3'),
+    'redis': 'redis://127.0.0.1:6379/1',
+}
+CACHE_KIND = os.getenv('YATUBE_CACHE', 'locmem')
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS[CACHE_KIND],
+        'LOCATION': os.getenv(
+            'YATUBE_CACHE_LOCATION', CACHE_LOCATIONS[CACHE_KIND]
+        ),
+        # Смена версии разом отключает все ключи после несовместимого
+        # изменения формата закэшированных данных.
+        'VERSION': int(os.getenv('YATUBE_CACHE_VERSION', '1')),
+        'KEY_PREFIX': 'yatube',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('YATUBE_CACHE_MAX_ENTRIES', '10000')),
+        },
     }
 }
+
+# Сколько секунд хранить готовые страницы лент.
+FEED_PAGE_CACHE_TIMEOUT = 60
+
+# Загрузки больше этого размера Django пишет во временный файл,
+# а не держит в памяти.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024
+
+# Картинки постов при загрузке уменьшаются до этих размеров и
+# перекодируются с этим качеством (posts.images).
+POST_IMAGE_MAX_SIZE = (1920, 1920)
+POST_IMAGE_QUALITY = 82
+
+# Записи sorl-thumbnail о файлах дополнительно держатся в памяти
+# процесса; размер индекса — в символах ключей и значений.
+THUMBNAIL_KVSTORE = 'core.thumbnail_kvstore.KVStore'
+THUMBNAIL_LOCAL_INDEX_SIZE = int(
+    os.getenv('YATUBE_THUMBNAIL_INDEX_SIZE', 2 * 1024 * 1024)
+)
+
+# Число процессов, заранее рисующих миниатюры картинок постов;
+# 0 — рисовать сразу при сохранении поста, а недостающие у старых
+# картинок дорисовывать командой backfill_thumbnails.
+THUMBNAIL_PREGENERATE_WORKERS = int(
+    os.getenv('YATUBE_THUMBNAIL_WORKERS', '2')
+)
+
+# Путь к классу бэкенда поиска по постам; если не задан, на SQLite
+# используется индекс FTS5, на других базах — поиск по подстроке.
+POST_SEARCH_BACKEND = os.getenv('YATUBE_SEARCH_BACKEND') or None
+
+# Гистограммы времени запросов по вьюхам на /metrics. Prometheus
+# передаёт токен в заголовке Authorization: Bearer; без токена
+# метрики видит только персонал.
+METRICS_ENABLED = os.getenv('YATUBE_METRICS', '1') == '1'
+METRICS_TOKEN = os.getenv('YATUBE_METRICS_TOKEN', '')
+
+# Сэмплирующий профилировщик: доля запросов, которые профилируются
+# всегда (сотрудник может попросить профиль заголовком X-Profile: 1),
+# период снимков стека в секундах, каталог для свёрнутых стеков и
+# сколько последних файлов в нём хранить.
+SAMPLING_PROFILER_RATE = float(os.getenv('YATUBE_PROFILE_RATE', '0'))
+SAMPLING_PROFILER_INTERVAL = 0.005
+SAMPLING_PROFILER_DIR = os.getenv(
+    'YATUBE_PROFILE_DIR', os.path.join(BASE_DIR, 'profiles')
+)
+SAMPLING_PROFILER_KEEP = int(os.getenv('YATUBE_PROFILE_KEEP', '200'))
+
+# Сводка SQL-запросов по формам и вьюхам (команда sql_report) и
+# порог журнала медленных запросов в миллисекундах.
+SQL_STATS_ENABLED = os.getenv('YATUBE_SQL_STATS', '1') == '1'
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('YATUBE_SLOW_QUERY_MS', '100'))
+SQL_STATS_DIR = os.getenv(
+    'YATUBE_SQL_STATS_DIR', os.path.join(BASE_DIR, 'sqlstats')
+)
+SQL_STATS_FLUSH_SECONDS = 60
+
+# Учёт SQL-запросов на запрос к сайту: бюджет по умолчанию (None —
+# без ограничения), порог повторов одной формы запроса для
+# предупреждения об N+1 и исключение вместо записи в лог.
+QUERY_BUDGET_ENABLED = DEBUG
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGET_REPEAT_THRESHOLD = 5
+QUERY_BUDGET_RAISE = False